@@ -1,18 +1,83 @@
-from flask import Flask, request, jsonify, session
+from flask import Flask, request, jsonify, session, Response, stream_with_context, g, has_app_context, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from sqlalchemy import inspect, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import joinedload, selectinload
+from werkzeug.security import generate_password_hash
+from datetime import datetime, timedelta, date
+from password_hashing import password_hasher, HashingBusy, PASSWORD_METHOD
 import sqlite3
 import os
-import random
-import string
 from functools import wraps
+import heapq
+import bisect
+import threading
+import time
 import uuid
+import base64
+import codecs
+import hashlib
+import collections
+import csv
+import json
+
+# Database Configuration
+# Any SQLAlchemy URL can be supplied through MANUFLOW_DATABASE_URL (or DATABASE_URL).
+# File-backed SQLite databases are tuned for concurrent workers: WAL journaling lets
+# readers run alongside the single writer, synchronous=NORMAL drops the per-commit
+# fsync of the WAL, and busy_timeout makes writers queue instead of failing with
+# "database is locked". Set MANUFLOW_SQLITE_TUNING=0 to fall back to SQLite defaults.
+DATABASE_URL = os.environ.get('MANUFLOW_DATABASE_URL') or os.environ.get('DATABASE_URL') or 'sqlite:///manuflow.db'
+DB_POOL_SIZE = int(os.environ.get('MANUFLOW_DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.environ.get('MANUFLOW_DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = int(os.environ.get('MANUFLOW_DB_POOL_TIMEOUT', 30))
+SQLITE_TUNING = os.environ.get('MANUFLOW_SQLITE_TUNING', '1') != '0'
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('MANUFLOW_SQLITE_BUSY_TIMEOUT_MS', 10000))
+SQLITE_MMAP_SIZE = int(os.environ.get('MANUFLOW_SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('MANUFLOW_SQLITE_CACHE_SIZE_KB', 64 * 1024))
+
+def database_engine_options(url):
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite':
+        return {
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True
+        }
+    if url.database in (None, '', ':memory:'):
+        # In-memory databases live in a single connection; keep SQLAlchemy's default pool
+        return {}
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'connect_args': {'check_same_thread': False}
+    }
+    if SQLITE_TUNING:
+        options['connect_args']['timeout'] = SQLITE_BUSY_TIMEOUT_MS / 1000.0
+    return options
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    if not SQLITE_TUNING or not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+    cursor.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'manuflow-secret-key-2024'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///manuflow.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database_engine_options(DATABASE_URL)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
@@ -38,6 +103,12 @@ class Product(db.Model):
     cost_price = db.Column(db.Float, default=0.0)
     is_raw_material = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    inventory_value = db.Column(db.Float, default=0.0)  # stock on hand at moving average cost
+    is_low_stock = db.Column(db.Boolean, default=False)  # current_stock <= min_stock, kept in step on every change
+    
+    __table_args__ = (
+        db.Index('ix_product_low_stock', 'is_low_stock'),
+    )
 
 class WorkCenter(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -58,6 +129,10 @@ class BOM(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     product = db.relationship('Product', backref='boms')
+    
+    __table_args__ = (
+        db.Index('ix_bom_product', 'product_id'),
+    )
 
 class BOMLine(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -67,6 +142,10 @@ class BOMLine(db.Model):
     
     bom = db.relationship('BOM', backref='components')
     product = db.relationship('Product')
+    
+    __table_args__ = (
+        db.Index('ix_bom_line_bom', 'bom_id'),
+    )
 
 class ManufacturingOrder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -85,6 +164,15 @@ class ManufacturingOrder(db.Model):
     product = db.relationship('Product')
     bom = db.relationship('BOM')
     assignee = db.relationship('User')
+    
+    __table_args__ = (
+        db.Index('ix_manufacturing_order_created', 'created_at'),
+        db.Index('ix_manufacturing_order_state_created', 'state', 'created_at'),
+        db.Index('ix_manufacturing_order_state_scheduled', 'state', 'scheduled_date'),
+        db.Index('ix_manufacturing_order_bom', 'bom_id'),
+        db.Index('ix_manufacturing_order_product_created', 'product_id', 'created_at'),
+        db.Index('ix_manufacturing_order_state_completed', 'state', 'completed_at'),
+    )
 
 class WorkOrder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -98,10 +186,18 @@ class WorkOrder(db.Model):
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
     notes = db.Column(db.Text)
+    planned_start = db.Column(db.DateTime)
+    planned_end = db.Column(db.DateTime)
     
     manufacturing_order = db.relationship('ManufacturingOrder', backref='work_orders')
     work_center = db.relationship('WorkCenter')
     assignee = db.relationship('User')
+    
+    __table_args__ = (
+        db.Index('ix_work_order_order_state', 'manufacturing_order_id', 'state'),
+        db.Index('ix_work_order_center_state', 'work_center_id', 'state'),
+        db.Index('ix_work_order_state_planned_end', 'state', 'planned_end'),
+    )
 
 class StockMovement(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -114,10 +210,450 @@ class StockMovement(db.Model):
     manufacturing_order_id = db.Column(db.Integer, db.ForeignKey('manufacturing_order.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    balance_after = db.Column(db.Float)  # product stock right after this movement
     
     product = db.relationship('Product')
     manufacturing_order = db.relationship('ManufacturingOrder')
     created_by = db.relationship('User')
+    
+    __table_args__ = (
+        db.Index('ix_stock_movement_created', 'created_at', 'id'),
+        db.Index('ix_stock_movement_product_created', 'product_id', 'created_at', 'id'),
+        db.Index('ix_stock_movement_order_type', 'manufacturing_order_id', 'movement_type'),
+    )
+
+class ProductionDailyRollup(db.Model):
+    # Manufacturing order totals per creation day, product and state (see Production Analytics)
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    state = db.Column(db.String(20), nullable=False)
+    order_count = db.Column(db.Integer, default=0)
+    quantity_planned = db.Column(db.Float, default=0.0)
+    quantity_produced = db.Column(db.Float, default=0.0)
+    total_time = db.Column(db.Float, default=0.0)  # in minutes
+    efficiency_sum = db.Column(db.Float, default=0.0)  # sum of per-order efficiency percentages
+    
+    __table_args__ = (
+        db.Index('ix_production_daily_rollup_bucket', 'day', 'product_id', 'state', unique=True),
+    )
+
+class TableVersion(db.Model):
+    # Write counter per table, bumped by every committing transaction (see Response Caching)
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ChangeEvent(db.Model):
+    # Committed change announced on /api/events/stream, numbered in commit order (see Server-Sent Events)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    event = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DocumentSequence(db.Model):
+    # Next unreserved number per document prefix and day (see Document References)
+    name = db.Column(db.String(64), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False, default=1)
+
+class StockCheckpoint(db.Model):
+    # Product balance at taken_at, covering every movement created before it
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False)
+    balance = db.Column(db.Float, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_stock_checkpoint_product_taken', 'product_id', 'taken_at', unique=True),
+    )
+
+class SyncWatermark(db.Model):
+    # Newest source timestamp a background reconciliation has processed
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class BackgroundJob(db.Model):
+    # Queued long-running operation (see Background Jobs)
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    dedupe_key = db.Column(db.String(40), nullable=False)  # sha1 of kind and params
+    state = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed, cancelled
+    progress = db.Column(db.Float, default=0.0)  # 0..1
+    progress_message = db.Column(db.String(200))
+    cancel_requested = db.Column(db.Boolean, default=False)
+    result = db.Column(db.Text)  # JSON
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(100))
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # heartbeat while running
+    
+    __table_args__ = (
+        db.Index('ix_background_job_state', 'state', 'id'),
+        # At most one queued job per kind and params; identical submissions share it
+        db.Index('ix_background_job_queued', 'dedupe_key', unique=True,
+                 sqlite_where=db.text("state = 'queued'"), postgresql_where=db.text("state = 'queued'")),
+    )
+
+# Query Loading Helpers
+# List endpoints build their queries here so related rows are fetched with a constant
+# number of SELECTs (joined loads for many-to-one, selectin loads for collections)
+# instead of one lazy load per serialized row.
+def bom_list_query():
+    return BOM.query.options(
+        joinedload(BOM.product).load_only(Product.name),
+        selectinload(BOM.components).joinedload(BOMLine.product).load_only(Product.name)
+    )
+
+def manufacturing_order_list_query():
+    return ManufacturingOrder.query.options(
+        joinedload(ManufacturingOrder.product).load_only(Product.name),
+        joinedload(ManufacturingOrder.bom).load_only(BOM.name),
+        joinedload(ManufacturingOrder.assignee).load_only(User.username)
+    )
+
+def work_order_list_query():
+    return WorkOrder.query.options(
+        joinedload(WorkOrder.manufacturing_order).load_only(ManufacturingOrder.reference),
+        joinedload(WorkOrder.work_center).load_only(WorkCenter.name),
+        joinedload(WorkOrder.assignee).load_only(User.username)
+    )
+
+def stock_movement_list_query():
+    return StockMovement.query.options(
+        joinedload(StockMovement.product).load_only(Product.name),
+        joinedload(StockMovement.created_by).load_only(User.username)
+    )
+
+def order_total_time():
+    # Work order minutes per order: actual time when recorded, otherwise the estimate
+    return db.select(
+        db.func.coalesce(db.func.sum(
+            db.func.coalesce(db.func.nullif(WorkOrder.actual_time, 0), WorkOrder.estimated_time)
+        ), 0)
+    ).where(WorkOrder.manufacturing_order_id == ManufacturingOrder.id).scalar_subquery()
+
+def order_efficiency():
+    return db.case(
+        (ManufacturingOrder.quantity_to_produce > 0,
+         ManufacturingOrder.quantity_produced * 100.0 / ManufacturingOrder.quantity_to_produce),
+        else_=0.0
+    )
+
+def production_report_query(args):
+    """Report rows per order, oldest first, filtered on creation date (start_date/end_date)."""
+    query = db.session.query(
+        ManufacturingOrder.reference,
+        Product.name.label('product_name'),
+        ManufacturingOrder.quantity_to_produce,
+        ManufacturingOrder.quantity_produced,
+        ManufacturingOrder.state,
+        order_total_time().label('total_time'),
+        order_efficiency().label('efficiency'),
+        ManufacturingOrder.created_at,
+        ManufacturingOrder.completed_at
+    ).join(Product, ManufacturingOrder.product_id == Product.id)
+    
+    if args.get('start_date'):
+        query = query.filter(ManufacturingOrder.created_at >= parse_date_arg(args['start_date']))
+    if args.get('end_date'):
+        query = query.filter(ManufacturingOrder.created_at < parse_date_arg(args['end_date'], end_of_day=True))
+    
+    return query.order_by(ManufacturingOrder.created_at, ManufacturingOrder.id)
+
+# Change Tracking
+# Writes are collected per session as (table, row id, operation) while flushing and
+# handed to the registered listeners only once the transaction has committed, so a
+# rolled back request never invalidates or announces anything. Statements that bypass
+# the unit of work (conditional updates, bulk inserts/deletes) call mark_changed.
+_change_listeners = []
+
+def on_changes_committed(listener):
+    _change_listeners.append(listener)
+    return listener
+
+def mark_changed(table, row_ids=None, op='updated'):
+    changes = db.session.info.setdefault('pending_changes', [])
+    if row_ids is None or isinstance(row_ids, int):
+        changes.append((table, row_ids, op))
+    else:
+        changes.extend((table, row_id, op) for row_id in row_ids)
+
+@event.listens_for(db.session, 'after_flush')
+def collect_flushed_changes(session, flush_context):
+    changes = session.info.setdefault('pending_changes', [])
+    for op, instances in (('created', session.new), ('updated', session.dirty), ('deleted', session.deleted)):
+        for instance in instances:
+            if op == 'updated' and not session.is_modified(instance):
+                continue
+            changes.append((instance.__tablename__, getattr(instance, 'id', None), op))
+
+@event.listens_for(db.session, 'after_commit')
+def publish_committed_changes(session):
+    changes = session.info.pop('pending_changes', None)
+    if not changes:
+        return
+    for listener in _change_listeners:
+        try:
+            listener(changes)
+        except Exception:
+            app.logger.exception('Change listener failed')
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_pending_changes(session):
+    session.info.pop('pending_changes', None)
+
+def changed_tables(changes):
+    return {table for table, _, _ in changes}
+
+# Request Metrics
+# Every request records wall time, SQL statement count and SQL time per route, taken
+# from engine cursor events. Statements slower than SLOW_QUERY_MS are logged with
+# their parameters. Totals are cumulative per process and exposed in the Prometheus
+# text format at /api/metrics; recording costs a few counter updates under one lock.
+METRICS_ENABLED = os.environ.get('MANUFLOW_METRICS', '1') != '0'
+METRICS_TOKEN = os.environ.get('MANUFLOW_METRICS_TOKEN')
+SLOW_QUERY_MS = float(os.environ.get('MANUFLOW_SLOW_QUERY_MS', 200))
+REQUEST_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+SQL_STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+    
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.total}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return lines
+
+class RouteMetrics:
+    def __init__(self):
+        self.responses = collections.Counter()  # status code -> count
+        self.duration = Histogram(REQUEST_DURATION_BUCKETS)
+        self.sql_time = Histogram(SQL_DURATION_BUCKETS)
+        self.sql_statements = Histogram(SQL_STATEMENT_BUCKETS)
+
+class MetricsRegistry:
+    def __init__(self):
+        self._routes = collections.defaultdict(RouteMetrics)
+        self._slow_statements = 0
+        self._lock = threading.Lock()
+    
+    def observe_request(self, route, method, status, duration, sql_statements, sql_time):
+        with self._lock:
+            metrics = self._routes[(route, method)]
+            metrics.responses[status] += 1
+            metrics.duration.observe(duration)
+            metrics.sql_statements.observe(sql_statements)
+            metrics.sql_time.observe(sql_time)
+    
+    def count_slow_statement(self):
+        with self._lock:
+            self._slow_statements += 1
+    
+    def render(self):
+        families = [
+            ('manuflow_http_request_duration_seconds', 'histogram', 'Request wall time', 'duration'),
+            ('manuflow_http_request_sql_statements', 'histogram', 'SQL statements issued per request', 'sql_statements'),
+            ('manuflow_http_request_sql_seconds', 'histogram', 'Time spent in SQL per request', 'sql_time'),
+        ]
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = [
+                '# HELP manuflow_http_requests_total Requests by route, method and status',
+                '# TYPE manuflow_http_requests_total counter'
+            ]
+            for (route, method), metrics in routes:
+                for status, count in sorted(metrics.responses.items()):
+                    lines.append(
+                        f'manuflow_http_requests_total{{{metric_labels(route, method)},status="{status}"}} {count}'
+                    )
+            for name, kind, description, attribute in families:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} {kind}')
+                for (route, method), metrics in routes:
+                    lines.extend(getattr(metrics, attribute).render(name, metric_labels(route, method)))
+            lines.append(f'# HELP manuflow_sql_slow_statements_total Statements slower than {SLOW_QUERY_MS:g} ms')
+            lines.append('# TYPE manuflow_sql_slow_statements_total counter')
+            lines.append(f'manuflow_sql_slow_statements_total {self._slow_statements}')
+        return '\n'.join(lines) + '\n'
+
+def metric_labels(route, method):
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'route="{route}",method="{method}"'
+
+request_metrics = MetricsRegistry()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_statement_time(conn, cursor, statement, parameters, context, executemany):
+    timers = conn.info.get('statement_started')
+    if not timers:
+        return
+    elapsed = time.perf_counter() - timers.pop()
+    if has_app_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.sql_time += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        request_metrics.count_slow_statement()
+        app.logger.warning(
+            'Slow query (%.1f ms) %s: %s params=%.500r', elapsed * 1000,
+            request.path if has_request_context() else '-', ' '.join(statement.split()), parameters
+        )
+
+@event.listens_for(Engine, 'handle_error')
+def discard_statement_timer(exception_context):
+    # after_cursor_execute does not fire for failed statements
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('statement_started'):
+        connection.info['statement_started'].pop()
+
+@app.before_request
+def start_request_metrics():
+    if METRICS_ENABLED:
+        g.request_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_time = 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_started' not in g:
+        return response
+    duration = time.perf_counter() - g.request_started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_metrics.observe_request(route, request.method, response.status_code, duration, g.sql_statements, g.sql_time)
+    response.headers['Server-Timing'] = f'app;dur={duration * 1000:.1f}, db;dur={g.sql_time * 1000:.1f}'
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition. Set MANUFLOW_METRICS_TOKEN to require a bearer token."""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({'error': 'Authentication required'}), 401
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Response Caching
+# Tables read by ETagged views (and the BOM explosion cache) have a version counter
+# that is bumped, in one statement inside the committing transaction, whenever a
+# commit touches the table; writes to other tables cost nothing extra. Workers keep
+# a copy of the counters, updated on their own commits and re-read at most every
+# VERSION_REFRESH_SECONDS, so list views can derive an ETag, answer If-None-Match
+# with 304 and reuse the serialized body of an unchanged version without running a
+# query.
+VERSION_REFRESH_SECONDS = float(os.environ.get('MANUFLOW_VERSION_REFRESH_SECONDS', 1.0))
+RESPONSE_CACHE_SIZE = 256
+
+_table_versions = {'versions': {}, 'fetched_at': float('-inf')}
+_table_versions_lock = threading.Lock()
+_response_cache = {}  # (view name, query string) -> (etag, body)
+_response_cache_lock = threading.Lock()
+VERSIONED_TABLES = set()  # filled by cached_by_table_version and other version readers
+
+def ensure_table_versions():
+    existing = {name for name, in db.session.query(TableVersion.table_name)}
+    missing = [name for name in db.metadata.tables if name not in existing]
+    if missing:
+        db.session.execute(db.insert(TableVersion), [{'table_name': name, 'version': 0} for name in missing])
+
+@event.listens_for(db.session, 'before_commit')
+def bump_table_versions(session):
+    session.flush()
+    tables = sorted(changed_tables(session.info.get('pending_changes', [])) & VERSIONED_TABLES)
+    if not tables:
+        return
+    bump = db.update(TableVersion).where(TableVersion.table_name.in_(tables)).values(
+        version=TableVersion.version + 1
+    )
+    if session.get_bind().dialect.update_returning:
+        versions = session.execute(bump.returning(TableVersion.table_name, TableVersion.version)).all()
+    else:
+        session.execute(bump)
+        versions = session.query(TableVersion.table_name, TableVersion.version).filter(
+            TableVersion.table_name.in_(tables)
+        ).all()
+    session.info['committed_versions'] = dict(versions)
+
+def merge_table_versions(versions, fetched_at=None):
+    with _table_versions_lock:
+        known = _table_versions['versions']
+        for table, version in versions.items():
+            if version > known.get(table, -1):
+                known[table] = version
+        if fetched_at is not None:
+            _table_versions['fetched_at'] = fetched_at
+
+@event.listens_for(db.session, 'after_commit')
+def publish_table_versions(session):
+    versions = session.info.pop('committed_versions', None)
+    if versions:
+        merge_table_versions(versions)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_table_versions(session):
+    session.info.pop('committed_versions', None)
+
+def table_versions(tables):
+    now = time.monotonic()
+    with _table_versions_lock:
+        stale = now - _table_versions['fetched_at'] >= VERSION_REFRESH_SECONDS
+    if stale:
+        merge_table_versions(dict(db.session.query(TableVersion.table_name, TableVersion.version)), now)
+    with _table_versions_lock:
+        return [_table_versions['versions'].get(table, 0) for table in tables]
+
+def cached_by_table_version(*tables):
+    """Serve a GET view with an ETag built from the versions of the tables it reads."""
+    VERSIONED_TABLES.update(tables)
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Versions are read before the body is built, so a concurrent write can only
+            # make the body newer than its ETag, never older
+            etag = f.__name__ + '-' + '.'.join(str(version) for version in table_versions(tables))
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+            
+            key = (f.__name__, request.query_string)
+            with _response_cache_lock:
+                cached = _response_cache.get(key)
+            if cached and cached[0] == etag:
+                body = cached[1]
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                with _response_cache_lock:
+                    if len(_response_cache) >= RESPONSE_CACHE_SIZE:
+                        _response_cache.clear()
+                    _response_cache[key] = (etag, body)
+            
+            response = Response(body, mimetype='application/json')
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
 
 # Authentication decorator
 def login_required(f):
@@ -128,22 +664,504 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Helper Functions
+# Document References
+# References look like MO-250314-0001: a prefix, the day and a number counted per
+# prefix and day in document_sequence. Each process reserves REFERENCE_BLOCK_SIZE
+# numbers at a time in a short transaction of its own, so most references cost no
+# query and two processes never share a number; numbers left in a block when the
+# process exits are skipped. Allocate before the request writes anything, since on
+# SQLite the reservation needs the database write lock.
+REFERENCE_BLOCK_SIZE = int(os.environ.get('MANUFLOW_REFERENCE_BLOCK_SIZE', 100))
+
+class ReferenceAllocator:
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self.blocks = {}  # sequence name -> [next number, end of block]
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+    
+    def reserve(self, name, size):
+        """Reserve `size` numbers of a sequence and return the first one."""
+        table = DocumentSequence.__table__
+        for _ in range(2):
+            with db.engine.begin() as conn:
+                if conn.execute(table.update().where(table.c.name == name).values(
+                    next_value=table.c.next_value + size
+                )).rowcount:
+                    return conn.execute(db.select(table.c.next_value).where(table.c.name == name)).scalar() - size
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(table.insert().values(name=name, next_value=1 + size))
+                return 1
+            except IntegrityError:
+                pass  # another process created the sequence first; reserve from it
+        raise RuntimeError(f'Could not reserve numbers from sequence {name}')
+    
+    def allocate(self, prefix, count=1):
+        name = f"{prefix}-{datetime.now().strftime('%y%m%d')}"
+        numbers = []
+        with self.lock:
+            if os.getpid() != self.pid:
+                # Forked worker: blocks inherited from the parent are not ours to use
+                self.blocks = {}
+                self.pid = os.getpid()
+            while len(numbers) < count:
+                block = self.blocks.get(name)
+                if not block or block[0] >= block[1]:
+                    size = max(self.block_size, count - len(numbers))
+                    start = self.reserve(name, size)
+                    self.blocks = {key: value for key, value in self.blocks.items() if not key.startswith(prefix + '-')}
+                    block = self.blocks[name] = [start, start + size]
+                taken = min(count - len(numbers), block[1] - block[0])
+                numbers.extend(range(block[0], block[0] + taken))
+                block[0] += taken
+        return [f'{name}-{number:04d}' for number in numbers]
+
+reference_allocator = ReferenceAllocator(REFERENCE_BLOCK_SIZE)
+
+def generate_references(prefix, count):
+    return reference_allocator.allocate(prefix, count)
+
 def generate_reference(prefix):
-    timestamp = datetime.now().strftime('%y%m%d')
-    random_part = ''.join(random.choices(string.digits, k=4))
-    return f"{prefix}{timestamp}{random_part}"
-
-def update_product_stock(product_id, quantity, movement_type):
-    product = Product.query.get(product_id)
-    if product:
-        if movement_type in ['in', 'production']:
-            product.current_stock += quantity
-        elif movement_type in ['out', 'consumption']:
-            product.current_stock -= quantity
-        db.session.commit()
+    return reference_allocator.allocate(prefix)[0]
+
+# Helper Functions
+
+INCOMING_MOVEMENT_TYPES = ['in', 'production']
+OUTGOING_MOVEMENT_TYPES = ['out', 'consumption']
+OPEN_ORDER_STATES = ['planned', 'in_progress']
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_REPORTED_ERRORS = 1000
+
+STOCK_MOVEMENT_PAGE_SIZE = 50
+STOCK_MOVEMENT_MAX_PAGE_SIZE = 500
+
+def parse_date_arg(value, end_of_day=False):
+    # Date-only values (YYYY-MM-DD) cover the whole day when used as an upper bound
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def is_id(value):
+    # JSON integers only; bool is an int subclass in Python
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def parse_positive_number(value):
+    # JSON numbers or numeric strings above zero; booleans, NaN and infinity are refused
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError('not a number')
+    number = float(value)
+    if not 0 < number < float('inf'):
+        raise ValueError('not a positive number')
+    return number
+
+def encode_cursor(created_at, row_id):
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_at, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(row_id)
+
+def filter_stock_movements(query, args):
+    product_id = args.get('product_id')
+    movement_type = args.get('movement_type')
+    search = args.get('search')
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    
+    if product_id:
+        query = query.filter(StockMovement.product_id == int(product_id))
+    
+    if movement_type == 'in':
+        query = query.filter(StockMovement.movement_type.in_(INCOMING_MOVEMENT_TYPES))
+    elif movement_type == 'out':
+        query = query.filter(StockMovement.movement_type.in_(OUTGOING_MOVEMENT_TYPES))
+    elif movement_type:
+        query = query.filter(StockMovement.movement_type == movement_type)
+    
+    if search:
+        query = query.filter(StockMovement.reference.ilike(f"%{search}%"))
+    if start_date:
+        query = query.filter(StockMovement.created_at >= parse_date_arg(start_date))
+    if end_date:
+        query = query.filter(StockMovement.created_at < parse_date_arg(end_date, end_of_day=True))
+    
+    return query
+
+def serialize_stock_movement(movement):
+    return {
+        'id': movement.id,
+        'product_id': movement.product_id,
+        'product_name': movement.product.name,
+        'reference': movement.reference,
+        'movement_type': movement.movement_type,
+        'quantity': movement.quantity,
+        'unit_cost': movement.unit_cost,
+        'total_value': movement.total_value,
+        'manufacturing_order_id': movement.manufacturing_order_id,
+        'balance_after': movement.balance_after,
+        'created_at': movement.created_at.isoformat(),
+        'created_by': movement.created_by.username if movement.created_by else None
+    }
+
+class InsufficientStockError(ValueError):
+    def __init__(self, product_id):
+        super().__init__(f'Insufficient stock for product {product_id}')
+        self.product_id = product_id
+
+def stock_delta(quantity, movement_type):
+    if movement_type in INCOMING_MOVEMENT_TYPES:
+        return quantity
+    if movement_type in OUTGOING_MOVEMENT_TYPES:
+        return -quantity
+    return 0.0
+
+# Crossing a product's min_stock threshold is recorded as a change with one of these ops
+STOCK_CROSSING_OPS = ('low_stock', 'restocked')
+
+def is_low_stock(current_stock, min_stock):
+    return (current_stock or 0.0) <= (min_stock or 0.0)
+
+def record_stock_crossing(product_id, was_low, now_low):
+    if bool(was_low) != now_low:
+        mark_changed('product', product_id, 'low_stock' if now_low else 'restocked')
+
+def value_movement(on_hand, value, delta, unit_cost, cost_price):
+    """
+    Moving weighted average valuation of one stock change. Incoming stock is valued at
+    unit_cost (or the current average when none is given), outgoing stock leaves at
+    the average cost on hand. Returns (unit cost of the movement, value after it).
+    """
+    average = value / on_hand if on_hand > 0 else (cost_price or 0.0)
+    cost = unit_cost if delta > 0 and unit_cost else average
+    if on_hand + delta <= 0:
+        return cost, 0.0
+    return cost, value + delta * cost
+
+def apply_stock_delta(product_id, delta, allow_negative=False, unit_cost=None, value_delta=None):
+    """
+    Atomically add delta to a product's stock inside the current transaction and
+    return (new balance, unit cost of the change). Decrements are conditional on enough
+    stock being on hand, so concurrent writers cannot over-consume. The inventory value
+    is updated by value_movement once the stock update holds the row lock, or by
+    value_delta when the caller valued the movements itself, and is_low_stock follows
+    the new balance. Nothing is committed here.
+    """
+    statement = db.update(Product).where(Product.id == product_id)
+    if delta < 0 and not allow_negative:
+        statement = statement.where(Product.current_stock >= -delta)
+    statement = statement.values(current_stock=Product.current_stock + delta).execution_options(
+        synchronize_session=False
+    )
+    if db.session.execute(statement).rowcount == 0:
+        if db.session.query(Product.id).filter(Product.id == product_id).first() is None:
+            raise LookupError(f'Product {product_id} not found')
+        raise InsufficientStockError(product_id)
+    
+    mark_changed('product', product_id)
+    
+    balance, value, cost_price, min_stock, was_low = db.session.query(
+        Product.current_stock, db.func.coalesce(Product.inventory_value, 0.0), Product.cost_price,
+        Product.min_stock, Product.is_low_stock
+    ).filter(Product.id == product_id).one()
+    if value_delta is None:
+        cost, value = value_movement(balance - delta, value, delta, unit_cost, cost_price)
+    else:
+        cost, value = None, max(value + value_delta, 0.0) if balance > 0 else 0.0
+    now_low = is_low_stock(balance, min_stock)
+    db.session.execute(
+        db.update(Product).where(Product.id == product_id).values(
+            inventory_value=value, is_low_stock=now_low
+        ).execution_options(synchronize_session=False)
+    )
+    record_stock_crossing(product_id, was_low, now_low)
+    
+    # Keep any Product instance already loaded in this session in step with the row
+    instance = db.session.identity_map.get(db.session.identity_key(Product, product_id))
+    if instance is not None:
+        db.session.expire(instance, ['current_stock', 'inventory_value', 'is_low_stock'])
+    return balance, cost
+
+def update_product_stock(product_id, quantity, movement_type, unit_cost=None):
+    """Apply a movement to the product's stock; return the resulting balance and the movement's unit cost."""
+    return apply_stock_delta(product_id, stock_delta(quantity, movement_type), unit_cost=unit_cost)
+
+# Work Center Scheduling
+# Each active work center contributes `capacity` parallel slots. Work orders are
+# placed greedily, in release order, on the slot that frees up first (a min-heap
+# keyed by free time), starting no earlier than their order's scheduled_date.
+SCHEDULE_CHECK_EVERY = 500  # placements between cancellation checks of a scheduling job
+
+class NoActiveWorkCenterError(LookupError):
+    pass
+
+def work_order_duration(work_order):
+    return timedelta(minutes=work_order.estimated_time or 0.0)
+
+def build_slot_heap(centers, now):
+    slots = []
+    for center_id, capacity in centers:
+        for slot in range(max(capacity or 1, 1)):
+            slots.append((now, center_id, slot))
+    heapq.heapify(slots)
+    return slots
+
+def occupy_slots(slots, in_progress, now):
+    # Running work orders stay where they are and block a slot until they are due to finish
+    for work_order in sorted(in_progress, key=lambda wo: wo.started_at or now):
+        free_at, center_id, slot = heapq.heappop(slots)
+        started_at = work_order.started_at or now
+        busy_until = max(now, started_at + work_order_duration(work_order))
+        work_order.planned_start = started_at
+        work_order.planned_end = busy_until
+        heapq.heappush(slots, (max(free_at, busy_until), center_id, slot))
+
+def set_work_order_plan(work_order, center_id, start, end):
+    # Assign only real changes, so rows whose plan stays the same are not rewritten
+    if work_order.work_center_id != center_id:
+        work_order.work_center_id = center_id
+    if work_order.planned_start != start:
+        work_order.planned_start = start
+    if work_order.planned_end != end:
+        work_order.planned_end = end
+
+def place_work_order(slots, work_order, release):
+    free_at, center_id, slot = heapq.heappop(slots)
+    start = max(free_at, release)
+    set_work_order_plan(work_order, center_id, start, start + work_order_duration(work_order))
+    heapq.heappush(slots, (work_order.planned_end, center_id, slot))
+
+def pending_work_orders_query():
+    return WorkOrder.query.join(
+        ManufacturingOrder, ManufacturingOrder.id == WorkOrder.manufacturing_order_id
+    ).options(joinedload(WorkOrder.manufacturing_order).load_only(ManufacturingOrder.scheduled_date)).filter(
+        WorkOrder.state == 'pending'
+    )
+
+def release_time(work_order, now):
+    scheduled = work_order.manufacturing_order.scheduled_date if work_order.manufacturing_order else None
+    return max(now, scheduled) if scheduled else now
+
+def schedule_all_work_orders(check_cancelled=None):
+    """
+    Full recompute across every active work center. Returns the number of orders placed.
+    check_cancelled, if given, is called every SCHEDULE_CHECK_EVERY orders and may raise
+    to stop (the caller then rolls the partial plan back).
+    """
+    now = datetime.utcnow()
+    centers = db.session.query(WorkCenter.id, WorkCenter.capacity).filter(WorkCenter.is_active == True).all()
+    if not centers:
+        raise NoActiveWorkCenterError('No active work center available')
+    active_ids = {center_id for center_id, _ in centers}
+    
+    slots_by_center = {center_id: build_slot_heap([(center_id, capacity)], now) for center_id, capacity in centers}
+    in_progress = WorkOrder.query.filter(
+        WorkOrder.state == 'in_progress', WorkOrder.work_center_id.in_(active_ids)
+    ).all()
+    for center_id, slots in slots_by_center.items():
+        occupy_slots(slots, [wo for wo in in_progress if wo.work_center_id == center_id], now)
+    slots = [slot for center_slots in slots_by_center.values() for slot in center_slots]
+    heapq.heapify(slots)
+    
+    pending = pending_work_orders_query().order_by(
+        ManufacturingOrder.scheduled_date, WorkOrder.manufacturing_order_id, WorkOrder.id
+    ).all()
+    check_cancelled = check_cancelled or (lambda: None)
+    for index, work_order in enumerate(pending):
+        if index % SCHEDULE_CHECK_EVERY == 0:
+            check_cancelled()
+        place_work_order(slots, work_order, release_time(work_order, now))
+    return len(pending)
+
+def appended_slot_heap(now):
+    """
+    Slots positioned after the work already planned on each active center, used to
+    place new work orders incrementally without touching existing assignments.
+    """
+    centers = db.session.query(WorkCenter.id, WorkCenter.capacity).filter(WorkCenter.is_active == True).all()
+    if not centers:
+        raise NoActiveWorkCenterError('No active work center available')
+    
+    # The latest `capacity` planned ends per center describe when its slots free up
+    ranked = db.session.query(
+        WorkOrder.work_center_id.label('center_id'),
+        WorkOrder.planned_end.label('planned_end'),
+        db.func.row_number().over(
+            partition_by=WorkOrder.work_center_id, order_by=WorkOrder.planned_end.desc()
+        ).label('rank')
+    ).filter(
+        WorkOrder.state.in_(['pending', 'in_progress']),
+        WorkOrder.planned_end.isnot(None)
+    ).subquery()
+    busy = {}
+    for center_id, planned_end in db.session.query(ranked.c.center_id, ranked.c.planned_end).join(
+        WorkCenter, WorkCenter.id == ranked.c.center_id
+    ).filter(ranked.c.rank <= db.func.coalesce(WorkCenter.capacity, 1)):
+        busy.setdefault(center_id, []).append(planned_end)
+    
+    slots = []
+    for center_id, capacity in centers:
+        ends = busy.get(center_id, [])
+        for slot in range(max(capacity or 1, 1)):
+            free_at = max(ends[slot], now) if slot < len(ends) else now
+            slots.append((free_at, center_id, slot))
+    heapq.heapify(slots)
+    return slots
+
+def schedule_new_work_order(work_order, scheduled_date):
+    now = datetime.utcnow()
+    release = max(now, scheduled_date) if scheduled_date else now
+    place_work_order(appended_slot_heap(now), work_order, release)
+
+def reschedule_work_center(center_id, since=None):
+    """
+    Incremental repack of one center after a work order on it starts or completes.
+    `since` is that work order's previous planned start: pending orders planned
+    before it keep their place, and only the ones from there on are moved to follow
+    the running work. Rows whose plan does not change are not written.
+    """
+    center = WorkCenter.query.get(center_id)
+    if center is None or not center.is_active:
+        return
+    now = datetime.utcnow()
+    since = min(since, now) if since else now
+    
+    running = WorkOrder.query.filter_by(work_center_id=center_id, state='in_progress').all()
+    pending = pending_work_orders_query().filter(
+        WorkOrder.work_center_id == center_id,
+        db.or_(WorkOrder.planned_start.is_(None), WorkOrder.planned_end > since)
+    ).order_by(
+        WorkOrder.planned_start.is_(None), WorkOrder.planned_start,
+        ManufacturingOrder.scheduled_date, WorkOrder.id
+    ).all()
+    kept = [wo for wo in pending if wo.planned_start is not None and wo.planned_start < since]
+    moved = [wo for wo in pending if wo.planned_start is None or wo.planned_start >= since]
+    
+    # Slots as they stand at `since`: blocked by running work and by kept orders overlapping it
+    slots = build_slot_heap([(center.id, center.capacity)], since)
+    blocked = []
+    for work_order in running:
+        started_at = work_order.started_at or now
+        set_work_order_plan(work_order, center_id, started_at, started_at + work_order_duration(work_order))
+        blocked.append((started_at, max(now, work_order.planned_end)))
+    blocked.extend((wo.planned_start, wo.planned_end) for wo in kept)
+    for _, busy_until in sorted(blocked):
+        free_at, slot_center_id, slot = heapq.heappop(slots)
+        heapq.heappush(slots, (max(free_at, busy_until), slot_center_id, slot))
+    
+    for work_order in moved:
+        place_work_order(slots, work_order, release_time(work_order, now))
+
+# BOM Explosion
+# Flattened leaf requirements are cached per BOM (quantity of each leaf product per
+# unit of the BOM's output). Each entry remembers every product in its tree, so a
+# change to any BOM for one of those products drops exactly the entries it affects.
+# Edits made by other worker processes are noticed through the bom and bom_line
+# version counters (see Response Caching): the cache is emptied when they move, at
+# most VERSION_REFRESH_SECONDS after the edit committed. Product changes that alter
+# explosions (is_raw_material, deletion) also count as a change to bom.
+class BOMCycleError(ValueError):
+    pass
+
+BOM_TABLES = ('bom', 'bom_line')
+VERSIONED_TABLES.update(BOM_TABLES)
+_bom_requirements_cache = {}  # bom_id -> ({product_id: quantity per unit}, product ids in tree)
+_bom_cache_versions = None  # versions of BOM_TABLES the cached entries were built from
+_bom_cache_generation = 0
+_bom_cache_lock = threading.Lock()
+
+def manufacturing_bom_ids(product_ids):
+    """Map each manufactured product to the BOM used to build it (lowest id wins)."""
+    if not product_ids:
+        return {}
+    rows = db.session.query(BOM.product_id, db.func.min(BOM.id)).filter(
+        BOM.product_id.in_(product_ids)
+    ).group_by(BOM.product_id).all()
+    return dict(rows)
+
+def explode_bom_tree(bom_id, memo, path=()):
+    if bom_id in path:
+        raise BOMCycleError(f'BOM {bom_id} is part of a cycle')
+    if bom_id in memo:
+        return memo[bom_id]
+    
+    bom = db.session.query(BOM.product_id, BOM.quantity).filter(BOM.id == bom_id).first()
+    if bom is None:
+        raise LookupError(f'BOM {bom_id} not found')
+    batch_size = bom.quantity or 1.0
+    
+    lines = db.session.query(BOMLine.product_id, BOMLine.quantity, Product.is_raw_material).join(
+        Product, Product.id == BOMLine.product_id
+    ).filter(BOMLine.bom_id == bom_id).all()
+    sub_boms = manufacturing_bom_ids([l.product_id for l in lines if not l.is_raw_material])
+    
+    requirements = {}
+    tree_products = {bom.product_id}
+    for line in lines:
+        per_unit = (line.quantity or 0.0) / batch_size
+        tree_products.add(line.product_id)
+        sub_bom_id = sub_boms.get(line.product_id)
+        if sub_bom_id is None:
+            requirements[line.product_id] = requirements.get(line.product_id, 0.0) + per_unit
+            continue
+        sub_requirements, sub_products = explode_bom_tree(sub_bom_id, memo, path + (bom_id,))
+        tree_products |= sub_products
+        for product_id, quantity in sub_requirements.items():
+            requirements[product_id] = requirements.get(product_id, 0.0) + per_unit * quantity
+    
+    memo[bom_id] = (requirements, frozenset(tree_products))
+    return memo[bom_id]
+
+def bom_leaf_requirements(bom_id):
+    """Leaf (raw or purchased) quantities needed per unit of the BOM's output."""
+    global _bom_cache_versions, _bom_cache_generation
+    versions = tuple(table_versions(BOM_TABLES))
+    with _bom_cache_lock:
+        if versions != _bom_cache_versions:
+            _bom_requirements_cache.clear()
+            _bom_cache_versions = versions
+            _bom_cache_generation += 1
+        cached = _bom_requirements_cache.get(bom_id)
+        generation = _bom_cache_generation
+        memo = dict(_bom_requirements_cache)
+    if cached is not None:
+        return cached[0]
+    
+    requirements = explode_bom_tree(bom_id, memo)[0]
+    with _bom_cache_lock:
+        # Drop the result if a BOM changed while we were walking the tree
+        if generation == _bom_cache_generation:
+            _bom_requirements_cache.update(memo)
+    return requirements
+
+def explode_bom(bom_id, quantity):
+    return {product_id: per_unit * quantity for product_id, per_unit in bom_leaf_requirements(bom_id).items()}
+
+def invalidate_bom_requirements(*product_ids):
+    global _bom_cache_generation
+    changed = set(product_ids)
+    with _bom_cache_lock:
+        _bom_cache_generation += 1
+        stale = [bom_id for bom_id, (_, tree_products) in _bom_requirements_cache.items() if tree_products & changed]
+        for bom_id in stale:
+            del _bom_requirements_cache[bom_id]
+
+def validate_bom_tree(bom_id):
+    # Uncached walk, used before committing a BOM change
+    explode_bom_tree(bom_id, {})
 
 # Authentication Routes
+# Password hashing runs in the bounded pool from password_hashing; when it is saturated
+# the routes answer 503 right away so logins cannot starve the rest of the worker.
+def hashing_busy_response():
+    response = jsonify({'error': 'Too many sign-ins in progress, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -154,10 +1172,15 @@ def register():
     if User.query.filter_by(email=data.get('email')).first():
         return jsonify({'error': 'Email already exists'}), 400
     
+    try:
+        password_hash = password_hasher.hash(data.get('password'))
+    except HashingBusy:
+        return hashing_busy_response()
+    
     user = User(
         username=data.get('username'),
         email=data.get('email'),
-        password_hash=generate_password_hash(data.get('password')),
+        password_hash=password_hash,
         role=data.get('role', 'operator')
     )
     
@@ -171,7 +1194,18 @@ def login():
     data = request.get_json()
     user = User.query.filter_by(username=data.get('username')).first()
     
-    if user and check_password_hash(user.password_hash, data.get('password')):
+    valid = False
+    if user:
+        try:
+            valid, new_hash = password_hasher.verify(user.password_hash, data.get('password'))
+        except HashingBusy:
+            return hashing_busy_response()
+        if valid and new_hash:
+            # Stored with older hash parameters; upgrade while the plain password is at hand
+            user.password_hash = new_hash
+            db.session.commit()
+    
+    if valid:
         session['user_id'] = user.id
         session['username'] = user.username
         session['role'] = user.role
@@ -208,6 +1242,7 @@ def get_current_user():
 # Product Routes
 @app.route('/api/products', methods=['GET'])
 @login_required
+@cached_by_table_version('product')
 def get_products():
     products = Product.query.all()
     return jsonify([{
@@ -219,9 +1254,29 @@ def get_products():
         'min_stock': p.min_stock,
         'cost_price': p.cost_price,
         'is_raw_material': p.is_raw_material,
+        'inventory_value': p.inventory_value or 0.0,
+        'is_low_stock': bool(p.is_low_stock),
         'created_at': p.created_at.isoformat()
     } for p in products])
 
+@app.route('/api/products/low-stock', methods=['GET'])
+@login_required
+@cached_by_table_version('product')
+def get_low_stock_products():
+    """Products at or below their minimum stock, read through the is_low_stock index."""
+    rows = db.session.query(
+        Product.id, Product.name, Product.unit, Product.current_stock, Product.min_stock, Product.is_raw_material
+    ).filter(Product.is_low_stock == True).order_by(Product.name).all()
+    return jsonify([{
+        'id': row[0],
+        'name': row[1],
+        'unit': row[2],
+        'current_stock': row[3],
+        'min_stock': row[4],
+        'shortage': (row[4] or 0.0) - (row[3] or 0.0),
+        'is_raw_material': row[5]
+    } for row in rows])
+
 @app.route('/api/products', methods=['POST'])
 @login_required
 def create_product():
@@ -235,6 +1290,8 @@ def create_product():
         cost_price=data.get('cost_price', 0.0),
         is_raw_material=data.get('is_raw_material', False)
     )
+    product.inventory_value = (product.current_stock or 0.0) * (product.cost_price or 0.0)
+    product.is_low_stock = is_low_stock(product.current_stock, product.min_stock)
     
     db.session.add(product)
     db.session.commit()
@@ -246,16 +1303,30 @@ def create_product():
 def update_product(product_id):
     product = Product.query.get_or_404(product_id)
     data = request.get_json()
+    was_raw_material = product.is_raw_material
     
     product.name = data.get('name', product.name)
     product.description = data.get('description', product.description)
     product.unit = data.get('unit', product.unit)
-    product.current_stock = data.get('current_stock', product.current_stock)
+    if 'current_stock' in data and data['current_stock'] != product.current_stock:
+        # A manual stock correction keeps the average cost
+        _, product.inventory_value = value_movement(
+            product.current_stock or 0.0, product.inventory_value or 0.0,
+            data['current_stock'] - (product.current_stock or 0.0), None, product.cost_price
+        )
+        product.current_stock = data['current_stock']
     product.min_stock = data.get('min_stock', product.min_stock)
     product.cost_price = data.get('cost_price', product.cost_price)
     product.is_raw_material = data.get('is_raw_material', product.is_raw_material)
+    now_low = is_low_stock(product.current_stock, product.min_stock)
+    record_stock_crossing(product_id, product.is_low_stock, now_low)
+    product.is_low_stock = now_low
+    if product.is_raw_material != was_raw_material:
+        mark_changed('bom')  # explosions through this product change in every worker
     
     db.session.commit()
+    if product.is_raw_material != was_raw_material:
+        invalidate_bom_requirements(product_id)
     return jsonify({'message': 'Product updated successfully'})
 
 @app.route('/api/products/<int:product_id>', methods=['DELETE'])
@@ -263,12 +1334,15 @@ def update_product(product_id):
 def delete_product(product_id):
     product = Product.query.get_or_404(product_id)
     db.session.delete(product)
+    mark_changed('bom')
     db.session.commit()
+    invalidate_bom_requirements(product_id)
     return jsonify({'message': 'Product deleted successfully'})
 
 # Work Center Routes
 @app.route('/api/work-centers', methods=['GET'])
 @login_required
+@cached_by_table_version('work_center')
 def get_work_centers():
     centers = WorkCenter.query.all()
     return jsonify([{
@@ -330,8 +1404,9 @@ def delete_work_center(center_id):
 # BOM Routes
 @app.route('/api/boms', methods=['GET'])
 @login_required
+@cached_by_table_version('bom', 'bom_line', 'product')
 def get_boms():
-    boms = BOM.query.all()
+    boms = bom_list_query().all()
     result = []
     
     for bom in boms:
@@ -383,7 +1458,15 @@ def create_bom():
         )
         db.session.add(bom_line)
     
+    db.session.flush()
+    try:
+        validate_bom_tree(bom.id)
+    except BOMCycleError:
+        db.session.rollback()
+        return jsonify({'error': 'BOM components would create a cycle'}), 400
+    
     db.session.commit()
+    invalidate_bom_requirements(bom.product_id)
     return jsonify({'message': 'BOM created successfully', 'id': bom.id}), 201
 
 @app.route('/api/boms/<int:bom_id>', methods=['PUT'])
@@ -400,6 +1483,7 @@ def update_bom(bom_id):
     
     # Delete existing components
     BOMLine.query.filter_by(bom_id=bom_id).delete()
+    mark_changed('bom_line', None, 'deleted')
     
     # Add new components
     for component in data.get('components', []):
@@ -410,7 +1494,15 @@ def update_bom(bom_id):
         )
         db.session.add(bom_line)
     
+    db.session.flush()
+    try:
+        validate_bom_tree(bom.id)
+    except BOMCycleError:
+        db.session.rollback()
+        return jsonify({'error': 'BOM components would create a cycle'}), 400
+    
     db.session.commit()
+    invalidate_bom_requirements(bom.product_id)
     return jsonify({'message': 'BOM updated successfully'})
 
 @app.route('/api/boms/<int:bom_id>', methods=['DELETE'])
@@ -425,19 +1517,39 @@ def delete_bom(bom_id):
     
     # Delete BOM lines first
     BOMLine.query.filter_by(bom_id=bom_id).delete()
+    mark_changed('bom_line', None, 'deleted')
     
     # Delete BOM
+    product_id = bom.product_id
     db.session.delete(bom)
     db.session.commit()
+    invalidate_bom_requirements(product_id)
     
     return jsonify({'message': 'BOM deleted successfully'})
 
+@app.route('/api/boms/<int:bom_id>/explode', methods=['GET'])
+@login_required
+def explode_bom_requirements(bom_id):
+    BOM.query.get_or_404(bom_id)
+    try:
+        quantity = float(request.args.get('quantity', 1.0))
+        requirements = explode_bom(bom_id, quantity)
+    except ValueError as e:
+        return jsonify({'error': str(e) if isinstance(e, BOMCycleError) else 'Invalid quantity'}), 400
+    
+    names = dict(db.session.query(Product.id, Product.name).filter(Product.id.in_(requirements)).all())
+    return jsonify([{
+        'product_id': product_id,
+        'product_name': names.get(product_id, 'Unknown Product'),
+        'quantity': quantity
+    } for product_id, quantity in sorted(requirements.items())])
+
 # Manufacturing Order Routes
 @app.route('/api/manufacturing-orders', methods=['GET'])
 @login_required
 def get_manufacturing_orders():
     state_filter = request.args.get('state')
-    query = ManufacturingOrder.query
+    query = manufacturing_order_list_query()
     
     if state_filter:
         query = query.filter(ManufacturingOrder.state == state_filter)
@@ -490,48 +1602,328 @@ def create_manufacturing_order():
     if bom and bom.production_time > 0:
         work_order = WorkOrder(
             manufacturing_order_id=order.id,
-            work_center_id=1,  # Default work center, should be configurable
             operation_name=f"Produce {bom.product.name}",
             estimated_time=bom.production_time * data.get('quantity_to_produce'),
             assignee_id=data.get('assignee_id')
         )
+        try:
+            schedule_new_work_order(work_order, order.scheduled_date)
+        except NoActiveWorkCenterError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
         db.session.add(work_order)
     
     db.session.commit()
     return jsonify({'message': 'Manufacturing order created successfully', 'id': order.id, 'reference': reference}), 201
 
+# Batch Manufacturing Order Routes
+BATCH_MODES = ['all_or_nothing', 'best_effort']
+MAX_BATCH_SIZE = 500
+
+def parse_batch_mode(data):
+    mode = data.get('mode', 'all_or_nothing')
+    if mode not in BATCH_MODES:
+        raise ValueError(f"mode must be one of {', '.join(BATCH_MODES)}")
+    return mode
+
+@app.route('/api/manufacturing-orders/batch', methods=['POST'])
+@login_required
+def create_manufacturing_orders_batch():
+    """
+    Create many manufacturing orders in one transaction. Body: {"orders": [...], "mode":
+    "all_or_nothing" | "best_effort"}; each entry takes the same fields as the single
+    create endpoint. In best_effort mode invalid entries are skipped and reported.
+    """
+    data = request.get_json() or {}
+    items = data.get('orders') or []
+    try:
+        mode = parse_batch_mode(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not isinstance(items, list) or not items or len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'orders must be a list of 1 to {MAX_BATCH_SIZE} entries'}), 400
+    
+    bom_ids = {item.get('bom_id') for item in items if isinstance(item, dict) and is_id(item.get('bom_id'))}
+    boms = {row.id: row for row in db.session.query(
+        BOM.id, BOM.product_id, BOM.production_time, Product.name.label('product_name')
+    ).join(Product, Product.id == BOM.product_id).filter(BOM.id.in_(bom_ids))}
+    
+    valid = []
+    failed = []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('entry must be an object')
+            for field in ('bom_id', 'product_id', 'assignee_id'):
+                if (field == 'bom_id' or item.get(field) is not None) and not is_id(item.get(field)):
+                    raise ValueError(f'{field} must be an integer')
+            bom = boms.get(item['bom_id'])
+            if bom is None:
+                raise ValueError('BOM not found')
+            quantity = item.get('quantity_to_produce')
+            if isinstance(quantity, bool) or not isinstance(quantity, (int, float)) or quantity <= 0:
+                raise ValueError('quantity_to_produce must be a positive number')
+            scheduled_date = datetime.fromisoformat(item.get('scheduled_date'))
+        except (TypeError, ValueError) as e:
+            failed.append({'index': index, 'error': str(e) if isinstance(e, ValueError) else 'invalid scheduled_date'})
+            continue
+        valid.append((index, item, bom, quantity, scheduled_date))
+    
+    if failed and mode == 'all_or_nothing':
+        return jsonify({'error': 'Batch rejected', 'failed': failed}), 400
+    
+    now = datetime.utcnow()
+    slots = None
+    if any(bom.production_time and bom.production_time > 0 for _, _, bom, _, _ in valid):
+        try:
+            slots = appended_slot_heap(now)
+        except NoActiveWorkCenterError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    references = generate_references('MO', len(valid))
+    created = []
+    for (index, item, bom, quantity, scheduled_date), reference in zip(valid, references):
+        order = ManufacturingOrder(
+            reference=reference,
+            product_id=item.get('product_id', bom.product_id),
+            bom_id=bom.id,
+            quantity_to_produce=quantity,
+            scheduled_date=scheduled_date,
+            assignee_id=item.get('assignee_id')
+        )
+        db.session.add(order)
+        created.append((index, order, bom))
+    db.session.flush()
+    
+    # Place work orders in scheduled order on one shared slot heap
+    for index, order, bom in sorted(created, key=lambda entry: (entry[1].scheduled_date, entry[0])):
+        if not bom.production_time or bom.production_time <= 0:
+            continue
+        work_order = WorkOrder(
+            manufacturing_order_id=order.id,
+            operation_name=f"Produce {bom.product_name}",
+            estimated_time=bom.production_time * order.quantity_to_produce,
+            assignee_id=order.assignee_id
+        )
+        place_work_order(slots, work_order, max(now, order.scheduled_date))
+        db.session.add(work_order)
+    
+    db.session.commit()
+    return jsonify({
+        'message': f'Created {len(created)} manufacturing orders',
+        'created': [{'index': index, 'id': order.id, 'reference': order.reference} for index, order, _ in created],
+        'failed': failed
+    }), 201 if created else 400
+
+@app.route('/api/manufacturing-orders/batch-confirm', methods=['POST'])
+@login_required
+def confirm_manufacturing_orders_batch():
+    """
+    Confirm many manufacturing orders in one transaction. Body: {"order_ids": [...],
+    "mode": "all_or_nothing" | "best_effort"}. Stock feasibility is checked for the
+    whole batch: orders are allocated stock in the given order, and in best_effort
+    mode the ones that no longer fit are skipped and reported.
+    """
+    data = request.get_json() or {}
+    order_ids = data.get('order_ids') or []
+    try:
+        mode = parse_batch_mode(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not isinstance(order_ids, list) or not order_ids or len(order_ids) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'order_ids must be a list of 1 to {MAX_BATCH_SIZE} ids'}), 400
+    valid_ids = [order_id for order_id in order_ids if is_id(order_id)]
+    
+    orders = {order.id: order for order in ManufacturingOrder.query.filter(ManufacturingOrder.id.in_(valid_ids))}
+    consumed_ids = {row[0] for row in db.session.query(StockMovement.manufacturing_order_id).filter(
+        StockMovement.manufacturing_order_id.in_(valid_ids),
+        StockMovement.movement_type == 'consumption'
+    ).distinct()}
+    
+    per_unit = {}
+    for bom_id in {order.bom_id for order in orders.values()}:
+        try:
+            per_unit[bom_id] = bom_leaf_requirements(bom_id)
+        except (BOMCycleError, LookupError) as e:
+            per_unit[bom_id] = e
+    
+    product_ids = {pid for lines in per_unit.values() if isinstance(lines, dict) for pid in lines}
+    products = {row.id: row for row in db.session.query(
+        Product.id, Product.name, Product.cost_price, Product.current_stock
+    ).filter(Product.id.in_(product_ids))}
+    available = {pid: products[pid].current_stock or 0.0 for pid in products}
+    
+    accepted = []
+    failed = []
+    seen = set()
+    for order_id in order_ids:
+        if not is_id(order_id):
+            failed.append({'id': order_id, 'error': 'id must be an integer'})
+            continue
+        order = orders.get(order_id)
+        if order is None or order_id in seen:
+            failed.append({'id': order_id, 'error': 'Manufacturing order not found' if order is None else 'Duplicate id'})
+            continue
+        seen.add(order_id)
+        if order.state not in OPEN_ORDER_STATES:
+            failed.append({'id': order_id, 'error': 'Only planned or in-progress orders can be confirmed'})
+            continue
+        if order_id in consumed_ids:
+            failed.append({'id': order_id, 'error': 'Materials for this order have already been consumed'})
+            continue
+        lines = per_unit[order.bom_id]
+        if not isinstance(lines, dict):
+            failed.append({'id': order_id, 'error': str(lines)})
+            continue
+        
+        requirements = {pid: quantity * order.quantity_to_produce for pid, quantity in lines.items()}
+        shortages = [{
+            'product_id': pid,
+            'product_name': products[pid].name if pid in products else 'Unknown Product',
+            'required': quantity,
+            'available': available.get(pid, 0.0)
+        } for pid, quantity in requirements.items() if available.get(pid, 0.0) < quantity]
+        if shortages:
+            failed.append({'id': order_id, 'error': 'Insufficient stock', 'shortages': shortages})
+            continue
+        for pid, quantity in requirements.items():
+            available[pid] -= quantity
+        accepted.append((order, requirements))
+    
+    if failed and mode == 'all_or_nothing':
+        return jsonify({'error': 'Batch rejected', 'failed': failed}), 400
+    if not accepted:
+        return jsonify({'error': 'No orders could be confirmed', 'failed': failed}), 400
+    
+    accepted_ids = [order.id for order, _ in accepted]
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        db.update(ManufacturingOrder).where(
+            ManufacturingOrder.id.in_(accepted_ids),
+            ManufacturingOrder.state.in_(OPEN_ORDER_STATES)
+        ).values(state='in_progress', started_at=db.func.coalesce(ManufacturingOrder.started_at, now))
+    ).rowcount
+    raced = db.session.query(StockMovement.id).filter(
+        StockMovement.manufacturing_order_id.in_(accepted_ids),
+        StockMovement.movement_type == 'consumption'
+    ).first()
+    if claimed != len(accepted_ids) or raced:
+        db.session.rollback()
+        return jsonify({'error': 'Orders were changed by another request, please retry'}), 409
+    mark_changed('manufacturing_order', accepted_ids)
+    mark_rollup_orders(accepted_ids)
+    
+    # One conditional update per product for the whole batch. Without a value_delta the
+    # product's value drops by the summed quantity at the average cost read under the row
+    # lock, the same cost written to each movement below, so the two always agree
+    totals = {}
+    for _, requirements in accepted:
+        for pid, quantity in requirements.items():
+            totals[pid] = totals.get(pid, 0.0) - quantity
+    balances = {}
+    costs = {}
+    try:
+        for pid in sorted(totals):
+            balance, costs[pid] = apply_stock_delta(pid, totals[pid])
+            balances[pid] = balance - totals[pid]
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({'error': f'Insufficient stock for {products[e.product_id].name}, please retry'}), 409
+    
+    # Running balances start from the pre-batch stock returned by the locked update
+    movements = []
+    for order, requirements in accepted:
+        for pid in sorted(requirements):
+            quantity = requirements[pid]
+            balances[pid] -= quantity
+            unit_cost = costs[pid]
+            movements.append({
+                'product_id': pid,
+                'reference': order.reference,
+                'movement_type': 'consumption',
+                'quantity': quantity,
+                'unit_cost': unit_cost,
+                'total_value': quantity * unit_cost,
+                'manufacturing_order_id': order.id,
+                'created_at': now,
+                'created_by_id': session['user_id'],
+                'balance_after': balances[pid]
+            })
+    if movements:
+        db.session.execute(db.insert(StockMovement), movements)
+        mark_changed('stock_movement', None, 'created')
+    
+    db.session.commit()
+    return jsonify({
+        'message': f'Confirmed {len(accepted_ids)} manufacturing orders',
+        'confirmed': accepted_ids,
+        'failed': failed
+    })
+
 @app.route('/api/manufacturing-orders/<int:order_id>/confirm', methods=['POST'])
 @login_required
 def confirm_manufacturing_order(order_id):
     order = ManufacturingOrder.query.get_or_404(order_id)
-    order.state = 'in_progress'
-    order.started_at = datetime.utcnow()
+    now = datetime.utcnow()
+    
+    # Claim the order first; this write also serializes concurrent confirms
+    claimed = db.session.execute(
+        db.update(ManufacturingOrder).where(
+            ManufacturingOrder.id == order_id,
+            ManufacturingOrder.state.in_(OPEN_ORDER_STATES)
+        ).values(state='in_progress', started_at=db.func.coalesce(ManufacturingOrder.started_at, now))
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return jsonify({'error': 'Only planned or in-progress orders can be confirmed'}), 400
+    mark_changed('manufacturing_order', order_id)
+    mark_rollup_orders(order_id)
+    
+    already_consumed = db.session.query(StockMovement.id).filter(
+        StockMovement.manufacturing_order_id == order_id,
+        StockMovement.movement_type == 'consumption'
+    ).first()
+    if already_consumed:
+        db.session.rollback()
+        return jsonify({'error': 'Materials for this order have already been consumed'}), 400
     
-    # Create stock consumption entries
-    bom = order.bom
-    for component in bom.components:
-        required_qty = component.quantity * order.quantity_to_produce
-        
-        # Check if enough stock available
-        if component.product.current_stock < required_qty:
-            return jsonify({'error': f'Insufficient stock for {component.product.name}'}), 400
-        
-        # Create consumption movement
-        unit_cost = component.product.cost_price or 0.0
-        total_value = required_qty * unit_cost
-        
-        movement = StockMovement(
-            product_id=component.product_id,
-            reference=order.reference,
-            movement_type='consumption',
-            quantity=required_qty,
-            unit_cost=unit_cost,
-            total_value=total_value,
-            manufacturing_order_id=order.id,
-            created_by_id=session['user_id']
-        )
-        db.session.add(movement)
-        update_product_stock(component.product_id, required_qty, 'consumption')
+    # Explode the BOM down to leaf components (sub-assemblies are walked recursively)
+    try:
+        requirements = explode_bom(order.bom_id, order.quantity_to_produce)
+    except BOMCycleError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    products = {p.id: p for p in Product.query.filter(Product.id.in_(requirements)).all()}
+    
+    # Check if enough stock available for every component before consuming any
+    for product_id, required_qty in requirements.items():
+        product = products.get(product_id)
+        if product is None or product.current_stock < required_qty:
+            name = product.name if product else f'product {product_id}'
+            db.session.rollback()
+            return jsonify({'error': f'Insufficient stock for {name}'}), 400
+    
+    # Create stock consumption entries; products are updated in id order so
+    # concurrent transactions take row locks in the same order
+    try:
+        for product_id in sorted(requirements):
+            required_qty = requirements[product_id]
+            
+            movement = StockMovement(
+                product_id=product_id,
+                reference=order.reference,
+                movement_type='consumption',
+                quantity=required_qty,
+                manufacturing_order_id=order.id,
+                created_by_id=session['user_id']
+            )
+            movement.balance_after, movement.unit_cost = update_product_stock(product_id, required_qty, 'consumption')
+            movement.total_value = required_qty * movement.unit_cost
+            db.session.add(movement)
+    except InsufficientStockError as e:
+        # Another request consumed the stock after our check; nothing is kept
+        db.session.rollback()
+        return jsonify({'error': f'Insufficient stock for {products[e.product_id].name}'}), 400
     
     db.session.commit()
     return jsonify({'message': 'Manufacturing order confirmed successfully'})
@@ -540,18 +1932,35 @@ def confirm_manufacturing_order(order_id):
 @login_required
 def complete_manufacturing_order(order_id):
     order = ManufacturingOrder.query.get_or_404(order_id)
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     
-    quantity_produced = data.get('quantity_produced', order.quantity_to_produce)
-    
-    order.state = 'done'
-    order.quantity_produced = quantity_produced
-    order.completed_at = datetime.utcnow()
+    try:
+        quantity_produced = parse_positive_number(data.get('quantity_produced', order.quantity_to_produce))
+    except ValueError:
+        return jsonify({'error': 'Quantity produced must be a positive number'}), 400
+    
+    # Conditional state change so two concurrent completes cannot both produce stock
+    claimed = db.session.execute(
+        db.update(ManufacturingOrder).where(
+            ManufacturingOrder.id == order_id,
+            ManufacturingOrder.state.in_(OPEN_ORDER_STATES)
+        ).values(state='done', quantity_produced=quantity_produced, completed_at=datetime.utcnow())
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return jsonify({'error': 'Only planned or in-progress orders can be completed'}), 400
+    mark_changed('manufacturing_order', order_id)
+    mark_rollup_orders(order_id)
     
     # Complete all associated work orders
     work_orders = WorkOrder.query.filter_by(manufacturing_order_id=order_id).all()
+    freed_centers = {}  # center id -> earliest planned start among the work orders it frees
     for work_order in work_orders:
         if work_order.state != 'completed':
+            planned_start = work_order.planned_start or datetime.utcnow()
+            freed_centers[work_order.work_center_id] = min(
+                freed_centers.get(work_order.work_center_id, planned_start), planned_start
+            )
             work_order.state = 'completed'
             work_order.completed_at = datetime.utcnow()
             # If work order was started, calculate actual time
@@ -565,20 +1974,31 @@ def complete_manufacturing_order(order_id):
     # Create production movement
     product = Product.query.get(order.product_id)
     unit_cost = product.cost_price if product else 0.0
-    total_value = quantity_produced * unit_cost
     
     movement = StockMovement(
         product_id=order.product_id,
         reference=order.reference,
         movement_type='production',
         quantity=quantity_produced,
-        unit_cost=unit_cost,
-        total_value=total_value,
         manufacturing_order_id=order.id,
         created_by_id=session['user_id']
     )
+    try:
+        movement.balance_after, movement.unit_cost = update_product_stock(
+            order.product_id, quantity_produced, 'production', unit_cost
+        )
+    except InsufficientStockError:
+        # Nothing is kept: the order stays open and no work order is closed
+        db.session.rollback()
+        return jsonify({'error': 'Insufficient stock'}), 400
+    except LookupError:
+        db.session.rollback()
+        return jsonify({'error': 'Product not found'}), 400
+    movement.total_value = quantity_produced * movement.unit_cost
     db.session.add(movement)
-    update_product_stock(order.product_id, quantity_produced, 'production')
+    
+    for center_id, since in freed_centers.items():
+        reschedule_work_center(center_id, since)
     
     db.session.commit()
     return jsonify({'message': 'Manufacturing order completed successfully'})
@@ -590,6 +2010,7 @@ def delete_manufacturing_order(order_id):
     
     # Delete associated work orders
     WorkOrder.query.filter_by(manufacturing_order_id=order_id).delete()
+    mark_changed('work_order', None, 'deleted')
     
     # Delete the manufacturing order
     db.session.delete(order)
@@ -602,7 +2023,7 @@ def delete_manufacturing_order(order_id):
 @login_required
 def get_work_orders():
     mo_id = request.args.get('manufacturing_order_id')
-    query = WorkOrder.query
+    query = work_order_list_query()
     
     if mo_id:
         query = query.filter(WorkOrder.manufacturing_order_id == mo_id)
@@ -625,6 +2046,8 @@ def get_work_orders():
             'assignee_name': wo.assignee.username if wo.assignee else None,
             'started_at': wo.started_at.isoformat() if wo.started_at else None,
             'completed_at': wo.completed_at.isoformat() if wo.completed_at else None,
+            'planned_start': wo.planned_start.isoformat() if wo.planned_start else None,
+            'planned_end': wo.planned_end.isoformat() if wo.planned_end else None,
             'notes': wo.notes
         })
     
@@ -643,6 +2066,8 @@ def start_work_order(wo_id):
         manufacturing_order.state = 'in_progress'
         manufacturing_order.started_at = datetime.utcnow()
     
+    reschedule_work_center(work_order.work_center_id, work_order.planned_start)
+    
     db.session.commit()
     return jsonify({'message': 'Work order started successfully'})
 
@@ -679,100 +2104,924 @@ def complete_work_order(wo_id):
             manufacturing_order.state = 'done'
             manufacturing_order.completed_at = datetime.utcnow()
     
+    work_order.planned_end = work_order.completed_at
+    reschedule_work_center(work_order.work_center_id, work_order.planned_start)
+    
     db.session.commit()
     return jsonify({'message': 'Work order completed successfully'})
 
+@app.route('/api/scheduling/run', methods=['POST'])
+@login_required
+def run_scheduler():
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return submit_job_response('scheduling', {})
+    try:
+        scheduled_count = schedule_all_work_orders()
+    except NoActiveWorkCenterError as e:
+        return jsonify({'error': str(e)}), 400
+    db.session.commit()
+    return jsonify({'message': f'Scheduled {scheduled_count} work orders', 'scheduled_count': scheduled_count})
+
 # Stock Movement Routes
 @app.route('/api/stock-movements', methods=['GET'])
 @login_required
 def get_stock_movements():
-    product_id = request.args.get('product_id')
-    query = StockMovement.query
+    """
+    List stock movements, newest first.
+    Filters: product_id, movement_type (in/out group or exact type), search (reference),
+    start_date and end_date. Passing limit and/or cursor switches to keyset pagination
+    on (created_at, id) and returns {'items': [...], 'next_cursor': ...}.
+    """
+    try:
+        query = filter_stock_movements(stock_movement_list_query(), request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid filter value'}), 400
     
-    if product_id:
-        query = query.filter(StockMovement.product_id == product_id)
+    query = query.order_by(StockMovement.created_at.desc(), StockMovement.id.desc())
     
-    movements = query.order_by(StockMovement.created_at.desc()).all()
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return jsonify([serialize_stock_movement(m) for m in query.all()])
     
-    result = []
-    for movement in movements:
-        result.append({
-            'id': movement.id,
-            'product_id': movement.product_id,
-            'product_name': movement.product.name,
-            'reference': movement.reference,
-            'movement_type': movement.movement_type,
-            'quantity': movement.quantity,
-            'unit_cost': movement.unit_cost,
-            'total_value': movement.total_value,
-            'manufacturing_order_id': movement.manufacturing_order_id,
-            'created_at': movement.created_at.isoformat(),
-            'created_by': movement.created_by.username if movement.created_by else None
-        })
+    try:
+        limit = int(request.args.get('limit', STOCK_MOVEMENT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    limit = max(1, min(limit, STOCK_MOVEMENT_MAX_PAGE_SIZE))
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(db.or_(
+            StockMovement.created_at < cursor_created_at,
+            db.and_(StockMovement.created_at == cursor_created_at, StockMovement.id < cursor_id)
+        ))
+    
+    # Fetch one extra row to know whether another page exists
+    movements = query.limit(limit + 1).all()
+    has_more = len(movements) > limit
+    movements = movements[:limit]
+    
+    next_cursor = None
+    if has_more:
+        last = movements[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
     
-    return jsonify(result)
+    return jsonify({
+        'items': [serialize_stock_movement(m) for m in movements],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/stock-movements/export', methods=['GET'])
+@login_required
+def export_stock_movements():
+    """
+    Stream the stock ledger as CSV (default) or NDJSON (?format=ndjson) in chronological
+    order. Accepts the same filters as GET /api/stock-movements.
+    """
+    file_format = request.args.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    
+    query = db.session.query(
+        StockMovement.id,
+        StockMovement.created_at,
+        StockMovement.product_id,
+        Product.name,
+        StockMovement.reference,
+        StockMovement.movement_type,
+        StockMovement.quantity,
+        StockMovement.unit_cost,
+        StockMovement.total_value,
+        StockMovement.balance_after,
+        StockMovement.manufacturing_order_id,
+        User.username
+    ).join(Product, StockMovement.product_id == Product.id).outerjoin(
+        User, StockMovement.created_by_id == User.id
+    )
+    try:
+        query = filter_stock_movements(query, request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid filter value'}), 400
+    
+    query = query.order_by(StockMovement.created_at, StockMovement.id)
+    columns = [
+        'id', 'created_at', 'product_id', 'product_name', 'reference', 'movement_type', 'quantity',
+        'unit_cost', 'total_value', 'balance_after', 'manufacturing_order_id', 'created_by'
+    ]
+    rows = query.yield_per(EXPORT_BATCH_SIZE)
+    filename = f"stock-movements-{datetime.utcnow().strftime('%Y%m%d')}"
+    return stream_export(rows, columns, file_format, filename)
 
 @app.route('/api/stock-movements', methods=['POST'])
 @login_required
 def create_stock_movement():
     data = request.get_json()
+    movement_type = data.get('movement_type')
+    quantity = data.get('quantity')
+    
+    if movement_type not in INCOMING_MOVEMENT_TYPES + OUTGOING_MOVEMENT_TYPES:
+        return jsonify({'error': 'Invalid movement type'}), 400
+    if not isinstance(quantity, (int, float)) or quantity <= 0:
+        return jsonify({'error': 'Quantity must be a positive number'}), 400
+    unit_cost = data.get('unit_cost')
+    if unit_cost is not None and (not isinstance(unit_cost, (int, float)) or unit_cost < 0):
+        return jsonify({'error': 'Unit cost must be a non-negative number'}), 400
     
     movement = StockMovement(
         product_id=data.get('product_id'),
         reference=data.get('reference', ''),
-        movement_type=data.get('movement_type'),
-        quantity=data.get('quantity'),
-        unit_cost=data.get('unit_cost', 0.0),
+        movement_type=movement_type,
+        quantity=quantity,
         created_by_id=session['user_id']
     )
     
+    try:
+        movement.balance_after, movement.unit_cost = update_product_stock(
+            data.get('product_id'), quantity, movement_type, unit_cost
+        )
+    except InsufficientStockError:
+        db.session.rollback()
+        return jsonify({'error': 'Insufficient stock'}), 400
+    except LookupError:
+        db.session.rollback()
+        return jsonify({'error': 'Product not found'}), 400
+    movement.total_value = quantity * movement.unit_cost
     db.session.add(movement)
-    update_product_stock(data.get('product_id'), data.get('quantity'), data.get('movement_type'))
     
     db.session.commit()
     return jsonify({'message': 'Stock movement created successfully', 'id': movement.id}), 201
 
-# Dashboard Routes
-@app.route('/api/dashboard/stats', methods=['GET'])
+# Bulk Stock Import
+def iter_import_records(stream, file_format):
+    """Yield (line_number, record dict) from a CSV or NDJSON byte stream, one line at a time."""
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if file_format == 'ndjson':
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, None
+                continue
+            yield line_number, record if isinstance(record, dict) else None
+    else:
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+
+def parse_import_number(record, field, cast):
+    try:
+        return cast(record.get(field))
+    except (TypeError, ValueError):
+        raise ValueError(f'invalid {field}')
+
+def parse_import_record(record):
+    product_id = parse_import_number(record, 'product_id', int)
+    movement_type = (record.get('movement_type') or '').strip()
+    if movement_type not in INCOMING_MOVEMENT_TYPES + OUTGOING_MOVEMENT_TYPES:
+        raise ValueError('invalid movement_type')
+    quantity = parse_import_number(record, 'quantity', float)
+    if quantity <= 0:
+        raise ValueError('quantity must be positive')
+    unit_cost = None
+    if record.get('unit_cost') not in (None, ''):
+        unit_cost = parse_import_number(record, 'unit_cost', float)
+    return {
+        'product_id': product_id,
+        'movement_type': movement_type,
+        'quantity': quantity,
+        'unit_cost': unit_cost,
+        'reference': record.get('reference') or ''
+    }
+
+def import_file_format(upload):
+    requested = request.args.get('format')
+    if requested in ('csv', 'ndjson'):
+        return requested
+    filename = (upload.filename if upload else '') or ''
+    content_type = (upload.content_type if upload else request.content_type) or ''
+    if filename.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type:
+        return 'ndjson'
+    return 'csv'
+
+@app.route('/api/stock-movements/import', methods=['POST'])
 @login_required
-def get_dashboard_stats():
-    total_orders = ManufacturingOrder.query.count()
-    planned_orders = ManufacturingOrder.query.filter_by(state='planned').count()
-    in_progress_orders = ManufacturingOrder.query.filter_by(state='in_progress').count()
-    completed_orders = ManufacturingOrder.query.filter_by(state='done').count()
+def import_stock_movements():
+    """
+    Bulk-create stock movements from a CSV or NDJSON upload (multipart field `file`
+    or the raw request body). Columns: product_id, movement_type, quantity and
+    optionally unit_cost and reference. Lines are parsed as a stream and written in
+    batches; each batch locks and reads only its own products and updates each of them
+    once with its aggregated delta. Invalid lines are skipped and reported; everything
+    else is written in one transaction.
+    """
+    upload = request.files.get('file')
+    file_format = import_file_format(upload)
+    stream = upload.stream if upload else request.stream
+    
+    now = datetime.utcnow()
+    user_id = session['user_id']
+    
+    batch = []
+    imported = 0
+    errors = []
+    error_count = 0
+    
+    def report(line_number, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+            errors.append({'line': line_number, 'error': message})
+    
+    def write_batch(batch):
+        """Apply a batch's rows to its products and insert the movements that fit; returns how many did."""
+        product_ids = sorted({row['product_id'] for line_number, row in batch})
+        # Lock the batch's products before reading them (a no-op write), so the rows are
+        # checked and valued against stock no other writer can change until we commit
+        lock = db.update(Product).where(Product.id.in_(product_ids)).values(
+            current_stock=Product.current_stock
+        ).execution_options(synchronize_session=False)
+        columns = (Product.id, Product.current_stock, Product.inventory_value, Product.cost_price)
+        if db.session.get_bind().dialect.update_returning:
+            products = db.session.execute(lock.returning(*columns)).all()
+        else:
+            db.session.execute(lock)
+            products = db.session.query(*columns).filter(Product.id.in_(product_ids)).all()
+        balances = {product_id: stock or 0.0 for product_id, stock, _, _ in products}
+        values = {product_id: value or 0.0 for product_id, _, value, _ in products}
+        cost_prices = {product_id: cost_price for product_id, _, _, cost_price in products}
+        
+        deltas = {}
+        value_deltas = {}
+        movements = []
+        for line_number, row in batch:
+            product_id = row['product_id']
+            if product_id not in balances:
+                report(line_number, f'unknown product_id {product_id}')
+                continue
+            delta = stock_delta(row['quantity'], row['movement_type'])
+            if delta < 0 and balances[product_id] + delta < 0:
+                report(line_number, 'insufficient stock')
+                continue
+            unit_cost, value = value_movement(
+                balances[product_id], values[product_id], delta, row['unit_cost'], cost_prices[product_id]
+            )
+            value_deltas[product_id] = value_deltas.get(product_id, 0.0) + value - values[product_id]
+            balances[product_id] += delta
+            values[product_id] = value
+            deltas[product_id] = deltas.get(product_id, 0.0) + delta
+            # balance_after holds the offset from the pre-batch stock until the update below
+            row.update(
+                unit_cost=unit_cost, total_value=row['quantity'] * unit_cost,
+                created_at=now, created_by_id=user_id, balance_after=deltas[product_id]
+            )
+            movements.append(row)
+        
+        # One aggregated update per product, in id order; running balances start from
+        # the pre-batch stock returned by it, as in create_stock_movement
+        starts = {}
+        for product_id in sorted(deltas):
+            balance, _ = apply_stock_delta(product_id, deltas[product_id], value_delta=value_deltas[product_id])
+            starts[product_id] = balance - deltas[product_id]
+        for row in movements:
+            row['balance_after'] += starts[row['product_id']]
+        if movements:
+            db.session.execute(db.insert(StockMovement), movements)
+        return len(movements)
     
-    total_products = Product.query.count()
-    low_stock_products = Product.query.filter(Product.current_stock <= Product.min_stock).count()
+    try:
+        for line_number, record in iter_import_records(stream, file_format):
+            if record is None:
+                report(line_number, 'malformed line')
+                continue
+            try:
+                row = parse_import_record(record)
+            except ValueError as e:
+                report(line_number, str(e))
+                continue
+            batch.append((line_number, row))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                imported += write_batch(batch)
+                batch = []
+        
+        if batch:
+            imported += write_batch(batch)
+        if imported:
+            mark_changed('stock_movement', None, 'created')
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({'error': 'File must be UTF-8 encoded'}), 400
+    except InsufficientStockError as e:
+        # Stock changed underneath the import; keep nothing
+        db.session.rollback()
+        return jsonify({'error': f'Insufficient stock for product {e.product_id}, import rolled back'}), 409
     
-    active_work_centers = WorkCenter.query.filter_by(is_active=True).count()
+    db.session.commit()
+    return jsonify({
+        'message': f'Imported {imported} stock movements',
+        'imported': imported,
+        'error_count': error_count,
+        'errors': sorted(errors, key=lambda error: error['line'])
+    }), 201 if imported else 400
+
+@app.route('/api/stock-movements/summary', methods=['GET'])
+@login_required
+def get_stock_summary():
+    """Per-product totals in/out and closing balance, aggregated in SQL."""
+    signed_in = db.case((StockMovement.movement_type.in_(INCOMING_MOVEMENT_TYPES), StockMovement.quantity), else_=0.0)
+    signed_out = db.case((StockMovement.movement_type.in_(OUTGOING_MOVEMENT_TYPES), StockMovement.quantity), else_=0.0)
+    totals = db.session.query(
+        StockMovement.product_id.label('product_id'),
+        db.func.sum(signed_in).label('total_in'),
+        db.func.sum(signed_out).label('total_out'),
+        db.func.count(StockMovement.id).label('movement_count')
+    ).group_by(StockMovement.product_id).subquery()
+    
+    query = db.session.query(
+        Product.id, Product.name, Product.unit, Product.is_raw_material,
+        Product.current_stock, Product.min_stock,
+        db.func.coalesce(totals.c.total_in, 0.0),
+        db.func.coalesce(totals.c.total_out, 0.0),
+        db.func.coalesce(totals.c.movement_count, 0)
+    ).outerjoin(totals, totals.c.product_id == Product.id)
     
-    # Recent activities
-    recent_movements = StockMovement.query.order_by(StockMovement.created_at.desc()).limit(10).all()
-    recent_work_orders = WorkOrder.query.order_by(WorkOrder.id.desc()).limit(10).all()
+    product_id = request.args.get('product_id')
+    if product_id:
+        query = query.filter(Product.id == product_id)
     
+    return jsonify([{
+        'id': row[0],
+        'name': row[1],
+        'unit': row[2],
+        'is_raw_material': row[3],
+        'current_stock': row[4],
+        'min_stock': row[5],
+        'total_in': row[6],
+        'total_out': row[7],
+        'movement_count': row[8],
+        'closing_balance': row[4]
+    } for row in query.order_by(Product.name).all()])
+
+@app.route('/api/inventory/valuation', methods=['GET'])
+@login_required
+def get_inventory_valuation():
+    """
+    Current stock value per product and in total, read from the moving average value
+    kept on each product as movements are written (no ledger scan).
+    """
+    value = db.func.coalesce(Product.inventory_value, 0.0)
+    query = db.session.query(Product.id, Product.name, Product.unit, Product.current_stock, value)
+    product_id = request.args.get('product_id')
+    if product_id:
+        query = query.filter(Product.id == product_id)
+    
+    products = [{
+        'id': row[0],
+        'name': row[1],
+        'unit': row[2],
+        'current_stock': row[3],
+        'average_cost': row[4] / row[3] if row[3] and row[3] > 0 else 0.0,
+        'inventory_value': row[4]
+    } for row in query.order_by(value.desc(), Product.name).all()]
     return jsonify({
+        'total_value': sum(p['inventory_value'] for p in products),
+        'products': products
+    })
+
+# Stock Checkpoints
+# StockCheckpoint rows record each product's balance at a point in time, written for
+# every product that moved since the previous checkpoint. A point-in-time query reads
+# the newest checkpoint before the requested moment and adds only the movements after
+# it; products without an earlier checkpoint fall back to the running balance of their
+# last movement. Checkpoints stop CHECKPOINT_LAG short of now so transactions still in
+# flight cannot add movements before them. Set MANUFLOW_STOCK_CHECKPOINT_INTERVAL to
+# take them in the background; build_checkpoints.py fills in existing history.
+CHECKPOINT_INTERVAL_SECONDS = float(os.environ.get('MANUFLOW_STOCK_CHECKPOINT_INTERVAL', 0))
+CHECKPOINT_LAG = timedelta(minutes=5)
+STOCK_CHECKPOINT = 'stock_checkpoint'
+
+def signed_quantity():
+    return db.case(
+        (StockMovement.movement_type.in_(INCOMING_MOVEMENT_TYPES), StockMovement.quantity),
+        (StockMovement.movement_type.in_(OUTGOING_MOVEMENT_TYPES), -StockMovement.quantity),
+        else_=0.0
+    )
+
+def balance_before(moment):
+    """Per-product subquery: the running balance after the last movement created before moment."""
+    return db.session.query(StockMovement.balance_after).filter(
+        StockMovement.product_id == Product.id, StockMovement.created_at < moment
+    ).order_by(StockMovement.created_at.desc(), StockMovement.id.desc()).limit(1).scalar_subquery()
+
+def take_stock_checkpoint(since, cutoff):
+    """Checkpoint every product with movements in [since, cutoff); returns how many rows were written."""
+    moved = db.session.query(StockMovement.product_id).filter(StockMovement.created_at < cutoff)
+    if since is not None:
+        moved = moved.filter(StockMovement.created_at >= since)
+    rows = [{'product_id': product_id, 'taken_at': cutoff, 'balance': balance or 0.0}
+            for product_id, balance in db.session.query(Product.id, balance_before(cutoff)).filter(
+                Product.id.in_(moved.distinct().scalar_subquery())
+            )]
+    if rows:
+        db.session.execute(db.insert(StockCheckpoint), rows)
+    return len(rows)
+
+def checkpoint_stock(period=None):
+    """
+    Write checkpoints from the last one up to CHECKPOINT_LAG before now: one at the end,
+    or one per `period` boundary when given (used to backfill history). Each checkpoint
+    commits with the watermark, so an interrupted run resumes where it stopped.
+    Returns the number of rows written.
+    """
+    watermark = db.session.get(SyncWatermark, STOCK_CHECKPOINT)
+    if watermark is None:
+        watermark = SyncWatermark(name=STOCK_CHECKPOINT)
+        db.session.add(watermark)
+    since = watermark.value
+    end = datetime.utcnow() - CHECKPOINT_LAG
+    
+    cutoffs = []
+    if period:
+        start = since or db.session.query(db.func.min(StockMovement.created_at)).scalar()
+        if start is not None:
+            cutoff = datetime.combine(start.date(), datetime.min.time()) + period
+            while cutoff < end:
+                cutoffs.append(cutoff)
+                cutoff += period
+    if since is None or end > since:
+        cutoffs.append(end)
+    
+    written = 0
+    for cutoff in cutoffs:
+        written += take_stock_checkpoint(since, cutoff)
+        watermark.value = since = cutoff
+        watermark.updated_at = datetime.utcnow()
+        db.session.commit()
+    return written
+
+def stock_as_of(moment, product_id=None):
+    """(product id, name, unit, stock) for every product that existed at moment."""
+    # Explicitly correlated: checkpoint_taken is also nested inside moved_since
+    latest = db.session.query(StockCheckpoint).filter(
+        StockCheckpoint.product_id == Product.id, StockCheckpoint.taken_at <= moment
+    ).order_by(StockCheckpoint.taken_at.desc()).limit(1).correlate(Product)
+    checkpoint_taken = latest.with_entities(StockCheckpoint.taken_at).scalar_subquery()
+    checkpoint_balance = latest.with_entities(StockCheckpoint.balance).scalar_subquery()
+    moved_since = db.session.query(db.func.coalesce(db.func.sum(signed_quantity()), 0.0)).filter(
+        StockMovement.product_id == Product.id,
+        StockMovement.created_at >= checkpoint_taken,
+        StockMovement.created_at < moment
+    ).scalar_subquery()
+    # Stock a product was created with, before its first movement
+    first_movement = db.session.query(StockMovement.balance_after - signed_quantity()).filter(
+        StockMovement.product_id == Product.id
+    ).order_by(StockMovement.created_at, StockMovement.id).limit(1).scalar_subquery()
+    
+    stock = db.func.coalesce(
+        db.case((checkpoint_taken.is_(None), balance_before(moment)), else_=checkpoint_balance + moved_since),
+        first_movement,
+        Product.current_stock
+    )
+    query = db.session.query(Product.id, Product.name, Product.unit, stock).filter(Product.created_at < moment)
+    if product_id:
+        query = query.filter(Product.id == product_id)
+    return query.order_by(Product.name).all()
+
+@app.route('/api/stock-movements/as-of', methods=['GET'])
+@login_required
+def get_stock_as_of():
+    """Stock per product at a point in time: ?at=<ISO date or datetime>, optional product_id."""
+    if not request.args.get('at'):
+        return jsonify({'error': 'at is required'}), 400
+    try:
+        moment = parse_date_arg(request.args['at'], end_of_day=True)
+    except ValueError:
+        return jsonify({'error': 'at must be an ISO date or datetime'}), 400
+    
+    return jsonify({
+        'as_of': moment.isoformat(),
+        'products': [{
+            'id': row[0],
+            'name': row[1],
+            'unit': row[2],
+            'stock': row[3]
+        } for row in stock_as_of(moment, request.args.get('product_id', type=int))]
+    })
+
+# Material Requirements Planning
+
+def run_mrp(check_cancelled=None):
+    """
+    Net the exploded requirements of every open manufacturing order against current
+    stock and what those orders have already consumed. Stock is allocated to orders
+    by scheduled date, so the orders listed under a shortage are the ones left uncovered.
+    check_cancelled, if given, is called between the phases and may raise to stop.
+    """
+    check_cancelled = check_cancelled or (lambda: None)
+    orders = db.session.query(
+        ManufacturingOrder.id, ManufacturingOrder.reference, ManufacturingOrder.bom_id,
+        ManufacturingOrder.quantity_to_produce, ManufacturingOrder.scheduled_date
+    ).filter(ManufacturingOrder.state.in_(OPEN_ORDER_STATES)).order_by(
+        ManufacturingOrder.scheduled_date, ManufacturingOrder.id
+    ).all()
+    
+    consumed = {}
+    consumed_rows = db.session.query(
+        StockMovement.manufacturing_order_id, StockMovement.product_id, db.func.sum(StockMovement.quantity)
+    ).join(ManufacturingOrder, ManufacturingOrder.id == StockMovement.manufacturing_order_id).filter(
+        ManufacturingOrder.state.in_(OPEN_ORDER_STATES),
+        StockMovement.movement_type == 'consumption'
+    ).group_by(StockMovement.manufacturing_order_id, StockMovement.product_id)
+    for order_id, product_id, quantity in consumed_rows:
+        consumed[(order_id, product_id)] = quantity or 0.0
+    check_cancelled()
+    
+    # Explode each distinct BOM once; the explosion cache makes repeat runs cheap
+    per_unit = {}
+    errors = []
+    for bom_id in {order.bom_id for order in orders}:
+        try:
+            per_unit[bom_id] = list(bom_leaf_requirements(bom_id).items())
+        except (BOMCycleError, LookupError) as e:
+            errors.append({'bom_id': bom_id, 'error': str(e)})
+    check_cancelled()
+    
+    product_ids = {product_id for lines in per_unit.values() for product_id, _ in lines}
+    products = {}
+    if product_ids:
+        products = {row.id: row for row in db.session.query(
+            Product.id, Product.name, Product.unit, Product.current_stock
+        ).filter(Product.id.in_(product_ids))}
+    
+    gross = dict.fromkeys(product_ids, 0.0)
+    already_consumed = dict.fromkeys(product_ids, 0.0)
+    available = {product_id: (products[product_id].current_stock or 0.0) if product_id in products else 0.0
+                 for product_id in product_ids}
+    short_orders = {}
+    
+    # Single pass over (order, leaf component) pairs in scheduled order
+    for order in orders:
+        lines = per_unit.get(order.bom_id)
+        if lines is None:
+            continue
+        for product_id, quantity_per_unit in lines:
+            required = quantity_per_unit * order.quantity_to_produce
+            done = min(consumed.get((order.id, product_id), 0.0), required)
+            gross[product_id] += required
+            already_consumed[product_id] += done
+            
+            remaining = required - done
+            if remaining <= 1e-9:
+                continue
+            covered = min(max(available[product_id], 0.0), remaining)
+            available[product_id] -= remaining
+            if remaining - covered > 1e-9:
+                short_orders.setdefault(product_id, []).append({
+                    'id': order.id,
+                    'reference': order.reference,
+                    'scheduled_date': order.scheduled_date.isoformat(),
+                    'required': remaining,
+                    'shortage': remaining - covered
+                })
+    
+    result = []
+    for product_id in product_ids:
+        product = products.get(product_id)
+        on_hand = product.current_stock if product else 0.0
+        net_requirement = gross[product_id] - already_consumed[product_id]
+        result.append({
+            'product_id': product_id,
+            'product_name': product.name if product else 'Unknown Product',
+            'unit': product.unit if product else None,
+            'gross_requirement': gross[product_id],
+            'already_consumed': already_consumed[product_id],
+            'net_requirement': net_requirement,
+            'on_hand': on_hand,
+            'shortage': max(net_requirement - max(on_hand or 0.0, 0.0), 0.0),
+            'orders': short_orders.get(product_id, [])
+        })
+    result.sort(key=lambda row: (-row['shortage'], row['product_name']))
+    
+    return {
+        'generated_at': datetime.utcnow().isoformat(),
+        'orders_considered': len(orders),
+        'shortage_count': sum(1 for row in result if row['shortage'] > 0),
+        'products': result,
+        'errors': errors
+    }
+
+@app.route('/api/mrp/run', methods=['POST'])
+@login_required
+def mrp_run():
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return submit_job_response('mrp', {})
+    return jsonify(run_mrp())
+
+# Server-Sent Events
+# Committed changes to the tables below are pushed to /api/events/stream. The
+# committing transaction writes them to change_event, numbered by the change_event
+# counter in table_version: its row stays locked until commit, so ids follow commit
+# order and never repeat, and they survive restarts. Every serving process polls the
+# table (at once after its own commits) into one shared ring buffer, and all of its
+# subscribers wait on a single condition, so a stream carries commits from every
+# process and publishing costs the same for one or a thousand clients. Serve the
+# stream from gevent workers so each open stream is a greenlet, not a thread (see
+# README). Clients keep a slow poll as a fallback.
+EVENT_TABLES = {'manufacturing_order', 'work_order', 'stock_movement', 'product'}
+EVENT_HISTORY_SIZE = 1000
+EVENT_BULK_THRESHOLD = 50  # more rows than this per table in one commit collapse into one bulk event
+EVENT_HEARTBEAT_SECONDS = 15
+EVENT_POLL_SECONDS = float(os.environ.get('MANUFLOW_EVENT_POLL_INTERVAL', 0.5))
+EVENT_RETENTION = 10000  # newest events kept in change_event
+EVENT_TRIM_EVERY = 500  # events between deletions of older ones
+
+class ChangeBroker:
+    def __init__(self, history_size):
+        self._history = collections.deque(maxlen=history_size)
+        self._sequence = 0
+        self._condition = threading.Condition()
+    
+    @property
+    def sequence(self):
+        return self._sequence
+    
+    def reset(self, sequence, entries):
+        """Start from `sequence` with the newest stored events (event id, event, payload) buffered."""
+        with self._condition:
+            self._history.clear()
+            self._history.extend(entries)
+            self._sequence = sequence
+            self._condition.notify_all()
+    
+    def publish(self, event_id, event, payload):
+        with self._condition:
+            self._sequence = event_id
+            self._history.append((event_id, event, payload))
+            self._condition.notify_all()
+    
+    def read_since(self, sequence):
+        """Return (events after sequence, False) or (None, True) if the client fell too far behind."""
+        with self._condition:
+            # Ahead of us after the database was replaced, or behind the oldest buffered event
+            if sequence > self._sequence:
+                return None, True
+            if sequence < self._sequence and (not self._history or sequence < self._history[0][0] - 1):
+                return None, True
+            return [entry for entry in self._history if entry[0] > sequence], False
+    
+    def wait(self, sequence, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence > sequence, timeout)
+
+change_broker = ChangeBroker(EVENT_HISTORY_SIZE)
+event_poll_wakeup = threading.Event()
+_event_poller = None
+_event_poller_lock = threading.Lock()
+
+def summarize_changes(changes):
+    per_table = {}
+    for table, row_id, op in changes:
+        if table in EVENT_TABLES and op not in STOCK_CROSSING_OPS:
+            per_table.setdefault(table, {})[(row_id, op)] = None  # ordered de-duplication
+    events = []
+    for table, rows in per_table.items():
+        if len(rows) > EVENT_BULK_THRESHOLD or any(row_id is None for row_id, _ in rows):
+            events.append({'table': table, 'id': None, 'op': 'bulk'})
+            continue
+        events.extend({'table': table, 'id': row_id, 'op': op} for row_id, op in rows)
+    return events
+
+def low_stock_crossings(changes):
+    # Only net crossings: a product that dipped below its minimum and recovered within
+    # one transaction produces no event
+    first_op = {}
+    last_op = {}
+    for table, row_id, op in changes:
+        if table == 'product' and op in STOCK_CROSSING_OPS:
+            first_op.setdefault(row_id, op)
+            last_op[row_id] = op
+    return [{'id': product_id, 'low_stock': op == 'low_stock'}
+            for product_id, op in last_op.items() if first_op[product_id] == op]
+
+def change_events(changes):
+    """The (event, payload) pairs a transaction with these changes announces."""
+    at = datetime.utcnow().isoformat()
+    events = []
+    changed = summarize_changes(changes)
+    if changed:
+        events.append(('change', {'changes': changed, 'at': at}))
+    crossed = low_stock_crossings(changes)
+    if crossed:
+        events.append(('low_stock', {'products': crossed, 'at': at}))
+    return events
+
+@event.listens_for(db.session, 'before_commit')
+def record_change_events(session):
+    session.flush()
+    events = change_events(session.info.get('pending_changes', []))
+    if not events:
+        return
+    bump = db.update(TableVersion).where(TableVersion.table_name == ChangeEvent.__tablename__).values(
+        version=TableVersion.version + len(events)
+    )
+    if session.get_bind().dialect.update_returning:
+        last_id = session.execute(bump.returning(TableVersion.version)).scalar_one()
+    else:
+        session.execute(bump)
+        last_id = session.query(TableVersion.version).filter(
+            TableVersion.table_name == ChangeEvent.__tablename__
+        ).scalar()
+    first_id = last_id - len(events) + 1
+    now = datetime.utcnow()
+    session.execute(db.insert(ChangeEvent), [
+        {'id': first_id + index, 'event': event, 'payload': json.dumps(payload), 'created_at': now}
+        for index, (event, payload) in enumerate(events)
+    ])
+    if (first_id - 1) // EVENT_TRIM_EVERY != last_id // EVENT_TRIM_EVERY:
+        session.execute(db.delete(ChangeEvent).where(ChangeEvent.id <= last_id - EVENT_RETENTION))
+    session.info['recorded_change_events'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def wake_event_poller(session):
+    if session.info.pop('recorded_change_events', None):
+        event_poll_wakeup.set()
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_recorded_change_events(session):
+    session.info.pop('recorded_change_events', None)
+
+def stored_change_events(after=None, limit=EVENT_HISTORY_SIZE):
+    """Up to `limit` stored events after the id `after`, or the newest ones, oldest first."""
+    query = db.session.query(ChangeEvent.id, ChangeEvent.event, ChangeEvent.payload)
+    if after is None:
+        rows = query.order_by(ChangeEvent.id.desc()).limit(limit).all()[::-1]
+    else:
+        rows = query.filter(ChangeEvent.id > after).order_by(ChangeEvent.id).limit(limit).all()
+    return [(event_id, event, json.loads(payload)) for event_id, event, payload in rows]
+
+def poll_change_events():
+    while True:
+        event_poll_wakeup.wait(EVENT_POLL_SECONDS)
+        event_poll_wakeup.clear()
+        with app.app_context():
+            try:
+                while True:
+                    events = stored_change_events(change_broker.sequence)
+                    for entry in events:
+                        change_broker.publish(*entry)
+                    if len(events) < EVENT_HISTORY_SIZE:
+                        break
+            except Exception:
+                app.logger.exception('Change event poll failed')
+
+def ensure_event_poller():
+    """Fill the broker from change_event and start this process's poller, once."""
+    global _event_poller
+    with _event_poller_lock:
+        if _event_poller is not None:
+            return
+        # Buffer the newest stored events, so clients resuming after a restart catch up
+        events = stored_change_events()
+        sequence = db.session.query(TableVersion.version).filter(
+            TableVersion.table_name == ChangeEvent.__tablename__
+        ).scalar() or 0
+        change_broker.reset(events[-1][0] if events else sequence, events)
+        _event_poller = threading.Thread(target=poll_change_events, name='change-event-poller', daemon=True)
+        _event_poller.start()
+
+def format_sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+@app.route('/api/events/stream', methods=['GET'])
+@login_required
+def stream_change_events():
+    """
+    Stream committed changes as `change` events, and products crossing their minimum
+    stock as `low_stock` events. Reconnecting clients resume from the
+    Last-Event-ID header (or ?since=); a `reset` event means events were missed and the
+    client should refetch.
+    """
+    ensure_event_poller()
+    try:
+        last_seen = int(request.headers.get('Last-Event-ID') or request.args.get('since') or change_broker.sequence)
+    except ValueError:
+        last_seen = change_broker.sequence
+    
+    def generate():
+        sequence = last_seen
+        yield 'retry: 3000\n\n'
+        while True:
+            events, missed = change_broker.read_since(sequence)
+            if missed:
+                sequence = change_broker.sequence
+                yield format_sse('reset', {'sequence': sequence}, sequence)
+                continue
+            for event_id, event, payload in events:
+                sequence = event_id
+                yield format_sse(event, payload, event_id)
+            if not events:
+                yield ': heartbeat\n\n'
+            change_broker.wait(sequence, EVENT_HEARTBEAT_SECONDS)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Dashboard Statistics
+# Computed with one aggregate statement and cached in-process against the versions of
+# DASHBOARD_TABLES, so commits from any process make the next read recompute. Local
+# commits also drop the cache at once and bump the generation, so a computation that
+# overlapped one of them is not stored.
+DASHBOARD_TABLES = ('manufacturing_order', 'product', 'work_center', 'stock_movement', 'work_order')
+VERSIONED_TABLES.update(DASHBOARD_TABLES)
+RECENT_ACTIVITY_LIMIT = 10
+
+_dashboard_cache = {'stats': None, 'versions': None, 'generation': 0}
+_dashboard_cache_lock = threading.Lock()
+
+def compute_dashboard_stats():
+    def count_of(query):
+        return db.select(db.func.count()).select_from(query.subquery()).scalar_subquery()
+    
+    recent_movements = db.select(StockMovement.id).order_by(StockMovement.created_at.desc()).limit(RECENT_ACTIVITY_LIMIT)
+    recent_work_orders = db.select(WorkOrder.id).order_by(WorkOrder.id.desc()).limit(RECENT_ACTIVITY_LIMIT)
+    
+    def state_count(state):
+        return db.func.coalesce(db.func.sum(db.case((ManufacturingOrder.state == state, 1), else_=0)), 0)
+    
+    row = db.session.execute(db.select(
+        db.func.count(ManufacturingOrder.id),
+        state_count('planned'),
+        state_count('in_progress'),
+        state_count('done'),
+        count_of(db.select(Product.id)),
+        count_of(db.select(Product.id).where(Product.is_low_stock == True)),
+        count_of(db.select(WorkCenter.id).where(WorkCenter.is_active == True)),
+        count_of(recent_movements),
+        count_of(recent_work_orders)
+    ).select_from(ManufacturingOrder)).one()
+    
+    return {
         'orders': {
-            'total': total_orders,
-            'planned': planned_orders,
-            'in_progress': in_progress_orders,
-            'completed': completed_orders
+            'total': row[0],
+            'planned': row[1],
+            'in_progress': row[2],
+            'completed': row[3]
         },
         'products': {
-            'total': total_products,
-            'low_stock': low_stock_products
+            'total': row[4],
+            'low_stock': row[5]
         },
         'work_centers': {
-            'active': active_work_centers
+            'active': row[6]
         },
         'recent_activities': {
-            'stock_movements': len(recent_movements),
-            'work_orders': len(recent_work_orders)
+            'stock_movements': row[7],
+            'work_orders': row[8]
         }
-    })
+    }
+
+def cached_dashboard_stats():
+    versions = tuple(table_versions(DASHBOARD_TABLES))
+    with _dashboard_cache_lock:
+        if _dashboard_cache['stats'] is not None and _dashboard_cache['versions'] == versions:
+            return _dashboard_cache['stats']
+        generation = _dashboard_cache['generation']
+    stats = compute_dashboard_stats()
+    with _dashboard_cache_lock:
+        # Drop the result if a commit in this process invalidated it while we computed
+        if generation == _dashboard_cache['generation']:
+            _dashboard_cache['stats'] = stats
+            _dashboard_cache['versions'] = versions
+    return stats
+
+@on_changes_committed
+def invalidate_dashboard_stats(changes):
+    if changed_tables(changes) & set(DASHBOARD_TABLES):
+        with _dashboard_cache_lock:
+            _dashboard_cache['stats'] = None
+            _dashboard_cache['generation'] += 1
+
+# Dashboard Routes
+@app.route('/api/dashboard/stats', methods=['GET'])
+@login_required
+def get_dashboard_stats():
+    return jsonify(cached_dashboard_stats())
 
 # Users Routes (for assignee selection)
 @app.route('/api/users', methods=['GET'])
 @login_required
+@cached_by_table_version('user')
 def get_users():
     users = User.query.filter_by(is_active=True).all()
     return jsonify([{
@@ -782,95 +3031,854 @@ def get_users():
         'role': u.role
     } for u in users])
 
-# Sync Work Orders with Manufacturing Orders
+# Background Tasks
+# Periodic maintenance (work order sync, stock checkpoints) runs on daemon threads,
+# each pass in a fresh app context. Every task is idempotent, so running it from
+# several worker processes at once is harmless.
+def run_periodically(interval, task, description):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                task()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('%s failed', description)
+
+def start_periodic_task(interval, task, description):
+    if interval > 0:
+        threading.Thread(
+            target=run_periodically, args=(interval, task, description), name=description, daemon=True
+        ).start()
+
+# Work Order Sync
+# Work orders left open under a done manufacturing order are closed with a single
+# UPDATE that takes completed_at from the order and computes actual_time in SQL. The
+# incremental mode only looks at orders completed since the stored watermark (minus
+# SYNC_OVERLAP, so orders whose completion committed late are not skipped); the
+# background thread runs it every MANUFLOW_WORK_ORDER_SYNC_INTERVAL seconds (0 = off).
+SYNC_INTERVAL_SECONDS = float(os.environ.get('MANUFLOW_WORK_ORDER_SYNC_INTERVAL', 0))
+SYNC_OVERLAP = timedelta(minutes=5)
+WORK_ORDER_SYNC = 'work_order_sync'
+
+def minutes_between(start, end):
+    if db.engine.dialect.name == 'sqlite':
+        return (db.func.julianday(end) - db.func.julianday(start)) * 1440.0
+    return db.func.extract('epoch', end - start) / 60.0
+
+def complete_work_orders_of_done_orders(since=None):
+    """Close open work orders whose manufacturing order is done; returns how many were closed."""
+    done_orders = db.session.query(ManufacturingOrder.id).filter(ManufacturingOrder.state == 'done')
+    if since is not None:
+        # Orders marked done without a completion date have no place on the watermark,
+        # so they are checked on every pass (once closed, their work orders drop out)
+        done_orders = done_orders.filter(db.or_(
+            ManufacturingOrder.completed_at >= since, ManufacturingOrder.completed_at.is_(None)
+        ))
+    open_work_orders = db.and_(
+        WorkOrder.manufacturing_order_id.in_(done_orders.scalar_subquery()),
+        WorkOrder.state != 'completed'
+    )
+    
+    completed_at = db.session.query(
+        db.func.coalesce(ManufacturingOrder.completed_at, datetime.utcnow())
+    ).filter(ManufacturingOrder.id == WorkOrder.manufacturing_order_id).scalar_subquery()
+    actual_time = db.case(
+        (WorkOrder.started_at.isnot(None), minutes_between(WorkOrder.started_at, completed_at)),
+        else_=WorkOrder.estimated_time
+    )
+    close = db.update(WorkOrder).where(open_work_orders).values(
+        state='completed', completed_at=completed_at, actual_time=actual_time
+    )
+    options = {'synchronize_session': False}
+    if db.session.get_bind().dialect.update_returning:
+        closed = db.session.execute(
+            close.returning(WorkOrder.id, WorkOrder.manufacturing_order_id), execution_options=options
+        ).all()
+    else:
+        closed = db.session.query(WorkOrder.id, WorkOrder.manufacturing_order_id).filter(open_work_orders).all()
+        db.session.execute(close, execution_options=options)
+    mark_changed('work_order', [work_order_id for work_order_id, _ in closed])
+    mark_rollup_orders(order_id for _, order_id in closed)
+    return len(closed)
+
+def sync_work_order_states(incremental=True):
+    """Run one reconciliation pass, advance the watermark and commit. Returns the number synced."""
+    watermark = db.session.get(SyncWatermark, WORK_ORDER_SYNC)
+    since = None
+    if incremental and watermark and watermark.value:
+        since = watermark.value - SYNC_OVERLAP
+    # Read before syncing, so orders completed meanwhile stay above the next pass's cutoff;
+    # capped at the current time so future-dated completions are rechecked on every pass
+    newest = db.session.query(db.func.max(ManufacturingOrder.completed_at)).filter(
+        ManufacturingOrder.state == 'done'
+    ).scalar()
+    if newest:
+        newest = min(newest, datetime.utcnow())
+    
+    synced_count = complete_work_orders_of_done_orders(since)
+    if watermark is None:
+        watermark = SyncWatermark(name=WORK_ORDER_SYNC)
+        db.session.add(watermark)
+    if newest and (watermark.value is None or newest > watermark.value):
+        watermark.value = newest
+    watermark.updated_at = datetime.utcnow()
+    db.session.commit()
+    return synced_count
+
+def periodic_work_order_sync():
+    synced_count = sync_work_order_states()
+    if synced_count:
+        app.logger.info('Work order sync closed %d work orders', synced_count)
+
 @app.route('/api/work-orders/sync', methods=['POST'])
 @login_required
 def sync_work_orders():
     """
     Sync work orders with their manufacturing orders.
     This will complete work orders whose manufacturing orders are already completed.
+    Pass ?incremental=true to only check orders completed since the last sync, and
+    ?async=true to queue it as a background job instead.
     """
+    incremental = request.args.get('incremental', '').lower() in ('1', 'true', 'yes')
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return submit_job_response('work_order_sync', {'incremental': incremental})
     try:
-        # Find all completed manufacturing orders
-        completed_manufacturing_orders = ManufacturingOrder.query.filter_by(state='done').all()
-        
-        synced_count = 0
-        for mo in completed_manufacturing_orders:
-            # Find all work orders for this manufacturing order that are not completed
-            work_orders = WorkOrder.query.filter(
-                WorkOrder.manufacturing_order_id == mo.id,
-                WorkOrder.state != 'completed'
-            ).all()
-            
-            for work_order in work_orders:
-                work_order.state = 'completed'
-                work_order.completed_at = mo.completed_at or datetime.utcnow()
-                
-                # If work order was started, calculate actual time
-                if work_order.started_at:
-                    time_diff = work_order.completed_at - work_order.started_at
-                    work_order.actual_time = time_diff.total_seconds() / 60  # in minutes
-                else:
-                    # If work order was never started, use estimated time as actual time
-                    work_order.actual_time = work_order.estimated_time
-                
-                synced_count += 1
-        
-        db.session.commit()
+        synced_count = sync_work_order_states(incremental)
         
         return jsonify({
             'message': f'Successfully synced {synced_count} work orders with completed manufacturing orders',
-            'synced_count': synced_count
+            'synced_count': synced_count,
+            'incremental': incremental
         }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to sync work orders: {str(e)}'}), 500
 
+# Data Export
+# Exports run one statement and stream its rows as they are fetched (yield_per keeps
+# only EXPORT_BATCH_SIZE rows in memory), writing CSV or NDJSON in chunks, so memory
+# stays flat however long the requested period is.
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+class EchoWriter:
+    """File-like object for csv.writer that returns each line instead of buffering it."""
+    def write(self, value):
+        return value
+
+def export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def stream_export(rows, columns, file_format, filename):
+    """Stream an iterable of row tuples (in `columns` order) as a CSV or NDJSON download."""
+    def generate():
+        chunk = []
+        if file_format == 'csv':
+            writer = csv.writer(EchoWriter())
+            yield writer.writerow(columns)
+            for row in rows:
+                chunk.append(writer.writerow([export_value(value) for value in row]))
+                if len(chunk) >= EXPORT_BATCH_SIZE:
+                    yield ''.join(chunk)
+                    chunk = []
+        else:
+            for row in rows:
+                record = dict(zip(columns, (export_value(value) for value in row)))
+                chunk.append(json.dumps(record) + '\n')
+                if len(chunk) >= EXPORT_BATCH_SIZE:
+                    yield ''.join(chunk)
+                    chunk = []
+        if chunk:
+            yield ''.join(chunk)
+    
+    return Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[file_format], headers={
+        'Content-Disposition': f'attachment; filename="{filename}.{file_format}"',
+        'X-Accel-Buffering': 'no'
+    })
+
+PRODUCTION_REPORT_COLUMNS = [
+    'reference', 'product_name', 'quantity_to_produce', 'quantity_produced', 'state',
+    'total_time', 'efficiency', 'created_at', 'completed_at'
+]
+
+# Production Analytics
+# ProductionDailyRollup keeps order totals per (creation day, product, state). Before a
+# transaction commits, every bucket holding an order whose rollup columns it created,
+# changed or deleted (directly or through one of its work orders) is recomputed from the
+# orders table, so the rollup commits atomically with the change. Other writes (work
+# order planning, notes) leave the rollup alone. Statements that bypass the unit of work
+# call mark_rollup_orders. Range queries then aggregate a few rows per day instead of
+# every order.
+ROLLUP_COLUMNS = {
+    'manufacturing_order': ('created_at', 'product_id', 'state', 'quantity_to_produce',
+                            'quantity_produced', 'completed_at'),
+    'work_order': ('manufacturing_order_id', 'actual_time', 'estimated_time'),
+}
+
+def rollup_bucket(created_at, product_id):
+    return (created_at.date(), product_id)
+
+def mark_rollup_orders(order_ids):
+    orders = db.session.info.setdefault('rollup_orders', set())
+    if isinstance(order_ids, int):
+        orders.add(order_ids)
+    else:
+        orders.update(order_ids)
+
+def rollup_history(instance):
+    """Old and new values of the instance's rollup columns, or None when none changed."""
+    attrs = inspect(instance).attrs
+    history = {name: attrs[name].history for name in ROLLUP_COLUMNS[instance.__tablename__]}
+    if not any(h.has_changes() for h in history.values()):
+        return None
+    return history
+
+@event.listens_for(db.session, 'before_flush')
+def collect_changed_rollup_buckets(session, flush_context, instances):
+    # Rows deleted or moved to another bucket can no longer be found once flushed
+    buckets = session.info.setdefault('rollup_buckets', set())
+    orders = session.info.setdefault('rollup_orders', set())
+    for instance in session.deleted:
+        if isinstance(instance, ManufacturingOrder) and instance.created_at is not None:
+            buckets.add(rollup_bucket(instance.created_at, instance.product_id))
+        elif isinstance(instance, WorkOrder):
+            orders.add(instance.manufacturing_order_id)
+    for instance in session.dirty:
+        if not isinstance(instance, (ManufacturingOrder, WorkOrder)):
+            continue
+        history = rollup_history(instance)
+        if history is None:
+            continue
+        if isinstance(instance, WorkOrder):
+            orders.update(history['manufacturing_order_id'].deleted)
+            orders.add(instance.manufacturing_order_id)
+            continue
+        created = history['created_at'].deleted or [instance.created_at]
+        products = history['product_id'].deleted or [instance.product_id]
+        if created[0] is not None:
+            buckets.add(rollup_bucket(created[0], products[0]))
+        if instance.created_at is not None:
+            buckets.add(rollup_bucket(instance.created_at, instance.product_id))
+
+@event.listens_for(db.session, 'after_flush')
+def collect_created_rollup_buckets(session, flush_context):
+    # New rows get their ids, foreign keys and creation dates while flushing
+    buckets = session.info.setdefault('rollup_buckets', set())
+    orders = session.info.setdefault('rollup_orders', set())
+    for instance in session.new:
+        if isinstance(instance, ManufacturingOrder) and instance.created_at is not None:
+            buckets.add(rollup_bucket(instance.created_at, instance.product_id))
+        elif isinstance(instance, WorkOrder):
+            orders.add(instance.manufacturing_order_id)
+
+def refresh_rollup_bucket(day, product_id):
+    start = datetime.combine(day, datetime.min.time())
+    rows = db.session.query(
+        ManufacturingOrder.state,
+        db.func.count(ManufacturingOrder.id),
+        db.func.coalesce(db.func.sum(ManufacturingOrder.quantity_to_produce), 0),
+        db.func.coalesce(db.func.sum(ManufacturingOrder.quantity_produced), 0),
+        db.func.coalesce(db.func.sum(order_total_time()), 0),
+        db.func.coalesce(db.func.sum(order_efficiency()), 0)
+    ).filter(
+        ManufacturingOrder.product_id == product_id,
+        ManufacturingOrder.created_at >= start,
+        ManufacturingOrder.created_at < start + timedelta(days=1)
+    ).group_by(ManufacturingOrder.state).all()
+    
+    db.session.execute(db.delete(ProductionDailyRollup).where(
+        ProductionDailyRollup.day == day, ProductionDailyRollup.product_id == product_id
+    ))
+    if rows:
+        db.session.execute(db.insert(ProductionDailyRollup), [{
+            'day': day, 'product_id': product_id, 'state': state, 'order_count': count,
+            'quantity_planned': planned, 'quantity_produced': produced,
+            'total_time': total_time, 'efficiency_sum': efficiency_sum
+        } for state, count, planned, produced, total_time, efficiency_sum in rows])
+
+@event.listens_for(db.session, 'before_commit')
+def refresh_production_rollup(session):
+    session.flush()
+    buckets = session.info.pop('rollup_buckets', set())
+    order_ids = session.info.pop('rollup_orders', set())
+    order_ids.discard(None)
+    if order_ids:
+        buckets.update(rollup_bucket(created_at, product_id) for created_at, product_id in session.query(
+            ManufacturingOrder.created_at, ManufacturingOrder.product_id
+        ).filter(ManufacturingOrder.id.in_(order_ids), ManufacturingOrder.created_at.isnot(None)))
+    
+    for day, product_id in sorted(buckets):
+        refresh_rollup_bucket(day, product_id)
+    if buckets:
+        session.flush()
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_rollup_buckets(session):
+    session.info.pop('rollup_buckets', None)
+    session.info.pop('rollup_orders', None)
+
+def rebuild_production_rollup(check_cancelled=None):
+    """
+    Recompute the whole rollup from the orders table (backfill or repair).
+    check_cancelled, if given, is called before each batch and may raise to stop.
+    """
+    check_cancelled = check_cancelled or (lambda: None)
+    day = db.func.date(ManufacturingOrder.created_at)
+    rows = db.session.query(
+        day,
+        ManufacturingOrder.product_id,
+        ManufacturingOrder.state,
+        db.func.count(ManufacturingOrder.id),
+        db.func.coalesce(db.func.sum(ManufacturingOrder.quantity_to_produce), 0),
+        db.func.coalesce(db.func.sum(ManufacturingOrder.quantity_produced), 0),
+        db.func.coalesce(db.func.sum(order_total_time()), 0),
+        db.func.coalesce(db.func.sum(order_efficiency()), 0)
+    ).filter(ManufacturingOrder.created_at.isnot(None)).group_by(
+        day, ManufacturingOrder.product_id, ManufacturingOrder.state
+    )
+    
+    db.session.execute(db.delete(ProductionDailyRollup))
+    batch = []
+    for row_day, product_id, state, count, planned, produced, total_time, efficiency_sum in rows.yield_per(1000):
+        batch.append({
+            'day': row_day if isinstance(row_day, date) else date.fromisoformat(row_day),
+            'product_id': product_id, 'state': state, 'order_count': count,
+            'quantity_planned': planned, 'quantity_produced': produced,
+            'total_time': total_time, 'efficiency_sum': efficiency_sum
+        })
+        if len(batch) >= 1000:
+            check_cancelled()
+            db.session.execute(db.insert(ProductionDailyRollup), batch)
+            batch = []
+    if batch:
+        db.session.execute(db.insert(ProductionDailyRollup), batch)
+    return db.session.query(ProductionDailyRollup).count()
+
+def rollup_totals(query):
+    count = db.func.coalesce(db.func.sum(ProductionDailyRollup.order_count), 0)
+    return query.add_columns(
+        count.label('orders'),
+        db.func.coalesce(db.func.sum(db.case(
+            (ProductionDailyRollup.state == 'done', ProductionDailyRollup.order_count), else_=0
+        )), 0).label('completed_orders'),
+        db.func.coalesce(db.func.sum(ProductionDailyRollup.quantity_planned), 0).label('quantity_planned'),
+        db.func.coalesce(db.func.sum(ProductionDailyRollup.quantity_produced), 0).label('quantity_produced'),
+        db.func.coalesce(db.func.sum(ProductionDailyRollup.total_time), 0).label('total_time'),
+        db.func.coalesce(db.func.sum(ProductionDailyRollup.efficiency_sum), 0).label('efficiency_sum')
+    )
+
+def serialize_rollup_totals(row):
+    return {
+        'orders': row.orders,
+        'completed_orders': row.completed_orders,
+        'quantity_planned': row.quantity_planned,
+        'quantity_produced': row.quantity_produced,
+        'total_time': row.total_time,
+        'average_efficiency': row.efficiency_sum / row.orders if row.orders else 0
+    }
+
+@app.route('/api/analytics/production', methods=['GET'])
+@login_required
+def get_production_analytics():
+    """
+    Production aggregates for orders created between start_date and end_date (inclusive
+    days): overall totals, per state, per day and the top products by quantity produced
+    (?top=, default 5). Served from the daily rollup.
+    """
+    try:
+        start_date = parse_date_arg(request.args['start_date']).date() if request.args.get('start_date') else None
+        end_date = parse_date_arg(request.args['end_date']).date() if request.args.get('end_date') else None
+        top = max(1, min(int(request.args.get('top', 5)), 100))
+    except ValueError:
+        return jsonify({'error': 'Invalid filter value'}), 400
+    
+    def rollup_query(*columns):
+        query = rollup_totals(db.session.query(*columns).select_from(ProductionDailyRollup))
+        if start_date:
+            query = query.filter(ProductionDailyRollup.day >= start_date)
+        if end_date:
+            query = query.filter(ProductionDailyRollup.day <= end_date)
+        return query
+    
+    totals = serialize_rollup_totals(rollup_query().one())
+    totals['completion_rate'] = totals['completed_orders'] / totals['orders'] * 100 if totals['orders'] else 0
+    totals['production_rate'] = (
+        totals['quantity_produced'] / totals['quantity_planned'] * 100 if totals['quantity_planned'] else 0
+    )
+    
+    by_state = [
+        dict(serialize_rollup_totals(row), state=row.state)
+        for row in rollup_query(ProductionDailyRollup.state).group_by(ProductionDailyRollup.state)
+    ]
+    by_day = [
+        dict(serialize_rollup_totals(row), day=row.day.isoformat())
+        for row in rollup_query(ProductionDailyRollup.day).group_by(
+            ProductionDailyRollup.day
+        ).order_by(ProductionDailyRollup.day)
+    ]
+    produced = db.func.sum(ProductionDailyRollup.quantity_produced)
+    by_product = [
+        dict(serialize_rollup_totals(row), product_id=row.product_id, product_name=row.name)
+        for row in rollup_query(ProductionDailyRollup.product_id, Product.name).join(
+            Product, ProductionDailyRollup.product_id == Product.id
+        ).group_by(ProductionDailyRollup.product_id, Product.name).order_by(produced.desc()).limit(top)
+    ]
+    
+    return jsonify({
+        'totals': totals,
+        'by_state': by_state,
+        'by_day': by_day,
+        'top_products': by_product
+    })
+
+@app.route('/api/analytics/production/rebuild', methods=['POST'])
+@login_required
+def rebuild_production_analytics():
+    rows = rebuild_production_rollup()
+    db.session.commit()
+    return jsonify({'message': f'Rebuilt production rollup ({rows} rows)', 'rows': rows})
+
 # Reports Routes
 @app.route('/api/reports/production', methods=['GET'])
 @login_required
 def get_production_report():
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+    try:
+        query = production_report_query(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
     
-    query = ManufacturingOrder.query
+    return jsonify([
+        dict(zip(PRODUCTION_REPORT_COLUMNS, (export_value(value) for value in row))) for row in query
+    ])
+
+@app.route('/api/reports/production/export', methods=['GET'])
+@login_required
+def export_production_report():
+    """
+    Stream the production report as CSV (default) or NDJSON (?format=ndjson), oldest
+    order first. start_date/end_date filter on the order creation date.
+    """
+    file_format = request.args.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
     
-    if start_date:
-        query = query.filter(ManufacturingOrder.created_at >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(ManufacturingOrder.created_at <= datetime.fromisoformat(end_date))
+    try:
+        query = production_report_query(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+    
+    filename = f"production-report-{datetime.utcnow().strftime('%Y%m%d')}"
+    return stream_export(query.yield_per(EXPORT_BATCH_SIZE), PRODUCTION_REPORT_COLUMNS, file_format, filename)
+
+# Background Jobs
+# Long-running operations can be queued in background_job instead of running inside
+# the request. Every process runs JOB_WORKERS daemon threads that claim queued jobs
+# with a conditional UPDATE (so each job runs once across processes), run the handler
+# registered for its kind in a fresh app context and store the JSON result. Handlers
+# call job.report() between their own transactions to record progress, and may call
+# job.check_cancelled() (a plain read, safe inside a write transaction) in between;
+# both raise JobCancelled once cancellation was requested. Kinds that cannot stop
+# partway are registered with cancel_running=False and refuse to be cancelled once
+# running. Submitting a job identical to one still queued returns the queued job.
+# Running jobs whose heartbeat is older than JOB_STALE_AFTER (their process died) are
+# marked failed. Worker threads only start in serving processes: under `python app.py`
+# or, for WSGI servers, when MANUFLOW_START_JOB_WORKERS=1; scripts that import the
+# app run none.
+JOB_WORKERS = int(os.environ.get('MANUFLOW_JOB_WORKERS', 2))
+START_JOB_WORKERS = os.environ.get('MANUFLOW_START_JOB_WORKERS', '0') == '1'
+JOB_POLL_SECONDS = float(os.environ.get('MANUFLOW_JOB_POLL_INTERVAL', 2))
+JOB_STALE_AFTER = timedelta(seconds=float(os.environ.get('MANUFLOW_JOB_STALE_AFTER', 3600)))
+JOB_SWEEP_SECONDS = 60
+JOB_LIST_LIMIT = 200
+JOB_STATES = ('queued', 'running', 'succeeded', 'failed', 'cancelled')
+REPORT_JOB_MAX_ROWS = int(os.environ.get('MANUFLOW_REPORT_JOB_MAX_ROWS', 100000))
+JOB_HANDLERS = {}
+job_wakeup = threading.Event()
+_job_worker_threads = []
+
+class JobCancelled(Exception):
+    """Raised from JobContext.report once the job has been asked to stop."""
+
+def job_handler(kind, parse_params=None, cancel_running=True):
+    """
+    Register handler(job, params) for a job kind. parse_params validates submitted
+    params and returns them normalized, raising ValueError when they are invalid.
+    cancel_running=False marks handlers that cannot stop once started.
+    """
+    def register(handler):
+        JOB_HANDLERS[kind] = (handler, parse_params or (lambda params: {}), cancel_running)
+        return handler
+    return register
+
+class JobContext:
+    def __init__(self, job_id):
+        self.job_id = job_id
+    
+    def report(self, progress, message=None):
+        """Record progress (0..1) in a transaction of its own; raises JobCancelled when cancelled."""
+        table = BackgroundJob.__table__
+        with db.engine.begin() as conn:
+            conn.execute(table.update().where(table.c.id == self.job_id, table.c.state == 'running').values(
+                progress=max(0.0, min(float(progress), 1.0)), progress_message=message, updated_at=datetime.utcnow()
+            ))
+        self.check_cancelled()
+    
+    def check_cancelled(self):
+        """Raise JobCancelled when cancellation was requested; only reads, so handlers can call it mid-transaction."""
+        table = BackgroundJob.__table__
+        with db.engine.connect() as conn:
+            cancel_requested = conn.execute(
+                db.select(table.c.cancel_requested).where(table.c.id == self.job_id)
+            ).scalar()
+        if cancel_requested:
+            raise JobCancelled()
+
+def job_dedupe_key(kind, params):
+    return hashlib.sha1(json.dumps([kind, params], sort_keys=True).encode()).hexdigest()
+
+def queued_job(dedupe_key):
+    return BackgroundJob.query.filter(BackgroundJob.dedupe_key == dedupe_key, BackgroundJob.state == 'queued').first()
+
+def submit_job(kind, params, created_by_id=None):
+    """Queue a job, or return the identical one already queued. Returns (job, created)."""
+    dedupe_key = job_dedupe_key(kind, params)
+    for _ in range(2):
+        job = queued_job(dedupe_key)
+        if job:
+            return job, False
+        job = BackgroundJob(
+            kind=kind, params=json.dumps(params, sort_keys=True), dedupe_key=dedupe_key, created_by_id=created_by_id
+        )
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # queued by a concurrent request; return that one
+            continue
+        job_wakeup.set()
+        return job, True
+    raise RuntimeError(f'Could not queue {kind} job')
+
+def claim_next_job():
+    """Mark the oldest queued job running and return (id, kind, params), or None."""
+    table = BackgroundJob.__table__
+    while True:
+        with db.engine.begin() as conn:
+            row = conn.execute(
+                db.select(table.c.id, table.c.kind, table.c.params).where(table.c.state == 'queued')
+                .order_by(table.c.id).limit(1)
+            ).first()
+            if row is None:
+                return None
+            now = datetime.utcnow()
+            if conn.execute(table.update().where(table.c.id == row.id, table.c.state == 'queued').values(
+                state='running', started_at=now, updated_at=now,
+                worker=f'{os.getpid()}/{threading.current_thread().name}'
+            )).rowcount:
+                return row.id, row.kind, json.loads(row.params or '{}')
+        # another worker claimed it first; try the next one
+
+def finish_job(job_id, state, result=None, error=None):
+    table = BackgroundJob.__table__
+    now = datetime.utcnow()
+    values = {'state': state, 'error': error, 'finished_at': now, 'updated_at': now}
+    if state == 'succeeded':
+        values.update(progress=1.0, result=json.dumps(result))
+    with db.engine.begin() as conn:
+        conn.execute(table.update().where(table.c.id == job_id, table.c.state == 'running').values(**values))
+
+def run_job(job_id, kind, params):
+    handler, _, _ = JOB_HANDLERS.get(kind, (None, None, None))
+    if handler is None:
+        finish_job(job_id, 'failed', error=f'Unknown job kind {kind}')
+        return
+    try:
+        # Own app context, so the handler gets a fresh session that is removed afterwards
+        with app.app_context():
+            result = handler(JobContext(job_id), params)
+    except JobCancelled:
+        finish_job(job_id, 'cancelled')
+    except Exception as e:
+        app.logger.exception('Job %d (%s) failed', job_id, kind)
+        finish_job(job_id, 'failed', error=str(e))
+    else:
+        finish_job(job_id, 'succeeded', result=result)
+
+def fail_stale_jobs():
+    table = BackgroundJob.__table__
+    stale = db.and_(table.c.state == 'running', table.c.updated_at < datetime.utcnow() - JOB_STALE_AFTER)
+    with db.engine.begin() as conn:
+        # Read first so an idle sweep never takes the write lock
+        if conn.execute(db.select(table.c.id).where(stale).limit(1)).first():
+            conn.execute(table.update().where(stale).values(
+                state='failed', error='Worker stopped before the job finished', finished_at=datetime.utcnow()
+            ))
+
+def job_worker():
+    next_sweep = 0.0
+    while True:
+        job_wakeup.wait(JOB_POLL_SECONDS)
+        job_wakeup.clear()
+        with app.app_context():
+            try:
+                if time.monotonic() >= next_sweep:
+                    fail_stale_jobs()
+                    next_sweep = time.monotonic() + JOB_SWEEP_SECONDS
+                while True:
+                    claimed = claim_next_job()
+                    if claimed is None:
+                        break
+                    run_job(*claimed)
+            except Exception:
+                app.logger.exception('Job worker failed')
+
+def start_job_workers(count):
+    for index in range(count):
+        thread = threading.Thread(target=job_worker, name=f'job-worker-{index + 1}', daemon=True)
+        thread.start()
+        _job_worker_threads.append(thread)
+
+def serialize_job(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'params': json.loads(job.params or '{}'),
+        'state': job.state,
+        'progress': job.progress or 0.0,
+        'progress_message': job.progress_message,
+        'cancel_requested': bool(job.cancel_requested),
+        'error': job.error,
+        'created_by_id': job.created_by_id,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+def submit_job_response(kind, params):
+    job, created = submit_job(kind, params, session.get('user_id'))
+    body = dict(serialize_job(job), deduplicated=not created)
+    if not _job_worker_threads:
+        # Another process may still run it, but this one never will
+        body['warning'] = ('No job workers run in this process; the job stays queued until a process '
+                           'started with MANUFLOW_START_JOB_WORKERS=1 (or python app.py) claims it')
+    return jsonify(body), 202
+
+def parse_sync_job_params(params):
+    incremental = params.get('incremental', False)
+    if not isinstance(incremental, bool):
+        raise ValueError('incremental must be true or false')
+    return {'incremental': incremental}
+
+def parse_report_job_params(params):
+    parsed = {}
+    for field in ('start_date', 'end_date'):
+        if params.get(field):
+            if not isinstance(params[field], str):
+                raise ValueError(f'{field} must be a date')
+            parse_date_arg(params[field])
+            parsed[field] = params[field]
+    return parsed
+
+@job_handler('work_order_sync', parse_sync_job_params, cancel_running=False)
+def work_order_sync_job(job, params):
+    # A single UPDATE; there is no point in between to stop at
+    job.report(0.0, 'Closing work orders of done manufacturing orders')
+    return {'synced_count': sync_work_order_states(params['incremental']), 'incremental': params['incremental']}
+
+@job_handler('production_report', parse_report_job_params)
+def production_report_job(job, params):
+    query = production_report_query(params)
+    total = query.order_by(None).count()
+    # The result is stored as one JSON document; larger reports belong to the CSV export
+    if total > REPORT_JOB_MAX_ROWS:
+        raise ValueError(
+            f'{total} orders match, more than {REPORT_JOB_MAX_ROWS}; narrow the date range '
+            'or stream the report from /api/reports/production/export'
+        )
+    job.report(0.0, f'0 of {total} orders')
+    rows = []
+    for row in query.yield_per(EXPORT_BATCH_SIZE):
+        rows.append(dict(zip(PRODUCTION_REPORT_COLUMNS, (export_value(value) for value in row))))
+        if len(rows) % EXPORT_BATCH_SIZE == 0:
+            job.report(len(rows) / total, f'{len(rows)} of {total} orders')
+    return rows
+
+@job_handler('mrp')
+def mrp_job(job, params):
+    job.report(0.0, 'Netting requirements of open orders')
+    return run_mrp(check_cancelled=job.check_cancelled)
+
+@job_handler('scheduling')
+def scheduling_job(job, params):
+    job.report(0.0, 'Scheduling pending work orders')
+    scheduled_count = schedule_all_work_orders(check_cancelled=job.check_cancelled)
+    db.session.commit()
+    return {'scheduled_count': scheduled_count}
+
+@job_handler('production_rollup_rebuild')
+def production_rollup_rebuild_job(job, params):
+    job.report(0.0, 'Rebuilding production rollup')
+    rows = rebuild_production_rollup(check_cancelled=job.check_cancelled)
+    db.session.commit()
+    return {'rows': rows}
+
+# Background Job Routes
+@app.route('/api/jobs', methods=['POST'])
+@login_required
+def create_job():
+    data = request.get_json(silent=True) or {}
+    kind = data.get('kind')
+    if kind not in JOB_HANDLERS:
+        return jsonify({'error': f"kind must be one of {', '.join(sorted(JOB_HANDLERS))}"}), 400
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params must be an object'}), 400
     
-    orders = query.all()
+    try:
+        params = JOB_HANDLERS[kind][1](params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    result = []
-    for order in orders:
-        total_time = sum([wo.actual_time or wo.estimated_time for wo in order.work_orders])
-        
-        result.append({
-            'reference': order.reference,
-            'product_name': order.product.name,
-            'quantity_to_produce': order.quantity_to_produce,
-            'quantity_produced': order.quantity_produced,
-            'state': order.state,
-            'total_time': total_time,
-            'efficiency': (order.quantity_produced / order.quantity_to_produce * 100) if order.quantity_to_produce > 0 else 0,
-            'created_at': order.created_at.isoformat(),
-            'completed_at': order.completed_at.isoformat() if order.completed_at else None
-        })
+    return submit_job_response(kind, params)
+
+@app.route('/api/jobs', methods=['GET'])
+@login_required
+def get_jobs():
+    """Most recent jobs first, optionally filtered by state and kind."""
+    query = BackgroundJob.query
+    state = request.args.get('state')
+    if state:
+        if state not in JOB_STATES:
+            return jsonify({'error': f"state must be one of {', '.join(JOB_STATES)}"}), 400
+        query = query.filter(BackgroundJob.state == state)
+    if request.args.get('kind'):
+        query = query.filter(BackgroundJob.kind == request.args['kind'])
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), JOB_LIST_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
     
-    return jsonify(result)
+    return jsonify([serialize_job(job) for job in query.order_by(BackgroundJob.id.desc()).limit(limit)])
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    return jsonify(serialize_job(BackgroundJob.query.get_or_404(job_id)))
+
+@app.route('/api/jobs/<int:job_id>/result', methods=['GET'])
+@login_required
+def get_job_result(job_id):
+    job = BackgroundJob.query.get_or_404(job_id)
+    if job.state == 'failed':
+        return jsonify({'error': job.error or 'Job failed', 'state': job.state}), 409
+    if job.state != 'succeeded':
+        return jsonify({'error': f'Job is {job.state}', 'state': job.state}), 409
+    return jsonify({'id': job.id, 'kind': job.kind, 'result': json.loads(job.result or 'null')})
+
+@app.route('/api/jobs/<int:job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(job_id):
+    """Cancel a queued job right away, or ask a running one to stop at its next cancellation check."""
+    job = BackgroundJob.query.get_or_404(job_id)
+    table = BackgroundJob.__table__
+    now = datetime.utcnow()
+    updated = db.session.execute(table.update().where(table.c.id == job_id, table.c.state == 'queued').values(
+        state='cancelled', finished_at=now, updated_at=now
+    )).rowcount
+    if not updated and job.state == 'running' and not JOB_HANDLERS.get(job.kind, (None, None, True))[2]:
+        db.session.rollback()
+        return jsonify({'error': f'Running {job.kind} jobs cannot be cancelled', 'state': job.state}), 409
+    if not updated:
+        updated = db.session.execute(table.update().where(table.c.id == job_id, table.c.state == 'running').values(
+            cancel_requested=True
+        )).rowcount
+    if not updated:
+        db.session.rollback()
+        return jsonify({'error': f'Job already {job.state}', 'state': job.state}), 409
+    db.session.commit()
+    
+    db.session.refresh(job)
+    return jsonify(serialize_job(job))
+
+# Schema Migrations
+def backfill_movement_balances():
+    # Walk each product's history newest-first, starting from its current stock
+    movements = db.session.query(
+        StockMovement.id, StockMovement.product_id, StockMovement.movement_type, StockMovement.quantity
+    ).order_by(StockMovement.product_id, StockMovement.created_at.desc(), StockMovement.id.desc())
+    stock = dict(db.session.query(Product.id, Product.current_stock).all())
+    
+    updates = []
+    for movement_id, product_id, movement_type, quantity in movements.yield_per(1000):
+        balance = stock.get(product_id) or 0.0
+        updates.append({'id': movement_id, 'balance_after': balance})
+        if movement_type in INCOMING_MOVEMENT_TYPES:
+            stock[product_id] = balance - quantity
+        elif movement_type in OUTGOING_MOVEMENT_TYPES:
+            stock[product_id] = balance + quantity
+    
+    if updates:
+        db.session.execute(db.update(StockMovement), updates)
+
+def backfill_inventory_values():
+    # Earlier movements were all costed at cost_price, so that is the average on hand
+    db.session.execute(db.update(Product).values(inventory_value=db.case(
+        (Product.current_stock > 0, Product.current_stock * db.func.coalesce(Product.cost_price, 0.0)), else_=0.0
+    )))
+
+def backfill_low_stock():
+    db.session.execute(db.update(Product).values(
+        is_low_stock=db.func.coalesce(Product.current_stock, 0.0) <= db.func.coalesce(Product.min_stock, 0.0)
+    ))
+
+# (table, column, column DDL, backfill) for columns added after the first release.
+# db.create_all() only creates missing tables, so existing manuflow.db files get
+# these through ALTER TABLE.
+COLUMN_MIGRATIONS = [
+    ('stock_movement', 'balance_after', 'FLOAT', backfill_movement_balances),
+    ('work_order', 'planned_start', 'DATETIME', None),
+    ('work_order', 'planned_end', 'DATETIME', None),
+    ('product', 'inventory_value', 'FLOAT', backfill_inventory_values),
+    ('product', 'is_low_stock', 'BOOLEAN', backfill_low_stock),
+]
+
+def migrate_schema():
+    inspector = inspect(db.engine)
+    for table, column, ddl, backfill in COLUMN_MIGRATIONS:
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        if column in existing:
+            continue
+        db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+        if backfill:
+            backfill()
+        db.session.commit()
+    
+    # Indexes declared on the models are only created together with a new table
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    
+    # Databases that predate the production rollup get it filled from their orders
+    if not ProductionDailyRollup.query.first() and ManufacturingOrder.query.first():
+        rebuild_production_rollup()
+        db.session.commit()
 
 # Initialize Database
 def create_tables():
     db.create_all()
+    migrate_schema()
+    ensure_table_versions()
     
     # Create default admin user if not exists
     if not User.query.filter_by(username='admin').first():
         admin = User(
             username='admin',
             email='admin@manuflow.com',
-            password_hash=generate_password_hash('admin123'),
+            password_hash=generate_password_hash('admin123', method=PASSWORD_METHOD),
             role='admin'
         )
         db.session.add(admin)
@@ -890,6 +3898,14 @@ def create_tables():
 # Register a function to run before first request (compatible with Flask 2.x)
 with app.app_context():
     create_tables()
+start_periodic_task(SYNC_INTERVAL_SECONDS, periodic_work_order_sync, 'work-order-sync')
+start_periodic_task(CHECKPOINT_INTERVAL_SECONDS, checkpoint_stock, 'stock-checkpoint')
+if START_JOB_WORKERS:
+    start_job_workers(JOB_WORKERS)
 
 if __name__ == '__main__':
+    # The debug reloader runs this file in a watcher and a serving process; only the
+    # serving one claims jobs
+    if not START_JOB_WORKERS and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_job_workers(JOB_WORKERS)
     app.run(debug=True, port=5001)
@@ -0,0 +1,128 @@
+"""
+Concurrent write benchmark.
+
+Starts several worker processes against one SQLite database file, each posting
+stock movements (optionally mixed with ledger reads) through the Flask test
+client as fast as it can, and reports throughput, latency and failed requests.
+The run is repeated with the SQLite tuning disabled (rollback journal,
+synchronous=FULL, the driver's default 5s lock timeout) and enabled (WAL,
+synchronous=NORMAL, busy_timeout, mmap) so the two can be compared side by side.
+
+Usage:
+    python bench_concurrent_writes.py [--workers 8] [--requests 200] [--read-ratio 0.5]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+MODES = [
+    ('defaults', {'MANUFLOW_SQLITE_TUNING': '0'}),
+    ('tuned', {'MANUFLOW_SQLITE_TUNING': '1'}),
+]
+
+
+def setup_database(env):
+    os.environ.update(env)
+    from app import app, db, Product
+
+    with app.app_context():
+        db.session.add(Product(name='Bench Material', unit='Units', current_stock=0.0, is_raw_material=True))
+        db.session.commit()
+
+
+def run_worker(env, requests, read_ratio, start_event, results):
+    os.environ.update(env)
+    import random
+    from app import app
+
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    payload = {'product_id': 1, 'movement_type': 'in', 'quantity': 1, 'reference': 'BENCH'}
+
+    rng = random.Random(os.getpid())
+    latencies = []
+    errors = 0
+    start_event.wait()
+    for _ in range(requests):
+        started = time.perf_counter()
+        try:
+            if rng.random() < read_ratio:
+                response = client.get('/api/stock-movements?limit=50')
+                ok = response.status_code == 200
+            else:
+                response = client.post('/api/stock-movements', json=payload)
+                ok = response.status_code == 201
+        except Exception:
+            ok = False
+        latencies.append(time.perf_counter() - started)
+        if not ok:
+            errors += 1
+    results.put((latencies, errors))
+
+
+def run_mode(name, overrides, workers, requests, read_ratio):
+    workdir = tempfile.mkdtemp(prefix='manuflow-bench-')
+    env = dict(overrides)
+    env['MANUFLOW_DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    ctx = multiprocessing.get_context('spawn')
+
+    try:
+        setup = ctx.Process(target=setup_database, args=(env,))
+        setup.start()
+        setup.join()
+
+        start_event = ctx.Event()
+        results = ctx.Queue()
+        processes = [ctx.Process(target=run_worker, args=(env, requests, read_ratio, start_event, results)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        # Give every worker time to import the app and log in before the clock starts
+        time.sleep(3)
+        started = time.perf_counter()
+        start_event.set()
+        collected = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = sorted(latency for worker_latencies, _ in collected for latency in worker_latencies)
+    errors = sum(worker_errors for _, worker_errors in collected)
+    total = len(latencies)
+    return {
+        'mode': name,
+        'requests': total,
+        'errors': errors,
+        'elapsed': elapsed,
+        'throughput': (total - errors) / elapsed if elapsed else 0.0,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[int(total * 0.95) - 1] * 1000,
+        'max': latencies[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per worker')
+    parser.add_argument('--read-ratio', type=float, default=0.0,
+                        help='fraction of requests that read the ledger instead of writing to it')
+    args = parser.parse_args()
+
+    print(f'{args.workers} workers x {args.requests} requests ({args.read_ratio:.0%} reads)\n')
+    print(f'{"mode":<10} {"ok/s":>8} {"errors":>7} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>8}')
+    for name, overrides in MODES:
+        result = run_mode(name, overrides, args.workers, args.requests, args.read_ratio)
+        print(f'{result["mode"]:<10} {result["throughput"]:>8.1f} {result["errors"]:>7} '
+              f'{result["p50"]:>8.1f} {result["p95"]:>8.1f} {result["max"]:>8.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
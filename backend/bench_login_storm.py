@@ -0,0 +1,127 @@
+"""
+Login storm benchmark.
+
+Runs one app process the way a threaded worker serves it: several threads log users
+in back to back (a shift change) while one thread keeps reading the stock ledger.
+It reports login throughput, how many logins were turned away with 503, and the
+latency of the ledger reads. The run is repeated with password hashing inline on
+the request threads and in the bounded hashing pool.
+
+Usage:
+    python bench_login_storm.py [--threads 16] [--seconds 10] [--users 50]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+MODES = [
+    ('inline', {'MANUFLOW_HASH_WORKERS': '0'}),
+    ('pool', {}),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def run_mode(env, threads, seconds, users, results):
+    os.environ.update(env)
+    from werkzeug.security import generate_password_hash
+    from app import app, db, User
+    from password_hashing import PASSWORD_METHOD, password_hasher
+
+    with app.app_context():
+        password_hash = generate_password_hash('shift-password', method=PASSWORD_METHOD)
+        db.session.execute(db.insert(User), [{
+            'username': f'storm{i}', 'email': f'storm{i}@manuflow.test', 'password_hash': password_hash,
+            'role': 'operator', 'is_active': True
+        } for i in range(users)])
+        db.session.commit()
+
+    probe = app.test_client()
+    probe.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    deadline = time.perf_counter() + seconds
+    logins = []
+    rejected = [0]
+    probes = []
+    lock = threading.Lock()
+
+    def storm(offset):
+        client = app.test_client()
+        i = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.post('/api/auth/login', json={'username': f'storm{i % users}', 'password': 'shift-password'})
+            elapsed = time.perf_counter() - started
+            with lock:
+                if response.status_code == 200:
+                    logins.append(elapsed * 1000)
+                elif response.status_code == 503:
+                    rejected[0] += 1
+                    time.sleep(0.05)
+            i += threads
+
+    def read_ledger():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            probe.get('/api/stock-movements?limit=50')
+            probes.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.02)
+
+    workers = [threading.Thread(target=storm, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=read_ledger))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    # multiprocessing children wait for their own children on exit, so stop the pool first
+    password_hasher.shutdown()
+
+    results.put({
+        'logins_per_s': len(logins) / seconds,
+        'rejected': rejected[0],
+        'login_p50': statistics.median(logins) if logins else 0.0,
+        'login_p95': percentile(logins, 0.95),
+        'read_p50': statistics.median(probes) if probes else 0.0,
+        'read_p95': percentile(probes, 0.95),
+        'read_max': max(probes) if probes else 0.0,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16, help='concurrent login threads')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--users', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f'{args.threads} login threads for {args.seconds:g}s, ledger reads alongside\n')
+    print(f'{"mode":<8} {"logins/s":>9} {"503s":>6} {"login p50":>10} {"login p95":>10} '
+          f'{"read p50":>9} {"read p95":>9} {"read max":>9}')
+    ctx = multiprocessing.get_context('spawn')
+    for name, overrides in MODES:
+        workdir = tempfile.mkdtemp(prefix='manuflow-logins-')
+        env = dict(overrides, MANUFLOW_DATABASE_URL='sqlite:///' + os.path.join(workdir, 'bench.db'))
+        results = ctx.Queue()
+        try:
+            process = ctx.Process(target=run_mode, args=(env, args.threads, args.seconds, args.users, results))
+            process.start()
+            result = results.get()
+            process.join()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        print(f'{name:<8} {result["logins_per_s"]:>9.1f} {result["rejected"]:>6} {result["login_p50"]:>10.1f} '
+              f'{result["login_p95"]:>10.1f} {result["read_p50"]:>9.1f} {result["read_p95"]:>9.1f} '
+              f'{result["read_max"]:>9.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,451 @@
+"""
+Endpoint load benchmark.
+
+Seeds a scratch database with seed_data.py (or uses an existing one), drives every
+/api route through the Flask test client and reports p50/p95 latency, throughput
+and SQL statements per request. Results can be saved as a baseline and later runs
+compared against it; the comparison exits non-zero when an endpoint got slower
+than the threshold allows or issues more queries than before.
+
+Usage:
+    python benchmark.py --scale medium --save baseline.json
+    python benchmark.py --scale medium --compare baseline.json [--threshold 1.5]
+    python benchmark.py --database sqlite:///bench.db --only stock.
+"""
+import argparse
+import io
+import itertools
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Routes that cannot be timed as a request/response pair
+EXCLUDED_ENDPOINTS = {
+    'stream_change_events': 'long-lived Server-Sent Events stream',
+}
+
+# Expensive whole-table operations run fewer iterations
+HEAVY_ITERATIONS = 5
+
+# Latency differences below this are treated as noise when comparing baselines
+NOISE_FLOOR_MS = 2.0
+
+
+class SetupFailed(Exception):
+    pass
+
+
+def created(response):
+    if response.status_code >= 400:
+        raise SetupFailed(f'{response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return response.get_json()
+
+
+class Case:
+    """One benchmarked request. `setup` runs untimed before each request and may return format values."""
+    def __init__(self, name, method, path, body=None, setup=None, upload=None, heavy=False, client='main',
+                 headers=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.setup = setup
+        self.upload = upload
+        self.heavy = heavy
+        self.client = client
+        self.headers = headers
+
+
+def create_order(bench, ctx):
+    response = bench.post('/api/manufacturing-orders', json={
+        'product_id': ctx['product_id'], 'bom_id': ctx['bom_id'], 'quantity_to_produce': 1,
+        'scheduled_date': datetime.utcnow().isoformat()
+    })
+    return {'new_order_id': created(response)['id']}
+
+
+def create_started_work_order(bench, ctx, start=False):
+    order_id = create_order(bench, ctx)['new_order_id']
+    work_order_id = created(bench.get(f'/api/work-orders?manufacturing_order_id={order_id}'))[0]['id']
+    if start:
+        bench.post(f'/api/work-orders/{work_order_id}/start')
+    return {'new_work_order_id': work_order_id}
+
+
+def create_batch(bench, ctx):
+    response = bench.post('/api/manufacturing-orders/batch', json={'orders': [{
+        'product_id': ctx['product_id'], 'bom_id': ctx['bom_id'], 'quantity_to_produce': 1,
+        'scheduled_date': datetime.utcnow().isoformat()
+    }] * 5})
+    return {'new_order_ids': [order['id'] for order in created(response)['created']]}
+
+
+def create_product(bench, ctx):
+    return {'new_product_id': created(bench.post('/api/products', json={'name': 'Bench scratch'}))['id']}
+
+
+def create_work_center(bench, ctx):
+    response = bench.post('/api/work-centers', json={'name': 'Bench scratch', 'capacity': 1})
+    return {'new_center_id': created(response)['id']}
+
+
+def create_bom(bench, ctx):
+    product_id = create_product(bench, ctx)['new_product_id']
+    response = bench.post('/api/boms', json={
+        'product_id': product_id, 'name': 'Bench scratch', 'production_time': 10,
+        'components': [{'product_id': ctx['raw_id'], 'quantity': 1}]
+    })
+    return {'new_product_id': product_id, 'new_bom_id': created(response)['id']}
+
+
+def login_other(bench, ctx):
+    ctx['clients']['other'].post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+
+
+def unique_user(ctx):
+    name = f'bench{os.getpid()}_{next(ctx["sequence"])}'
+    return {'username': name, 'email': f'{name}@manuflow.test', 'password': 'bench-password'}
+
+
+def fetch_etag(path):
+    def setup(bench, ctx):
+        return {'etag': bench.get(path).headers.get('ETag', '')}
+    return setup
+
+
+def if_none_match(ctx):
+    return {'If-None-Match': ctx['etag']}
+
+
+def report_job(ctx):
+    return {'kind': 'production_report', 'params': {'start_date': ctx['month_ago'], 'end_date': ctx['today']}}
+
+
+def submit_report_job(bench, ctx):
+    return {'job_id': created(bench.post('/api/jobs', json=report_job(ctx)))['id']}
+
+
+def finished_report_job(bench, ctx):
+    # Job workers are off while benchmarking, so run the queue here
+    from app import app, claim_next_job, run_job
+    job_id = submit_report_job(bench, ctx)['job_id']
+    with app.app_context():
+        while True:
+            claimed = claim_next_job()
+            if claimed is None:
+                break
+            run_job(*claimed)
+    return {'job_id': job_id}
+
+
+def import_file(ctx):
+    lines = ['product_id,movement_type,quantity,unit_cost,reference']
+    lines += [f'{ctx["raw_id"]},in,{i % 10 + 1},1.5,BENCH-IMPORT' for i in range(100)]
+    return {'file': (io.BytesIO('\n'.join(lines).encode()), 'movements.csv')}
+
+
+CASES = [
+    # Authentication
+    Case('auth.me', 'GET', '/api/auth/me'),
+    Case('auth.login', 'POST', '/api/auth/login', body=lambda ctx: {'username': 'admin', 'password': 'admin123'}),
+    Case('auth.register', 'POST', '/api/auth/register', body=unique_user, client='other'),
+    Case('auth.logout', 'POST', '/api/auth/logout', setup=login_other, client='other'),
+    # Products
+    Case('products.list', 'GET', '/api/products'),
+    Case('products.list_not_modified', 'GET', '/api/products', setup=fetch_etag('/api/products'), headers=if_none_match),
+    Case('products.low_stock', 'GET', '/api/products/low-stock'),
+    Case('products.create', 'POST', '/api/products', body=lambda ctx: {'name': 'Bench product', 'cost_price': 2.5}),
+    Case('products.update', 'PUT', '/api/products/{product_id}', body=lambda ctx: {'description': 'Benchmarked'}),
+    Case('products.delete', 'DELETE', '/api/products/{new_product_id}', setup=create_product),
+    # Work centers
+    Case('work_centers.list', 'GET', '/api/work-centers'),
+    Case('work_centers.create', 'POST', '/api/work-centers', body=lambda ctx: {'name': 'Bench center', 'capacity': 1}),
+    Case('work_centers.update', 'PUT', '/api/work-centers/{new_center_id}', setup=create_work_center,
+         body=lambda ctx: {'description': 'Benchmarked'}),
+    Case('work_centers.delete', 'DELETE', '/api/work-centers/{new_center_id}', setup=create_work_center),
+    # Bills of materials
+    Case('boms.list', 'GET', '/api/boms', heavy=True),
+    Case('boms.list_not_modified', 'GET', '/api/boms', setup=fetch_etag('/api/boms'), headers=if_none_match),
+    Case('boms.create', 'POST', '/api/boms', setup=create_product, body=lambda ctx: {
+        'product_id': ctx['new_product_id'], 'name': 'Bench BOM', 'production_time': 10,
+        'components': [{'product_id': ctx['raw_id'], 'quantity': 2}]
+    }),
+    Case('boms.update', 'PUT', '/api/boms/{new_bom_id}', setup=create_bom, body=lambda ctx: {
+        'name': 'Bench BOM v2', 'production_time': 12, 'components': [{'product_id': ctx['raw_id'], 'quantity': 3}]
+    }),
+    Case('boms.delete', 'DELETE', '/api/boms/{new_bom_id}', setup=create_bom),
+    Case('boms.explode', 'GET', '/api/boms/{seeded_bom_id}/explode?quantity=10'),
+    # Manufacturing orders
+    Case('orders.list', 'GET', '/api/manufacturing-orders', heavy=True),
+    Case('orders.list_planned', 'GET', '/api/manufacturing-orders?state=planned', heavy=True),
+    Case('orders.create', 'POST', '/api/manufacturing-orders', body=lambda ctx: {
+        'product_id': ctx['product_id'], 'bom_id': ctx['bom_id'], 'quantity_to_produce': 2,
+        'scheduled_date': datetime.utcnow().isoformat()
+    }),
+    Case('orders.create_batch', 'POST', '/api/manufacturing-orders/batch', body=lambda ctx: {'orders': [{
+        'product_id': ctx['product_id'], 'bom_id': ctx['bom_id'], 'quantity_to_produce': 1,
+        'scheduled_date': datetime.utcnow().isoformat()
+    }] * 20}),
+    Case('orders.confirm', 'POST', '/api/manufacturing-orders/{new_order_id}/confirm', setup=create_order),
+    Case('orders.confirm_batch', 'POST', '/api/manufacturing-orders/batch-confirm', setup=create_batch,
+         body=lambda ctx: {'order_ids': ctx['new_order_ids']}),
+    Case('orders.complete', 'POST', '/api/manufacturing-orders/{new_order_id}/complete', setup=create_order,
+         body=lambda ctx: {'quantity_produced': 1}),
+    Case('orders.delete', 'DELETE', '/api/manufacturing-orders/{new_order_id}', setup=create_order),
+    # Work orders and scheduling
+    Case('work_orders.list', 'GET', '/api/work-orders', heavy=True),
+    Case('work_orders.list_for_order', 'GET', '/api/work-orders?manufacturing_order_id={seeded_order_id}'),
+    Case('work_orders.start', 'POST', '/api/work-orders/{new_work_order_id}/start', setup=create_started_work_order),
+    Case('work_orders.complete', 'POST', '/api/work-orders/{new_work_order_id}/complete',
+         setup=lambda bench, ctx: create_started_work_order(bench, ctx, start=True),
+         body=lambda ctx: {'actual_time': 15, 'notes': 'bench'}),
+    Case('work_orders.sync', 'POST', '/api/work-orders/sync', heavy=True),
+    Case('work_orders.sync_incremental', 'POST', '/api/work-orders/sync?incremental=true'),
+    Case('scheduling.run', 'POST', '/api/scheduling/run', heavy=True),
+    Case('mrp.run', 'POST', '/api/mrp/run', heavy=True),
+    # Stock ledger
+    Case('stock.page', 'GET', '/api/stock-movements?limit=50'),
+    Case('stock.page_product', 'GET', '/api/stock-movements?limit=50&product_id={raw_id}'),
+    Case('stock.page_range', 'GET', '/api/stock-movements?limit=50&start_date={month_ago}&end_date={today}'),
+    Case('stock.summary', 'GET', '/api/stock-movements/summary'),
+    Case('stock.as_of', 'GET', '/api/stock-movements/as-of?at={month_ago}'),
+    Case('inventory.valuation', 'GET', '/api/inventory/valuation'),
+    Case('stock.export_month', 'GET', '/api/stock-movements/export?start_date={month_ago}&end_date={today}', heavy=True),
+    Case('stock.create', 'POST', '/api/stock-movements', body=lambda ctx: {
+        'product_id': ctx['raw_id'], 'movement_type': 'in', 'quantity': 5, 'reference': 'BENCH'
+    }),
+    Case('stock.import_100', 'POST', '/api/stock-movements/import', upload=import_file),
+    # Dashboard, analytics and reports
+    Case('dashboard.stats', 'GET', '/api/dashboard/stats'),
+    Case('users.list', 'GET', '/api/users'),
+    Case('metrics', 'GET', '/api/metrics'),
+    Case('analytics.production', 'GET', '/api/analytics/production?start_date={year_ago}&end_date={today}'),
+    Case('analytics.rebuild', 'POST', '/api/analytics/production/rebuild', heavy=True),
+    Case('reports.production_month', 'GET', '/api/reports/production?start_date={month_ago}&end_date={today}'),
+    Case('reports.export_month', 'GET', '/api/reports/production/export?start_date={month_ago}&end_date={today}'),
+    # Background jobs
+    Case('jobs.submit_report', 'POST', '/api/jobs', body=report_job),
+    Case('jobs.status', 'GET', '/api/jobs/{job_id}', setup=submit_report_job),
+    Case('jobs.result', 'GET', '/api/jobs/{job_id}/result', setup=finished_report_job),
+    Case('jobs.cancel', 'POST', '/api/jobs/{job_id}/cancel', setup=submit_report_job),
+    Case('jobs.list', 'GET', '/api/jobs?state=queued'),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_case(case, ctx, iterations, counter):
+    client = ctx['clients'][case.client]
+    latencies = []
+    queries = []
+    errors = 0
+    total = 0.0
+    for _ in range(iterations):
+        values = dict(ctx['ids'])
+        if case.setup:
+            try:
+                values.update(case.setup(ctx['clients']['main'], dict(ctx, **values)) or {})
+            except SetupFailed:
+                errors += 1
+                continue
+        request_ctx = dict(ctx, **values)
+        kwargs = {}
+        if case.body:
+            kwargs['json'] = case.body(request_ctx)
+        if case.upload:
+            kwargs['data'] = case.upload(request_ctx)
+            kwargs['content_type'] = 'multipart/form-data'
+        if case.headers:
+            kwargs['headers'] = case.headers(request_ctx)
+        path = case.path.format(**values)
+
+        counter['queries'] = 0
+        started = time.perf_counter()
+        response = client.open(path, method=case.method, **kwargs)
+        response.get_data()  # drain streamed bodies
+        elapsed = time.perf_counter() - started
+
+        total += elapsed
+        latencies.append(elapsed * 1000)
+        queries.append(counter['queries'])
+        if response.status_code >= 400:
+            errors += 1
+    if not latencies:
+        return {'iterations': 0, 'p50_ms': None, 'p95_ms': None, 'rps': 0.0, 'queries': None, 'errors': errors}
+    return {
+        'iterations': len(latencies),
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'rps': round(iterations / total, 1) if total else 0.0,
+        'queries': max(queries),
+        'errors': errors,
+    }
+
+
+def prepare_context(app, bench):
+    """Log in and create a dedicated product/BOM with plenty of raw stock for write cases."""
+    from app import db, Product, BOM, ManufacturingOrder
+
+    bench.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    with app.app_context():
+        raw_id = db.session.query(db.func.min(Product.id)).filter(Product.is_raw_material.is_(True)).scalar()
+        seeded_bom_id = db.session.query(db.func.max(BOM.id)).scalar()
+        seeded_order_id = db.session.query(db.func.max(ManufacturingOrder.id)).scalar()
+    if raw_id is None or seeded_bom_id is None:
+        raise SystemExit('The database has no seeded data; run seed_data.py or omit --database')
+
+    bench.post('/api/stock-movements', json={
+        'product_id': raw_id, 'movement_type': 'in', 'quantity': 1e9, 'reference': 'BENCH-SETUP'
+    })
+    product_id = created(bench.post('/api/products', json={'name': 'Bench Assembly'}))['id']
+    bom_id = created(bench.post('/api/boms', json={
+        'product_id': product_id, 'name': 'Bench Assembly BOM', 'production_time': 10,
+        'components': [{'product_id': raw_id, 'quantity': 1}]
+    }))['id']
+
+    today = datetime.utcnow().date()
+    return {
+        'raw_id': raw_id,
+        'product_id': product_id,
+        'bom_id': bom_id,
+        'seeded_bom_id': seeded_bom_id,
+        'seeded_order_id': seeded_order_id,
+        'today': today.isoformat(),
+        'month_ago': (today - timedelta(days=30)).isoformat(),
+        'year_ago': (today - timedelta(days=365)).isoformat(),
+    }
+
+
+def uncovered_endpoints(app):
+    adapter = app.url_map.bind('localhost')
+    covered = set()
+    for case in CASES:
+        path = case.path.split('?')[0]
+        path = path.replace('{', '').replace('}', '')
+        # Placeholders only stand in for integer ids
+        path = '/'.join('1' if part.endswith('_id') else part for part in path.split('/'))
+        try:
+            endpoint, _ = adapter.match(path, method=case.method)
+            covered.add(endpoint)
+        except Exception:
+            pass
+    api_endpoints = {rule.endpoint for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/')}
+    return sorted(api_endpoints - covered - set(EXCLUDED_ENDPOINTS))
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before or before['p95_ms'] is None or result['p95_ms'] is None:
+            continue
+        slower = result['p95_ms'] > before['p95_ms'] * threshold and result['p95_ms'] - before['p95_ms'] > NOISE_FLOOR_MS
+        if slower:
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='benchmark an existing (seeded) database instead of a scratch one')
+    parser.add_argument('--scale', default='small', help='seed_data.py scale for the scratch database')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--only', help='run only cases whose name contains this text')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.5, help='allowed p95 slowdown factor')
+    args = parser.parse_args()
+
+    # Check the baseline before spending minutes on seeding and timing
+    baseline = None
+    if args.compare:
+        if not os.path.exists(args.compare):
+            raise SystemExit(f'Baseline {args.compare} not found; create one first with --save {args.compare}')
+        with open(args.compare) as f:
+            try:
+                baseline = json.load(f)
+            except ValueError as exc:
+                raise SystemExit(f'Baseline {args.compare} is not valid JSON: {exc}')
+
+    if args.database:
+        os.environ['MANUFLOW_DATABASE_URL'] = args.database
+    else:
+        workdir = tempfile.mkdtemp(prefix='manuflow-bench-')
+        os.environ['MANUFLOW_DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    from sqlalchemy import event
+    from app import app, db
+    from seed_data import SCALES, seed
+
+    if not args.database:
+        print(f'Seeding scratch database ({args.scale})')
+        with app.app_context():
+            seed(**SCALES[args.scale])
+
+    # Failed requests are counted in the errors column instead of logging tracebacks
+    app.logger.setLevel(logging.CRITICAL)
+    with app.app_context():
+        engine = db.engine
+    counter = {'queries': 0}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        counter['queries'] += 1
+
+    ctx = {'clients': {'main': app.test_client(), 'other': app.test_client()}, 'sequence': itertools.count(1)}
+    ctx['ids'] = prepare_context(app, ctx['clients']['main'])
+
+    missing = uncovered_endpoints(app)
+    if missing:
+        print(f'Warning: no benchmark case for {", ".join(missing)}')
+
+    results = {}
+    print(f'\n{"case":<28} {"iter":>5} {"p50 ms":>9} {"p95 ms":>9} {"req/s":>8} {"queries":>8} {"errors":>7}')
+    for case in CASES:
+        if args.only and args.only not in case.name:
+            continue
+        iterations = min(args.iterations, HEAVY_ITERATIONS) if case.heavy else args.iterations
+        if args.warmup:
+            run_case(case, ctx, args.warmup, counter)
+        result = run_case(case, ctx, iterations, counter)
+        results[case.name] = result
+        if result['p50_ms'] is None:
+            print(f'{case.name:<28} {0:>5} {"-":>9} {"-":>9} {"-":>8} {"-":>8} {result["errors"]:>7}')
+            continue
+        print(f'{case.name:<28} {result["iterations"]:>5} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+              f'{result["rps"]:>8.1f} {result["queries"]:>8} {result["errors"]:>7}')
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'database': 'existing' if args.database else args.scale,
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f'\nSaved results to {args.save}')
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        print(f'\nCompared with {args.compare} ({baseline.get("database")}, {baseline.get("created_at")}):')
+        for line in regressions:
+            print(f'  REGRESSION {line}')
+        if regressions:
+            return 1
+        print('  no regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
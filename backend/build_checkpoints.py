@@ -0,0 +1,43 @@
+"""
+Stock checkpoint builder.
+
+Writes StockCheckpoint rows for existing ledger history, one per product per period
+in which it moved, up to a few minutes before now, so point-in-time stock queries
+(/api/stock-movements/as-of) never read more than one period of movements. It resumes from
+the last checkpoint; --rebuild drops all checkpoints first.
+
+Usage:
+    python build_checkpoints.py [--database sqlite:///manuflow.db] [--period-days 1] [--rebuild]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='SQLAlchemy URL (defaults to MANUFLOW_DATABASE_URL / manuflow.db)')
+    parser.add_argument('--period-days', type=float, default=1.0, help='time between checkpoints')
+    parser.add_argument('--rebuild', action='store_true', help='delete existing checkpoints first')
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ['MANUFLOW_DATABASE_URL'] = args.database
+    from app import app, db, StockCheckpoint, SyncWatermark, STOCK_CHECKPOINT, checkpoint_stock
+
+    started = time.perf_counter()
+    with app.app_context():
+        if args.rebuild:
+            db.session.query(StockCheckpoint).delete()
+            db.session.query(SyncWatermark).filter(SyncWatermark.name == STOCK_CHECKPOINT).delete()
+            db.session.commit()
+        written = checkpoint_stock(timedelta(days=args.period_days))
+        total = db.session.query(db.func.count(StockCheckpoint.id)).scalar()
+    print(f'Wrote {written} checkpoints ({total} in total) in {time.perf_counter() - started:.1f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Query plan regression check.
+
+Seeds a throwaway SQLite database with seed_data.py, calls every read endpoint
+through the Flask test client, captures the SELECT statements each one issues and
+runs EXPLAIN QUERY PLAN on them. Exits non-zero if any statement
+falls back to a full table scan that the endpoint is not expected to need.
+tests/test_query_plans.py runs the same check under pytest.
+
+Usage:
+    python check_query_plans.py [--products 2000] [--orders 20000] [--movements 200000]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import event
+
+# Small reference tables that may always be read in full
+ALWAYS_SCANNABLE = {'user', 'work_center', 'table_version'}
+
+# Endpoint -> tables it legitimately reads in full (it returns or aggregates every row)
+ENDPOINTS = [
+    ('/api/stock-movements?limit=50', set()),
+    ('/api/stock-movements?limit=50&product_id=1', set()),
+    ('/api/stock-movements?limit=50&movement_type=in', set()),
+    ('/api/stock-movements?limit=50&start_date={day}&end_date={day}', set()),
+    ('/api/stock-movements?limit=50&search=MO', set()),
+    ('/api/stock-movements/summary', {'product'}),
+    ('/api/stock-movements/as-of?at={day}', {'product'}),
+    ('/api/stock-movements/as-of?at={day}&product_id=1', set()),
+    ('/api/manufacturing-orders?state=planned', set()),
+    ('/api/work-orders?manufacturing_order_id=1', set()),
+    ('/api/reports/production?start_date={day}&end_date={day}', set()),
+    ('/api/analytics/production?start_date={day}&end_date={day}', set()),
+    ('/api/boms/1/explode?quantity=5', set()),
+    # recent work orders are read newest-first by rowid with LIMIT 10, which SQLite reports as a scan
+    ('/api/dashboard/stats', {'work_order'}),
+    ('/api/products', {'product'}),
+    ('/api/products/low-stock', set()),
+    ('/api/boms', {'bom', 'bom_line'}),
+    ('/api/jobs?state=queued', set()),
+]
+
+
+def full_scans(plan_rows):
+    scans = set()
+    for row in plan_rows:
+        detail = row[-1]
+        if not detail.startswith('SCAN ') or ' USING ' in detail:
+            continue
+        name = detail.split()[1]
+        if name.startswith('anon_'):
+            # Subqueries; their own table access shows up as separate plan rows
+            continue
+        scans.add(re.sub(r'_\d+$', '', name))  # aliases such as product_1
+    return scans
+
+
+def capture_selects(engine):
+    """Start recording SELECT statements; returns the list they are appended to."""
+    captured = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((statement, parameters))
+    return captured
+
+
+def unexpected_scans(engine, statements, allowed):
+    """(tables, first line of statement) for each statement scanning a table it should not."""
+    problems = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+            bad = full_scans(plan) - allowed - ALWAYS_SCANNABLE
+            if bad:
+                problems.append((sorted(bad), statement.splitlines()[0][:120]))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--movements', type=int, default=200000)
+    args = parser.parse_args()
+
+    # Point the app at a scratch database before it is imported
+    workdir = tempfile.mkdtemp(prefix='manuflow-plans-')
+    os.environ['MANUFLOW_DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'plans.db')
+    from app import app, db
+    from seed_data import seed
+
+    with app.app_context():
+        seed(products=args.products, orders=args.orders, movements=args.movements)
+        engine = db.engine
+
+    captured = capture_selects(engine)
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    day = datetime.utcnow().date().isoformat()
+
+    failures = 0
+    for template, allowed in ENDPOINTS:
+        url = template.format(day=day)
+        captured.clear()
+        response = client.get(url)
+        if response.status_code != 200:
+            print(f'ERROR {url}: HTTP {response.status_code}')
+            failures += 1
+            continue
+        statements = list(captured)
+        problems = unexpected_scans(engine, statements, allowed)
+
+        status = 'FAIL' if problems else 'ok  '
+        print(f'{status} {url} ({len(statements)} queries)')
+        for tables, statement in problems:
+            print(f'       full scan of {", ".join(tables)}: {statement}')
+        failures += bool(problems)
+
+    print(f'\n{failures} endpoint(s) with unexpected full table scans')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Password hashing off the request thread.
+
+Hashing and verifying passwords is deliberately slow and CPU bound. Running it inline
+lets a burst of logins occupy every request thread and core of a worker. Here it runs
+in a small process pool instead: at most HASH_WORKERS hashes run at once, at most
+HASH_QUEUE_LIMIT are admitted (running or waiting), and callers beyond that get
+HashingBusy immediately so the route can answer 503 instead of queueing without bound.
+
+Pool processes are spawned fresh rather than forked, so they never inherit the locks,
+threads or database connections of the worker that started them. The pool is shut
+down when the worker exits. If it cannot be started or breaks, hashing falls back to
+the calling thread. Set MANUFLOW_HASH_WORKERS=0 to always hash inline.
+"""
+import atexit
+import concurrent.futures
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+PASSWORD_METHOD = os.environ.get('MANUFLOW_PASSWORD_METHOD', 'scrypt')  # werkzeug's default
+HASH_WORKERS = int(os.environ.get('MANUFLOW_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+HASH_QUEUE_LIMIT = int(os.environ.get('MANUFLOW_HASH_QUEUE_LIMIT', max(1, HASH_WORKERS) * 8))
+HASH_TIMEOUT_SECONDS = float(os.environ.get('MANUFLOW_HASH_TIMEOUT', 10))
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full or a hash did not finish in time."""
+
+
+def hash_password(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def verify_password(password_hash, password, method, rehash):
+    """Check a password; return (valid, new hash or None when rehashing was not asked for)."""
+    if not check_password_hash(password_hash, password):
+        return False, None
+    return True, generate_password_hash(password, method=method) if rehash else None
+
+
+def hash_method(password_hash):
+    return password_hash.split('$', 1)[0]
+
+
+class PasswordHasher:
+    def __init__(self, method=PASSWORD_METHOD, workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT,
+                 timeout=HASH_TIMEOUT_SECONDS):
+        self.method = method
+        # The full setting stored hashes carry ('scrypt' is stored as 'scrypt:32768:8:1');
+        # werkzeug fills in the defaults, so it is read from one throwaway hash up front
+        self.method_prefix = hash_method(generate_password_hash('', method=method))
+        self.workers = workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(queue_limit)
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pid = None
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None or self.pid != os.getpid():
+                # Created lazily in each worker process; the spawned children only run
+                # the hashing functions above, so they need nothing but this module
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+                self.pid = os.getpid()
+                # Processes started by multiprocessing skip atexit and wait for their own
+                # children when they exit, so the pool is shut down before that (and
+                # before the finalizers that close its queues, which run at priority 10)
+                multiprocessing.util.Finalize(self, self.shutdown, exitpriority=100)
+            return self.executor
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None and self.pid == os.getpid():
+                self.executor.shutdown()
+            self.executor = None
+
+    def run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy('Too many password hashes in progress')
+        try:
+            future = self.get_executor().submit(fn, *args)
+        except (OSError, NotImplementedError, concurrent.futures.BrokenExecutor):
+            self.slots.release()
+            logger.warning('Password hashing pool could not start, hashing inline', exc_info=True)
+            self.workers = 0
+            self.shutdown()
+            return fn(*args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            raise HashingBusy('Password hashing timed out')
+        except concurrent.futures.BrokenExecutor:
+            # A pool process died; the next call starts a new pool
+            logger.warning('Password hashing pool broke, hashing inline', exc_info=True)
+            self.shutdown()
+            return fn(*args)
+
+    def hash(self, password):
+        return self.run(hash_password, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Return (valid, new hash). A new hash is returned when the stored one uses other parameters."""
+        rehash = hash_method(password_hash) != self.method_prefix
+        return self.run(verify_password, password_hash, password, self.method, rehash)
+
+
+password_hasher = PasswordHasher()
+atexit.register(password_hasher.shutdown)
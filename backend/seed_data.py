@@ -0,0 +1,256 @@
+"""
+Synthetic data generator.
+
+Fills a database with a realistic, internally consistent data set: raw materials,
+sub-assemblies and finished goods, two-level multi-component BOMs, work centers,
+operators, manufacturing orders in every state with their work orders, and a stock
+ledger whose running balances (balance_after) end at each product's current stock.
+Rows are written with batched bulk inserts, so the generator itself runs in
+constant memory at any scale.
+
+Usage:
+    python seed_data.py --database sqlite:///bench.db --scale large
+    python seed_data.py --products 10000 --orders 100000 --movements 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Preset volumes for --scale
+SCALES = {
+    'small': {'products': 200, 'orders': 2000, 'movements': 20000},
+    'medium': {'products': 2000, 'orders': 20000, 'movements': 200000},
+    'large': {'products': 10000, 'orders': 100000, 'movements': 1000000},
+}
+
+INSERT_BATCH_SIZE = 5000
+
+ORDER_STATES = ['planned', 'in_progress', 'done', 'done', 'done', 'done', 'cancelled']
+OPERATIONS = ['Cutting', 'Machining', 'Assembly', 'Welding', 'Painting', 'Testing', 'Packing']
+UNITS = ['Units', 'Kg', 'Meters', 'Liters', 'Pieces']
+
+
+def seed(products=1000, orders=10000, movements=100000, work_centers=None, users=10, days=365,
+         rng_seed=42, log=print):
+    """
+    Generate the data set inside the current app context and commit it. Returns a dict
+    with the id ranges of what was created, for callers that need to address rows.
+    """
+    # Imported here so callers can point MANUFLOW_DATABASE_URL at a scratch database first
+    from werkzeug.security import generate_password_hash
+    from app import (
+        db, User, Product, WorkCenter, BOM, BOMLine, ManufacturingOrder, WorkOrder, StockMovement,
+        mark_changed, is_low_stock, rebuild_production_rollup, checkpoint_stock
+    )
+
+    rng = random.Random(rng_seed)
+    now = datetime.utcnow()
+    start = now - timedelta(days=days)
+    work_centers = work_centers or max(3, products // 500)
+    started = time.perf_counter()
+
+    def insert(model, rows):
+        rows = list(rows)
+        for offset in range(0, len(rows), INSERT_BATCH_SIZE):
+            db.session.execute(db.insert(model), rows[offset:offset + INSERT_BATCH_SIZE])
+
+    def next_id(model):
+        return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+    def random_time():
+        return start + timedelta(seconds=rng.uniform(0, days * 86400))
+
+    # Users (one shared hash: hashing is deliberately slow)
+    first_user = next_id(User)
+    password_hash = generate_password_hash('password123')
+    insert(User, ({
+        'username': f'operator{first_user + i}', 'email': f'operator{first_user + i}@manuflow.test',
+        'password_hash': password_hash, 'role': rng.choice(['operator', 'operator', 'manager']),
+        'created_at': start, 'is_active': True
+    } for i in range(users)))
+    user_ids = list(range(first_user, first_user + users)) + [1]
+
+    # Work centers
+    first_center = next_id(WorkCenter)
+    insert(WorkCenter, ({
+        'name': f'{rng.choice(OPERATIONS)} Cell {first_center + i}', 'description': 'Generated work center',
+        'cost_per_hour': round(rng.uniform(20, 120), 2), 'capacity': rng.randint(1, 3),
+        'is_active': True, 'created_at': start
+    } for i in range(work_centers)))
+    center_ids = list(range(first_center, first_center + work_centers))
+
+    # Products: 60% raw materials, 15% sub-assemblies, 25% finished goods
+    first_product = next_id(Product)
+    raw_count = max(2, products * 60 // 100)
+    sub_count = max(1, products * 15 // 100)
+    finished_count = max(1, products - raw_count - sub_count)
+    raw_ids = list(range(first_product, first_product + raw_count))
+    sub_ids = list(range(raw_ids[-1] + 1, raw_ids[-1] + 1 + sub_count))
+    finished_ids = list(range(sub_ids[-1] + 1, sub_ids[-1] + 1 + finished_count))
+    raw_set = set(raw_ids)
+    kinds = [('Material', raw_ids), ('Sub-assembly', sub_ids), ('Product', finished_ids)]
+    insert(Product, ({
+        'name': f'{kind} {product_id}', 'description': f'Generated {kind.lower()}',
+        'unit': rng.choice(UNITS) if kind == 'Material' else 'Units', 'current_stock': 0.0,
+        'min_stock': round(rng.uniform(0, 100), 1), 'cost_price': round(rng.uniform(1, 500), 2),
+        'is_raw_material': kind == 'Material', 'is_low_stock': True, 'created_at': start
+    } for kind, ids in kinds for product_id in ids))
+    log(f'  {len(user_ids) - 1} users, {work_centers} work centers, {raw_count + sub_count + finished_count} products')
+
+    # BOMs: sub-assemblies use raw materials, finished goods use both (two levels, acyclic)
+    first_bom = next_id(BOM)
+    bom_products = sub_ids + finished_ids
+    bom_ids = {product_id: first_bom + i for i, product_id in enumerate(bom_products)}
+    sub_set = set(sub_ids)
+    bom_times = {product_id: round(rng.uniform(5, 120), 1) for product_id in bom_products}
+    insert(BOM, ({
+        'product_id': product_id, 'name': f'BOM for product {product_id}', 'description': None,
+        'quantity': 1.0, 'production_time': bom_times[product_id], 'created_at': start
+    } for product_id in bom_products))
+
+    def bom_lines():
+        for product_id in bom_products:
+            pool = raw_ids if product_id in sub_set else raw_ids + sub_ids
+            for component_id in rng.sample(pool, min(len(pool), rng.randint(2, 6))):
+                yield {'bom_id': bom_ids[product_id], 'product_id': component_id, 'quantity': round(rng.uniform(0.5, 10), 2)}
+    insert(BOMLine, bom_lines())
+    log(f'  {len(bom_products)} BOMs')
+
+    # Manufacturing orders and their work orders
+    first_order = next_id(ManufacturingOrder)
+    done_orders = []
+    for offset in range(0, orders, INSERT_BATCH_SIZE):
+        order_rows = []
+        work_order_rows = []
+        for order_id in range(first_order + offset, first_order + min(orders, offset + INSERT_BATCH_SIZE)):
+            product_id = rng.choice(finished_ids if rng.random() < 0.8 else sub_ids)
+            state = rng.choice(ORDER_STATES)
+            created_at = random_time()
+            scheduled = created_at + timedelta(days=rng.randint(0, 14))
+            quantity = float(rng.randint(1, 50))
+            started_at = scheduled if state in ('in_progress', 'done') else None
+            completed_at = started_at + timedelta(hours=rng.uniform(1, 72)) if state == 'done' else None
+            produced = round(quantity * rng.uniform(0.8, 1.0)) if state == 'done' else 0.0
+            order_rows.append({
+                'reference': f'MO-S{order_id:08d}', 'product_id': product_id, 'bom_id': bom_ids[product_id],
+                'quantity_to_produce': quantity, 'quantity_produced': produced, 'state': state,
+                'scheduled_date': scheduled, 'assignee_id': rng.choice(user_ids), 'created_at': created_at,
+                'started_at': started_at, 'completed_at': completed_at
+            })
+            if state == 'done':
+                done_orders.append(order_id)
+            for step in range(rng.randint(1, 3)):
+                estimated = bom_times[product_id] * quantity / (step + 1)
+                work_state = {'done': 'completed', 'in_progress': rng.choice(['in_progress', 'completed', 'pending']),
+                              'cancelled': 'cancelled'}.get(state, 'pending')
+                work_order_rows.append({
+                    'manufacturing_order_id': order_id, 'work_center_id': rng.choice(center_ids),
+                    'operation_name': OPERATIONS[step % len(OPERATIONS)], 'estimated_time': estimated,
+                    'actual_time': estimated * rng.uniform(0.7, 1.4) if work_state == 'completed' else 0.0,
+                    'state': work_state, 'assignee_id': rng.choice(user_ids),
+                    'started_at': started_at if work_state != 'pending' else None,
+                    'completed_at': completed_at if work_state == 'completed' else None
+                })
+        insert(ManufacturingOrder, order_rows)
+        insert(WorkOrder, work_order_rows)
+    log(f'  {orders} manufacturing orders')
+
+    # Stock ledger in chronological order; balances never go negative
+    balances = {}
+    costs = dict(db.session.query(Product.id, Product.cost_price).filter(Product.id >= first_product))
+    min_stocks = dict(db.session.query(Product.id, Product.min_stock).filter(Product.id >= first_product))
+    all_product_ids = raw_ids + sub_ids + finished_ids
+    step = days * 86400 / max(movements, 1)
+    moment = start
+    batch = []
+    for _ in range(movements):
+        moment += timedelta(seconds=rng.uniform(0, 2 * step))
+        product_id = rng.choice(raw_ids) if rng.random() < 0.7 else rng.choice(all_product_ids)
+        balance = balances.get(product_id, 0.0)
+        quantity = float(rng.randint(1, 100))
+        order_id = None
+        if product_id in raw_set:
+            movement_type = 'in' if balance < quantity or rng.random() < 0.45 else rng.choice(['out', 'consumption'])
+            if movement_type == 'consumption' and done_orders:
+                order_id = rng.choice(done_orders)
+        else:
+            movement_type = 'production' if balance < quantity or rng.random() < 0.5 else 'out'
+            if movement_type == 'production' and done_orders:
+                order_id = rng.choice(done_orders)
+        balance += quantity if movement_type in ('in', 'production') else -quantity
+        balances[product_id] = balance
+        batch.append({
+            'product_id': product_id,
+            'reference': f'MO-S{order_id:08d}' if order_id else f'{movement_type.upper()}-{rng.randint(1, 99999):05d}',
+            'movement_type': movement_type, 'quantity': quantity, 'unit_cost': costs[product_id],
+            'total_value': quantity * costs[product_id], 'manufacturing_order_id': order_id,
+            'created_at': moment, 'created_by_id': rng.choice(user_ids), 'balance_after': balance
+        })
+        if len(batch) >= INSERT_BATCH_SIZE:
+            insert(StockMovement, batch)
+            batch = []
+    if batch:
+        insert(StockMovement, batch)
+    if balances:
+        db.session.execute(db.update(Product), [
+            {'id': product_id, 'current_stock': balance, 'inventory_value': balance * costs[product_id],
+             'is_low_stock': is_low_stock(balance, min_stocks[product_id])}
+            for product_id, balance in balances.items()
+        ])
+    log(f'  {movements} stock movements')
+
+    # Bulk inserts bypass change tracking; record them so cached list responses are invalidated
+    for model in (User, WorkCenter, Product, BOM, BOMLine, ManufacturingOrder, WorkOrder, StockMovement):
+        mark_changed(model.__tablename__, None, 'created')
+    rebuild_production_rollup()
+    db.session.commit()
+    checkpoint_stock(timedelta(days=1))
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+    log(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+    return {
+        'raw_ids': raw_ids,
+        'sub_ids': sub_ids,
+        'finished_ids': finished_ids,
+        'bom_ids': bom_ids,
+        'center_ids': center_ids,
+        'user_ids': user_ids,
+        'order_ids': range(first_order, first_order + orders),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='SQLAlchemy URL (defaults to MANUFLOW_DATABASE_URL / manuflow.db)')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--products', type=int)
+    parser.add_argument('--orders', type=int)
+    parser.add_argument('--movements', type=int)
+    parser.add_argument('--work-centers', type=int)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--days', type=int, default=365, help='history length')
+    parser.add_argument('--seed', type=int, default=42, help='random seed')
+    args = parser.parse_args()
+
+    if args.database:
+        os.environ['MANUFLOW_DATABASE_URL'] = args.database
+    volumes = dict(SCALES[args.scale])
+    for name in volumes:
+        if getattr(args, name) is not None:
+            volumes[name] = getattr(args, name)
+
+    from app import app
+
+    print(f"Seeding {volumes['products']} products, {volumes['orders']} orders, {volumes['movements']} movements")
+    with app.app_context():
+        seed(work_centers=args.work_centers, users=args.users, days=args.days, rng_seed=args.seed, **volumes)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
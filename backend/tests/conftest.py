@@ -0,0 +1,59 @@
+"""
+Shared fixtures. The app binds its database when it is imported, so the scratch
+database is configured here before anything imports app.
+"""
+import os
+import sys
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix='manuflow-tests-')
+os.environ['MANUFLOW_DATABASE_URL'] = 'sqlite:///' + os.path.join(_workdir, 'tests.db')
+os.environ['MANUFLOW_JOB_WORKERS'] = '0'
+os.environ['MANUFLOW_HASH_WORKERS'] = '0'
+# Counters only change through this process's own commits; a periodic re-read would
+# add a statement to whichever request happens to trigger it
+os.environ['MANUFLOW_VERSION_REFRESH_SECONDS'] = '3600'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import app as flask_app, db  # noqa: E402
+from seed_data import seed  # noqa: E402
+
+
+def seed_quietly(**sizes):
+    with flask_app.app_context():
+        seed(log=lambda *args: None, **sizes)
+
+
+@pytest.fixture(scope='session')
+def app():
+    seed_quietly(products=100, orders=500, movements=3000)
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    return client
+
+
+@pytest.fixture
+def engine(app):
+    with app.app_context():
+        return db.engine
+
+
+@pytest.fixture
+def statements(engine):
+    """List of the SQL statements executed while the test runs."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', record)
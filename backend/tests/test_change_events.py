@@ -0,0 +1,72 @@
+"""
+Change events are stored by the committing transaction and numbered in commit order,
+and every process streams them from the table, so a stream carries commits made by
+other processes too and resumes by event id.
+"""
+import json
+
+from app import db, ChangeEvent, Product, TableVersion
+
+
+def last_event_id(app):
+    with app.app_context():
+        return db.session.query(TableVersion.version).filter(TableVersion.table_name == 'change_event').scalar()
+
+
+def stored_events(app, after):
+    with app.app_context():
+        return db.session.query(ChangeEvent.id, ChangeEvent.event, ChangeEvent.payload).filter(
+            ChangeEvent.id > after
+        ).order_by(ChangeEvent.id).all()
+
+
+def read_events(response, count):
+    """The first `count` events of an open stream, as (id, event, data)."""
+    events = []
+    for chunk in response.response:
+        fields = dict(line.split(': ', 1) for line in chunk.decode().splitlines() if ': ' in line)
+        if 'event' in fields:
+            events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+            if len(events) == count:
+                break
+    response.close()
+    return events
+
+
+def test_commit_stores_its_events_in_order(app, client):
+    before = last_event_id(app)
+    product_id = client.post('/api/products', json={'name': 'Evented', 'min_stock': 5}).get_json()['id']
+    client.post('/api/stock-movements', json={'product_id': product_id, 'movement_type': 'in', 'quantity': 10})
+
+    events = stored_events(app, before)
+
+    assert [event_id for event_id, _, _ in events] == list(range(before + 1, last_event_id(app) + 1))
+    assert [event for _, event, _ in events] == ['change', 'change', 'low_stock']
+    assert json.loads(events[0][2])['changes'] == [{'table': 'product', 'id': product_id, 'op': 'created'}]
+    assert json.loads(events[2][2])['products'] == [{'id': product_id, 'low_stock': False}]
+
+
+def test_rolled_back_transaction_stores_nothing(app):
+    before = last_event_id(app)
+    with app.app_context():
+        db.session.add(Product(name='Discarded'))
+        db.session.flush()
+        db.session.rollback()
+
+    assert last_event_id(app) == before
+    assert stored_events(app, before) == []
+
+
+def test_stream_carries_events_committed_elsewhere(app, client):
+    before = last_event_id(app)
+    payload = {'changes': [{'table': 'product', 'id': 1, 'op': 'updated'}], 'at': '2026-01-01T00:00:00'}
+    # Stored the way another process's commit stores it
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(db.update(TableVersion).where(TableVersion.table_name == 'change_event').values(
+            version=TableVersion.version + 1
+        ))
+        conn.execute(db.insert(ChangeEvent).values(id=before + 1, event='change', payload=json.dumps(payload)))
+
+    response = client.get('/api/events/stream', headers={'Last-Event-ID': str(before)})
+
+    assert read_events(response, 1) == [(before + 1, 'change', payload)]
@@ -0,0 +1,42 @@
+"""
+The dashboard statistics are cached per process against the table version counters:
+a commit from another process shows up once the counters are re-read, and a local
+commit that lands while the statistics are computed keeps the stale result out.
+"""
+import app as manuflow
+from app import db, Product, TableVersion
+
+
+def low_stock_count(client):
+    return client.get('/api/dashboard/stats').get_json()['products']['low_stock']
+
+
+def test_commit_from_another_process_refreshes_the_cache(app, client, monkeypatch):
+    before = low_stock_count(client)
+    with app.app_context():
+        product_id = db.session.query(Product.id).filter(Product.is_low_stock == False).first()[0]
+        # Written past the session, as another process would, with the counter it bumps
+        with db.engine.begin() as conn:
+            conn.execute(db.update(Product).where(Product.id == product_id).values(is_low_stock=True))
+            conn.execute(db.update(TableVersion).where(TableVersion.table_name == 'product').values(
+                version=TableVersion.version + 1
+            ))
+
+    assert low_stock_count(client) == before
+    monkeypatch.setitem(manuflow._table_versions, 'fetched_at', float('-inf'))
+    assert low_stock_count(client) == before + 1
+
+
+def test_result_overlapping_a_local_commit_is_not_stored(app, client, monkeypatch):
+    compute_dashboard_stats = manuflow.compute_dashboard_stats
+
+    def overlapped_by_a_commit():
+        stats = compute_dashboard_stats()
+        manuflow.invalidate_dashboard_stats([('product', None, 'updated')])
+        return stats
+
+    manuflow.invalidate_dashboard_stats([('product', None, 'updated')])
+    monkeypatch.setattr(manuflow, 'compute_dashboard_stats', overlapped_by_a_commit)
+    assert client.get('/api/dashboard/stats').status_code == 200
+
+    assert manuflow._dashboard_cache['stats'] is None
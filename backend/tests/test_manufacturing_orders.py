@@ -0,0 +1,151 @@
+"""
+Confirming and completing a manufacturing order happens in one transaction behind a
+conditional state change: a failure part way keeps nothing, and a second confirm or
+complete of the same order is refused.
+"""
+from datetime import datetime
+
+import pytest
+
+import app as manuflow
+from app import db, ManufacturingOrder, Product, StockMovement
+
+
+def create_order(client, stocks, quantity=2):
+    """
+    An order for a new product whose BOM uses one unit of a new raw material per stock
+    given. Returns (order id, product id, component ids).
+    """
+    components = []
+    for index, stock in enumerate(stocks):
+        response = client.post('/api/products', json={
+            'name': f'Component {index}', 'current_stock': stock, 'is_raw_material': True
+        })
+        components.append({'product_id': response.get_json()['id'], 'quantity': 1})
+    product_id = client.post('/api/products', json={'name': 'Assembly'}).get_json()['id']
+    bom_id = client.post('/api/boms', json={
+        'product_id': product_id, 'name': 'Assembly BOM', 'production_time': 5, 'components': components
+    }).get_json()['id']
+    order_id = client.post('/api/manufacturing-orders', json={
+        'product_id': product_id, 'bom_id': bom_id, 'quantity_to_produce': quantity,
+        'scheduled_date': datetime.utcnow().isoformat()
+    }).get_json()['id']
+    return order_id, product_id, [component['product_id'] for component in components]
+
+
+def order_state(app, order_id):
+    with app.app_context():
+        order = db.session.get(ManufacturingOrder, order_id)
+        movements = StockMovement.query.filter_by(manufacturing_order_id=order_id).all()
+        return order.state, sorted(movement.movement_type for movement in movements)
+
+
+def stock(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).current_stock
+
+
+def test_shortage_mid_bom_keeps_no_consumption(app, client, monkeypatch):
+    order_id, _, (first, second) = create_order(client, [10, 10])
+    update_product_stock = manuflow.update_product_stock
+
+    def drained_before_second(product_id, quantity, movement_type, unit_cost=None):
+        # Another writer takes the second component after the up-front stock check
+        if product_id == second:
+            db.session.execute(db.update(Product).where(Product.id == second).values(current_stock=0))
+        return update_product_stock(product_id, quantity, movement_type, unit_cost)
+
+    monkeypatch.setattr(manuflow, 'update_product_stock', drained_before_second)
+    response = client.post(f'/api/manufacturing-orders/{order_id}/confirm')
+
+    assert response.status_code == 400
+    assert order_state(app, order_id) == ('planned', [])
+    assert stock(app, first) == 10
+    assert stock(app, second) == 10
+
+
+def test_batch_confirm_keeps_inventory_value_in_step_with_the_ledger(app, client):
+    order_id, product_id, (component,) = create_order(client, [0], quantity=3)
+    for quantity, unit_cost in ((10, 2.0), (10, 5.0)):
+        client.post('/api/stock-movements', json={
+            'product_id': component, 'movement_type': 'in', 'quantity': quantity, 'unit_cost': unit_cost
+        })
+    with app.app_context():
+        bom_id = db.session.get(ManufacturingOrder, order_id).bom_id
+    order_ids = [order_id] + [client.post('/api/manufacturing-orders', json={
+        'product_id': product_id, 'bom_id': bom_id, 'quantity_to_produce': 3,
+        'scheduled_date': datetime.utcnow().isoformat()
+    }).get_json()['id'] for _ in range(2)]
+
+    assert client.post('/api/manufacturing-orders/batch-confirm', json={'order_ids': order_ids}).status_code == 200
+    with app.app_context():
+        movements = StockMovement.query.filter_by(product_id=component).all()
+        ledger_value = sum(
+            movement.total_value if movement.movement_type in manuflow.INCOMING_MOVEMENT_TYPES else -movement.total_value
+            for movement in movements
+        )
+        assert db.session.get(Product, component).inventory_value == pytest.approx(ledger_value)
+        assert ledger_value == pytest.approx(70.0 - 9 * 3.5)
+
+
+def test_second_confirm_is_rejected(app, client):
+    order_id, _, (component,) = create_order(client, [10])
+
+    assert client.post(f'/api/manufacturing-orders/{order_id}/confirm').status_code == 200
+    assert client.post(f'/api/manufacturing-orders/{order_id}/confirm').status_code == 400
+    assert order_state(app, order_id) == ('in_progress', ['consumption'])
+    assert stock(app, component) == 8
+
+
+def test_second_complete_is_rejected(app, client):
+    order_id, product_id, _ = create_order(client, [10])
+
+    first = client.post(f'/api/manufacturing-orders/{order_id}/complete', json={'quantity_produced': 2})
+    second = client.post(f'/api/manufacturing-orders/{order_id}/complete', json={'quantity_produced': 2})
+
+    assert (first.status_code, second.status_code) == (200, 400)
+    assert order_state(app, order_id) == ('done', ['production'])
+    assert stock(app, product_id) == 2
+
+
+@pytest.mark.parametrize('quantity', [-5, 0, 'abc', None, True, [1]])
+def test_complete_rejects_invalid_quantity(app, client, quantity):
+    order_id, _, _ = create_order(client, [10])
+
+    response = client.post(f'/api/manufacturing-orders/{order_id}/complete', json={'quantity_produced': quantity})
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert order_state(app, order_id) == ('planned', [])
+
+
+@pytest.mark.parametrize('bad_id', [[1], {'id': 1}, '1', True, 1.5])
+def test_batch_confirm_reports_malformed_ids(client, bad_id):
+    order_id, _, _ = create_order(client, [10])
+
+    rejected = client.post('/api/manufacturing-orders/batch-confirm', json={'order_ids': [order_id, bad_id]})
+    partial = client.post('/api/manufacturing-orders/batch-confirm', json={
+        'order_ids': [bad_id, order_id], 'mode': 'best_effort'
+    })
+
+    assert rejected.status_code == 400
+    assert rejected.get_json()['failed'] == [{'id': bad_id, 'error': 'id must be an integer'}]
+    assert partial.status_code == 200
+    assert partial.get_json()['confirmed'] == [order_id]
+
+
+@pytest.mark.parametrize('field,bad_id', [('bom_id', [1]), ('bom_id', None), ('product_id', {'id': 1}), ('assignee_id', True)])
+def test_batch_create_reports_malformed_ids(app, client, field, bad_id):
+    order_id, product_id, _ = create_order(client, [10])
+    with app.app_context():
+        bom_id = db.session.get(ManufacturingOrder, order_id).bom_id
+    entry = {'product_id': product_id, 'bom_id': bom_id, 'quantity_to_produce': 1,
+             'scheduled_date': datetime.utcnow().isoformat()}
+
+    response = client.post('/api/manufacturing-orders/batch', json={
+        'orders': [entry, dict(entry, **{field: bad_id})], 'mode': 'best_effort'
+    })
+
+    assert response.status_code == 201
+    assert len(response.get_json()['created']) == 1
+    assert response.get_json()['failed'] == [{'index': 1, 'error': f'{field} must be an integer'}]
@@ -0,0 +1,43 @@
+"""
+List endpoints must issue a fixed number of SQL statements however many rows they
+return: related rows are loaded in bulk, never one lazy load per serialized row.
+"""
+from conftest import seed_quietly
+
+LIST_ENDPOINTS = [
+    '/api/products',
+    '/api/products/low-stock',
+    '/api/work-centers',
+    '/api/boms',
+    '/api/manufacturing-orders',
+    '/api/work-orders',
+    '/api/stock-movements?limit=50',
+    '/api/stock-movements/summary',
+    '/api/reports/production',
+    '/api/users',
+    '/api/jobs',
+    '/api/dashboard/stats',
+]
+
+
+def statement_counts(client, statements):
+    counts = {}
+    for url in LIST_ENDPOINTS:
+        statements.clear()
+        response = client.get(url)
+        assert response.status_code == 200, url
+        counts[url] = len(statements)
+    return counts
+
+
+def test_list_endpoints_issue_constant_statement_counts(client, statements):
+    # Warm up once-per-process reads (table version counters) before measuring
+    statement_counts(client, statements)
+    # Seeding marks every table changed, so neither pass is answered from a response cache
+    seed_quietly(products=20, orders=50, movements=200)
+    small = statement_counts(client, statements)
+    seed_quietly(products=200, orders=1000, movements=5000)
+    large = statement_counts(client, statements)
+    
+    assert all(small[url] > 0 for url in LIST_ENDPOINTS), small
+    assert large == small
@@ -0,0 +1,21 @@
+"""
+Read endpoints must not fall back to full table scans they do not need; the
+endpoints and their allowed scans are listed in check_query_plans.py.
+"""
+from datetime import datetime
+
+import pytest
+
+from check_query_plans import ENDPOINTS, unexpected_scans
+
+
+@pytest.mark.parametrize('template,allowed', ENDPOINTS, ids=[template for template, _ in ENDPOINTS])
+def test_endpoint_avoids_unexpected_full_scans(client, engine, statements, template, allowed):
+    url = template.format(day=datetime.utcnow().date().isoformat())
+    statements.clear()
+    response = client.get(url)
+    assert response.status_code == 200
+    
+    selects = [(statement, parameters) for statement, parameters in statements
+               if statement.lstrip().upper().startswith(('SELECT', 'WITH'))]
+    assert unexpected_scans(engine, selects, allowed) == []
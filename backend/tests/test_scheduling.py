@@ -0,0 +1,122 @@
+"""
+Work order scheduling: every active work center runs `capacity` work orders at once,
+nothing starts before its order's scheduled_date, placing new work incrementally
+gives the plan a full recompute would, and repacking a center after a work order
+starts or completes leaves the orders planned before it where they were.
+
+Each test runs on one fresh work center with every other center deactivated and all
+seeded open work orders closed, inside a transaction that is rolled back afterwards.
+"""
+from datetime import datetime, timedelta
+from itertools import count
+
+import pytest
+
+import app as manuflow
+from app import db, BOM, ManufacturingOrder, WorkCenter, WorkOrder
+
+_references = count()
+
+
+@pytest.fixture
+def center(app):
+    with app.app_context():
+        db.session.execute(db.update(WorkCenter).values(is_active=False))
+        db.session.execute(db.update(WorkOrder).where(WorkOrder.state.in_(['pending', 'in_progress'])).values(
+            state='cancelled'
+        ))
+        work_center = WorkCenter(name='Test cell', capacity=2, is_active=True)
+        db.session.add(work_center)
+        db.session.flush()
+        yield work_center
+        db.session.rollback()
+
+
+def add_work_order(center, scheduled_date, minutes=60, **fields):
+    bom = db.session.query(BOM).first()
+    order = ManufacturingOrder(
+        reference=f'TEST-SCHED-{next(_references)}', product_id=bom.product_id, bom_id=bom.id,
+        quantity_to_produce=1, scheduled_date=scheduled_date
+    )
+    db.session.add(order)
+    db.session.flush()
+    work_order = WorkOrder(
+        manufacturing_order_id=order.id, work_center_id=center.id, operation_name='Assembly',
+        estimated_time=minutes, **fields
+    )
+    db.session.add(work_order)
+    db.session.flush()
+    return work_order
+
+
+def plan(work_orders):
+    return [(wo.work_center_id, wo.planned_start, wo.planned_end) for wo in work_orders]
+
+
+def test_parallel_capacity_is_respected(center):
+    release = datetime.utcnow() + timedelta(days=1)
+    work_orders = [add_work_order(center, release) for _ in range(5)]
+
+    assert manuflow.schedule_all_work_orders() == 5
+
+    starts = sorted(wo.planned_start for wo in work_orders)
+    assert starts == [release, release, release + timedelta(hours=1), release + timedelta(hours=1),
+                      release + timedelta(hours=2)]
+    for wo in work_orders:
+        running = [other for other in work_orders if other.planned_start <= wo.planned_start < other.planned_end]
+        assert len(running) <= center.capacity
+
+
+def test_scheduled_date_is_the_release_time(center):
+    now = datetime.utcnow()
+    overdue = add_work_order(center, now - timedelta(days=2))
+    later = add_work_order(center, now + timedelta(days=3))
+
+    manuflow.schedule_all_work_orders()
+
+    assert now <= overdue.planned_start <= datetime.utcnow()
+    assert later.planned_start == later.manufacturing_order.scheduled_date
+
+
+def test_incremental_placement_matches_a_full_recompute(center):
+    release = datetime.utcnow() + timedelta(days=1)
+    work_orders = [add_work_order(center, release + timedelta(minutes=20 * i), minutes=45 + 10 * i) for i in range(5)]
+    manuflow.schedule_all_work_orders()
+
+    for i in range(5, 8):
+        scheduled_date = release + timedelta(minutes=20 * i)
+        work_order = add_work_order(center, scheduled_date, minutes=30)
+        manuflow.schedule_new_work_order(work_order, scheduled_date)
+        work_orders.append(work_order)
+    incremental = plan(work_orders)
+    manuflow.schedule_all_work_orders()
+
+    assert plan(work_orders) == incremental
+
+
+@pytest.mark.parametrize('state', ['in_progress', 'done'])
+def test_repack_keeps_orders_planned_before_the_changed_one(center, state):
+    now = datetime.utcnow()
+    kept = add_work_order(center, now - timedelta(hours=2), planned_start=now - timedelta(minutes=50),
+                          planned_end=now + timedelta(minutes=10))
+    changed = add_work_order(center, now - timedelta(hours=2), planned_start=now - timedelta(minutes=30),
+                             planned_end=now + timedelta(minutes=30))
+    moved = add_work_order(center, now - timedelta(hours=2), planned_start=now + timedelta(minutes=30),
+                           planned_end=now + timedelta(minutes=90))
+    kept_plan = plan([kept])
+    since = changed.planned_start
+    changed.state = state
+    changed.started_at = now
+    db.session.flush()
+
+    manuflow.reschedule_work_center(center.id, since)
+
+    assert plan([kept]) == kept_plan
+    if state == 'in_progress':
+        assert (changed.planned_start, changed.planned_end) == (now, now + timedelta(hours=1))
+        # Both slots are busy: the kept order frees one first
+        assert moved.planned_start == kept.planned_end
+    else:
+        # The completed order's slot is free again from now
+        assert now <= moved.planned_start <= datetime.utcnow()
+    assert moved.planned_end == moved.planned_start + timedelta(hours=1)
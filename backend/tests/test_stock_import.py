@@ -0,0 +1,61 @@
+"""
+Bulk stock imports read each batch's products when the batch is written, so stock
+changed by other writers during the import is counted, and every movement's
+balance_after continues from the stock the product had just before its batch.
+"""
+import io
+
+import app as manuflow
+from app import db, Product, StockMovement
+
+
+def new_product(client, stock):
+    return client.post('/api/products', json={'name': 'Imported', 'current_stock': stock}).get_json()['id']
+
+
+def import_csv(client, lines):
+    body = 'product_id,movement_type,quantity\n' + ''.join(line + '\n' for line in lines)
+    return client.post('/api/stock-movements/import', data={
+        'file': (io.BytesIO(body.encode()), 'movements.csv')
+    }, content_type='multipart/form-data')
+
+
+def imported_balances(app, product_id):
+    with app.app_context():
+        movements = StockMovement.query.filter_by(product_id=product_id).order_by(StockMovement.id).all()
+        return [movement.balance_after for movement in movements], db.session.get(Product, product_id).current_stock
+
+
+def test_balances_continue_across_batches(app, client, monkeypatch):
+    monkeypatch.setattr(manuflow, 'IMPORT_BATCH_SIZE', 2)
+    product_id = new_product(client, 10)
+
+    response = import_csv(client, [
+        f'{product_id},in,5', f'{product_id},out,3', f'{product_id},out,20', f'{product_id},in,1', f'{product_id},out,13'
+    ])
+
+    assert response.status_code == 201
+    assert response.get_json()['errors'] == [{'line': 4, 'error': 'insufficient stock'}]
+    assert imported_balances(app, product_id) == ([15, 12, 13, 0], 0)
+
+
+def test_stock_changed_during_the_import_is_counted(app, client, monkeypatch):
+    monkeypatch.setattr(manuflow, 'IMPORT_BATCH_SIZE', 1)
+    product_id = new_product(client, 10)
+    iter_import_records = manuflow.iter_import_records
+
+    def consumed_after_first_batch(stream, file_format):
+        for line_number, record in iter_import_records(stream, file_format):
+            yield line_number, record
+            if line_number == 2:
+                # Another writer takes stock after the first batch was written
+                db.session.execute(db.update(Product).where(Product.id == product_id).values(
+                    current_stock=Product.current_stock - 2
+                ))
+
+    monkeypatch.setattr(manuflow, 'iter_import_records', consumed_after_first_batch)
+    response = import_csv(client, [f'{product_id},out,5', f'{product_id},out,2', f'{product_id},out,5'])
+
+    assert response.status_code == 201
+    assert response.get_json()['errors'] == [{'line': 4, 'error': 'insufficient stock'}]
+    assert imported_balances(app, product_id) == ([5, 1], 1)
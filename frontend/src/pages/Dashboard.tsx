@@ -19,7 +19,7 @@ import {
   Search,
   BarChart2
 } from 'lucide-react';
-import { dashboardAPI, manufacturingOrdersAPI } from '../services/api';
+import { dashboardAPI, manufacturingOrdersAPI, changesAPI } from '../services/api';
 import { DashboardStats, ManufacturingOrder } from '../types';
 import { formatDate, getStatusColor, getStatusText, formatNumber } from '../utils/helpers';
 import toast from 'react-hot-toast';
@@ -82,12 +82,24 @@ const Dashboard: React.FC = () => {
   useEffect(() => {
     loadDashboardData(false);
     
-    // Set up auto-refresh interval (every 5 minutes)
+    // Refresh when the server pushes a change, coalescing bursts into one reload
+    let refreshTimer: ReturnType<typeof setTimeout> | undefined;
+    const unsubscribe = changesAPI.subscribe(() => {
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(() => loadDashboardData(false), 1000);
+    });
+    
+    // Slow poll as a fallback: the stream only carries changes committed by the
+    // backend process serving it, and may be dropped or unsupported
     const refreshInterval = setInterval(() => {
       loadDashboardData(false);
     }, 5 * 60 * 1000);
     
-    return () => clearInterval(refreshInterval);
+    return () => {
+      clearTimeout(refreshTimer);
+      clearInterval(refreshInterval);
+      unsubscribe();
+    };
   }, []);
 
   // Apply filters when dependencies change
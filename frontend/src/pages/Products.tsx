@@ -62,7 +62,7 @@ const Products: React.FC = () => {
     } else if (filterType === 'finished') {
       filtered = filtered.filter(p => !p.is_raw_material);
     } else if (filterType === 'low_stock') {
-      filtered = filtered.filter(p => p.current_stock <= p.min_stock);
+      filtered = filtered.filter(p => p.is_low_stock);
     }
 
     // Filter by search term
@@ -142,7 +142,7 @@ const Products: React.FC = () => {
 
   const getStockStatus = (product: Product) => {
     if (product.current_stock <= 0) return { status: 'out', color: 'text-red-600', bg: 'bg-red-100' };
-    if (product.current_stock <= product.min_stock) return { status: 'low', color: 'text-yellow-600', bg: 'bg-yellow-100' };
+    if (product.is_low_stock) return { status: 'low', color: 'text-yellow-600', bg: 'bg-yellow-100' };
     return { status: 'good', color: 'text-green-600', bg: 'bg-green-100' };
   };
 
@@ -221,7 +221,7 @@ const Products: React.FC = () => {
             <div className="ml-4">
               <p className="text-sm font-medium text-gray-600">Low Stock</p>
               <p className="text-2xl font-semibold text-gray-900">
-                {products.filter(p => p.current_stock <= p.min_stock).length}
+                {products.filter(p => p.is_low_stock).length}
               </p>
             </div>
           </div>
@@ -333,7 +333,7 @@ const Products: React.FC = () => {
                   </span>
                 </div>
 
-                {product.current_stock <= product.min_stock && (
+                {product.is_low_stock && (
                   <div className="flex items-center text-yellow-600 text-sm">
                     <AlertTriangle className="h-4 w-4 mr-1" />
                     Stock level is low
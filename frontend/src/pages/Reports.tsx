@@ -9,13 +9,14 @@ import {
   Filter,
   FileText,
 } from 'lucide-react';
-import { reportsAPI } from '../services/api';
-import { ProductionReport } from '../types';
-import { formatDate, formatTime, downloadAsCSV, formatNumber } from '../utils/helpers';
+import { reportsAPI, analyticsAPI } from '../services/api';
+import { ProductionReport, ProductionAnalytics } from '../types';
+import { formatDate, formatTime, formatNumber } from '../utils/helpers';
 import toast from 'react-hot-toast';
 
 const Reports: React.FC = () => {
   const [productionReports, setProductionReports] = useState<ProductionReport[]>([]);
+  const [analytics, setAnalytics] = useState<ProductionAnalytics | null>(null);
   const [loading, setLoading] = useState(false);
   const [dateRange, setDateRange] = useState({
     start: '',
@@ -39,8 +40,12 @@ const Reports: React.FC = () => {
   const loadProductionReport = async (startDate?: string, endDate?: string) => {
     try {
       setLoading(true);
-      const data = await reportsAPI.getProductionReport(startDate, endDate);
+      const [data, summary] = await Promise.all([
+        reportsAPI.getProductionReport(startDate, endDate),
+        analyticsAPI.getProduction(startDate, endDate),
+      ]);
       setProductionReports(data);
+      setAnalytics(summary);
     } catch (error) {
       toast.error('Failed to load production report');
     } finally {
@@ -55,71 +60,32 @@ const Reports: React.FC = () => {
   };
 
   const exportProductionReport = () => {
-    const exportData = productionReports.map(report => ({
-      Reference: report.reference,
-      Product: report.product_name,
-      'Planned Quantity': report.quantity_to_produce,
-      'Produced Quantity': report.quantity_produced,
-      Status: report.state,
-      'Total Time (minutes)': report.total_time,
-      'Efficiency (%)': report.efficiency,
-      'Created Date': formatDate(report.created_at),
-      'Completed Date': report.completed_at ? formatDate(report.completed_at) : 'Not completed',
-    }));
-    
-    downloadAsCSV(exportData, `production-report-${formatDate(new Date().toISOString())}`);
+    // Streamed by the server, so the export covers the whole range without loading it here
+    window.location.href = reportsAPI.getProductionExportUrl(dateRange.start, dateRange.end);
   };
 
+  // Totals and rankings are aggregated server-side
   const getProductionStats = () => {
-    const totalOrders = productionReports.length;
-    const completedOrders = productionReports.filter(r => r.state === 'done').length;
-    const totalPlanned = productionReports.reduce((sum, r) => sum + r.quantity_to_produce, 0);
-    const totalProduced = productionReports.reduce((sum, r) => sum + r.quantity_produced, 0);
-    const totalTime = productionReports.reduce((sum, r) => sum + r.total_time, 0);
-    const avgEfficiency = productionReports.length > 0 
-      ? productionReports.reduce((sum, r) => sum + r.efficiency, 0) / productionReports.length 
-      : 0;
-
+    const totals = analytics?.totals;
     return {
-      totalOrders,
-      completedOrders,
-      totalPlanned,
-      totalProduced,
-      totalTime,
-      avgEfficiency,
-      completionRate: totalOrders > 0 ? (completedOrders / totalOrders) * 100 : 0,
-      productionRate: totalPlanned > 0 ? (totalProduced / totalPlanned) * 100 : 0,
+      totalOrders: totals?.orders ?? 0,
+      completedOrders: totals?.completed_orders ?? 0,
+      totalPlanned: totals?.quantity_planned ?? 0,
+      totalProduced: totals?.quantity_produced ?? 0,
+      totalTime: totals?.total_time ?? 0,
+      avgEfficiency: totals?.average_efficiency ?? 0,
+      completionRate: totals?.completion_rate ?? 0,
+      productionRate: totals?.production_rate ?? 0,
     };
   };
 
-  interface ProductStat {
-    name: string;
-    orders: number;
-    totalProduced: number;
-    totalTime: number;
-  }
-
   const getTopProducts = () => {
-    const productStats: Record<string, ProductStat> = {};
-    
-    productionReports.forEach(report => {
-      if (!productStats[report.product_name]) {
-        productStats[report.product_name] = {
-          name: report.product_name,
-          orders: 0,
-          totalProduced: 0,
-          totalTime: 0,
-        };
-      }
-      
-      productStats[report.product_name].orders += 1;
-      productStats[report.product_name].totalProduced += report.quantity_produced;
-      productStats[report.product_name].totalTime += report.total_time;
-    });
-    
-    return Object.values(productStats)
-      .sort((a, b) => b.totalProduced - a.totalProduced)
-      .slice(0, 5);
+    return (analytics?.top_products ?? []).map(product => ({
+      name: product.product_name,
+      orders: product.orders,
+      totalProduced: product.quantity_produced,
+      totalTime: product.total_time,
+    }));
   };
 
   const stats = getProductionStats();
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Plus,
   Search,
@@ -12,22 +12,31 @@ import {
   Calendar,
   X,
 } from 'lucide-react';
-import { stockMovementsAPI, productsAPI } from '../services/api';
-import { StockMovement, Product, CreateStockMovementData } from '../types';
-import { formatDate, formatDateTime, formatNumber, downloadAsCSV } from '../utils/helpers';
+import { stockMovementsAPI, productsAPI, inventoryAPI } from '../services/api';
+import { StockMovement, Product, StockSummary, StockMovementFilters, CreateStockMovementData } from '../types';
+import { formatDate, formatDateTime, formatNumber } from '../utils/helpers';
 import toast from 'react-hot-toast';
 
+const PAGE_SIZE = 50;
+
 const StockLedger: React.FC = () => {
   const [movements, setMovements] = useState<StockMovement[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [products, setProducts] = useState<Product[]>([]);
-  const [filteredMovements, setFilteredMovements] = useState<StockMovement[]>([]);
+  const [stockSummary, setStockSummary] = useState<StockSummary[]>([]);
+  const [stockValue, setStockValue] = useState(0);
   const [loading, setLoading] = useState(true);
+  const [loadingMovements, setLoadingMovements] = useState(false);
   const [showCreateModal, setShowCreateModal] = useState(false);
   const [selectedProduct, setSelectedProduct] = useState<string>('all');
   const [selectedType, setSelectedType] = useState<string>('all');
   const [searchTerm, setSearchTerm] = useState('');
   const [startDate, setStartDate] = useState<string>('');
   const [endDate, setEndDate] = useState<string>('');
+  // Only the newest movements request may update the list; listFilters records which
+  // filters the loaded pages belong to, so a cursor is never used with other filters
+  const latestRequest = useRef(0);
+  const listFilters = useRef('');
 
   const [formData, setFormData] = useState<CreateStockMovementData>({
     product_id: 0,
@@ -41,19 +50,23 @@ const StockLedger: React.FC = () => {
     loadData();
   }, []);
 
+  // Filters are applied by the server; typing in the search box is debounced
   useEffect(() => {
-    filterMovements();
-  }, [movements, selectedProduct, selectedType, searchTerm, startDate, endDate]);
+    const timer = setTimeout(() => loadMovements(), searchTerm ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [selectedProduct, selectedType, searchTerm, startDate, endDate]);
 
   const loadData = async () => {
     try {
       setLoading(true);
-      const [movementsData, productsData] = await Promise.all([
-        stockMovementsAPI.getAll(),
+      const [productsData, summaryData, valuation] = await Promise.all([
         productsAPI.getAll(),
+        stockMovementsAPI.getSummary(),
+        inventoryAPI.getValuation(),
       ]);
-      setMovements(movementsData);
       setProducts(productsData);
+      setStockSummary(summaryData);
+      setStockValue(valuation.total_value);
     } catch (error) {
       toast.error('Failed to load stock data');
     } finally {
@@ -61,51 +74,41 @@ const StockLedger: React.FC = () => {
     }
   };
 
-  const filterMovements = () => {
-    let filtered = movements;
+  const currentFilters = (): StockMovementFilters => ({
+    ...(selectedProduct !== 'all' && { product_id: parseInt(selectedProduct) }),
+    ...(selectedType !== 'all' && { movement_type: selectedType }),
+    ...(searchTerm && { search: searchTerm }),
+    ...(startDate && { start_date: startDate }),
+    ...(endDate && { end_date: endDate }),
+  });
 
-    // Filter by product
-    if (selectedProduct !== 'all') {
-      filtered = filtered.filter(movement => movement.product_id === parseInt(selectedProduct));
+  // Without a cursor the first page replaces the list; with one the page is appended.
+  // Responses overtaken by a newer request (a filter change or reload) are dropped
+  const loadMovements = async (cursor?: string) => {
+    const filters = currentFilters();
+    const filtersKey = JSON.stringify(filters);
+    if (cursor && filtersKey !== listFilters.current) {
+      cursor = undefined;
     }
-
-    // Filter by movement type
-    if (selectedType !== 'all') {
-      if (selectedType === 'in') {
-        // Filter for both 'in' and 'production' types
-        filtered = filtered.filter(movement => ['in', 'production'].includes(movement.movement_type));
-      } else if (selectedType === 'out') {
-        // Filter for both 'out' and 'consumption' types
-        filtered = filtered.filter(movement => ['out', 'consumption'].includes(movement.movement_type));
-      } else {
-        filtered = filtered.filter(movement => movement.movement_type === selectedType);
+    const request = ++latestRequest.current;
+    try {
+      setLoadingMovements(true);
+      const page = await stockMovementsAPI.getPage(filters, cursor, PAGE_SIZE);
+      if (request !== latestRequest.current) {
+        return;
+      }
+      listFilters.current = filtersKey;
+      setMovements(previous => (cursor ? [...previous, ...page.items] : page.items));
+      setNextCursor(page.next_cursor);
+    } catch (error) {
+      if (request === latestRequest.current) {
+        toast.error('Failed to load stock movements');
+      }
+    } finally {
+      if (request === latestRequest.current) {
+        setLoadingMovements(false);
       }
     }
-
-    // Filter by search term
-    if (searchTerm) {
-      filtered = filtered.filter(movement =>
-        movement.product_name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        movement.reference.toLowerCase().includes(searchTerm.toLowerCase())
-      );
-    }
-
-    // Filter by date range
-    if (startDate) {
-      filtered = filtered.filter(movement => {
-        const movementDateStr = formatDateFromString(movement.created_at);
-        return movementDateStr >= startDate;
-      });
-    }
-
-    if (endDate) {
-      filtered = filtered.filter(movement => {
-        const movementDateStr = formatDateFromString(movement.created_at);
-        return movementDateStr <= endDate;
-      });
-    }
-
-    setFilteredMovements(filtered);
   };
 
   const handleSubmit = async (e: React.FormEvent) => {
@@ -116,6 +119,7 @@ const StockLedger: React.FC = () => {
       setShowCreateModal(false);
       resetForm();
       loadData();
+      loadMovements();
     } catch (error: any) {
       toast.error(error.response?.data?.error || 'Failed to record stock movement');
     }
@@ -145,11 +149,6 @@ const StockLedger: React.FC = () => {
       String(date.getDate()).padStart(2, '0');
   };
 
-  const formatDateFromString = (dateString: string): string => {
-    const date = new Date(dateString);
-    return formatDateForInput(date);
-  };
-
   const setDateRange = (range: 'today' | 'yesterday' | 'thisWeek' | 'lastWeek' | 'thisMonth' | 'lastMonth') => {
     // Use local date to avoid timezone issues
     const today = new Date();
@@ -242,58 +241,20 @@ const StockLedger: React.FC = () => {
     return labels[type] || type;
   };
 
-  const calculateTotalValue = () => {
-    return filteredMovements.reduce((total, movement) => {
-      return total + (movement.quantity * movement.unit_cost);
-    }, 0);
-  };
+  const totalMovementCount = () =>
+    stockSummary.reduce((total, product) => total + product.movement_count, 0);
+
+  const totalQuantity = (field: 'total_in' | 'total_out') =>
+    stockSummary.reduce((total, product) => total + product[field], 0);
 
   const getStockSummary = () => {
-    const summary = products.map(product => {
-      const productMovements = movements.filter(m => m.product_id === product.id);
-      const totalIn = productMovements
-        .filter(m => ['in', 'production'].includes(m.movement_type))
-        .reduce((sum, m) => sum + m.quantity, 0);
-      const totalOut = productMovements
-        .filter(m => ['out', 'consumption'].includes(m.movement_type))
-        .reduce((sum, m) => sum + m.quantity, 0);
-      
-      return {
-        ...product,
-        total_in: totalIn,
-        total_out: totalOut,
-        calculated_stock: totalIn - totalOut,
-      };
-    });
-    
-    return summary.sort((a, b) => a.name.localeCompare(b.name));
+    // Totals are aggregated server-side and already sorted by product name
+    return stockSummary;
   };
 
   const exportData = () => {
-    const exportData = filteredMovements.map(movement => ({
-      Date: formatDateTime(movement.created_at),
-      Product: movement.product_name,
-      Reference: movement.reference,
-      Type: getMovementLabel(movement.movement_type),
-      Quantity: movement.quantity,
-      'Unit Cost': movement.unit_cost,
-      'Total Value': movement.quantity * movement.unit_cost,
-      'Created By': movement.created_by || '',
-    }));
-    
-    // Create filename with date range if filters are applied
-    let filename = 'stock-movements';
-    if (startDate && endDate) {
-      filename += `-${startDate}-to-${endDate}`;
-    } else if (startDate) {
-      filename += `-from-${startDate}`;
-    } else if (endDate) {
-      filename += `-until-${endDate}`;
-    } else {
-      filename += `-${formatDate(new Date().toISOString())}`;
-    }
-    
-    downloadAsCSV(exportData, filename);
+    // Streamed by the server with the active filters applied
+    window.location.href = stockMovementsAPI.getExportUrl(currentFilters());
   };
 
   if (loading) {
@@ -339,7 +300,7 @@ const StockLedger: React.FC = () => {
             </div>
             <div className="ml-4">
               <p className="text-sm font-medium text-gray-600">Total Movements</p>
-              <p className="text-2xl font-semibold text-gray-900">{movements.length}</p>
+              <p className="text-2xl font-semibold text-gray-900">{formatNumber(totalMovementCount())}</p>
             </div>
           </div>
         </div>
@@ -350,9 +311,9 @@ const StockLedger: React.FC = () => {
               <TrendingUp className="h-6 w-6 text-green-600" />
             </div>
             <div className="ml-4">
-              <p className="text-sm font-medium text-gray-600">Production</p>
+              <p className="text-sm font-medium text-gray-600">Units In</p>
               <p className="text-2xl font-semibold text-gray-900">
-                {movements.filter(m => ['in', 'production'].includes(m.movement_type)).length}
+                {formatNumber(totalQuantity('total_in'))}
               </p>
             </div>
           </div>
@@ -364,9 +325,9 @@ const StockLedger: React.FC = () => {
               <TrendingDown className="h-6 w-6 text-red-600" />
             </div>
             <div className="ml-4">
-              <p className="text-sm font-medium text-gray-600">Consumption</p>
+              <p className="text-sm font-medium text-gray-600">Units Out</p>
               <p className="text-2xl font-semibold text-gray-900">
-                {movements.filter(m => ['out', 'consumption'].includes(m.movement_type)).length}
+                {formatNumber(totalQuantity('total_out'))}
               </p>
             </div>
           </div>
@@ -378,9 +339,9 @@ const StockLedger: React.FC = () => {
               <Package className="h-6 w-6 text-purple-600" />
             </div>
             <div className="ml-4">
-              <p className="text-sm font-medium text-gray-600">Total Value</p>
+              <p className="text-sm font-medium text-gray-600">Stock Value</p>
               <p className="text-2xl font-semibold text-gray-900">
-                ${formatNumber(calculateTotalValue())}
+                ${formatNumber(stockValue)}
               </p>
             </div>
           </div>
@@ -397,7 +358,7 @@ const StockLedger: React.FC = () => {
               <Search className="absolute left-3 top-1/2 transform -translate-y-1/2 h-4 w-4 text-gray-400" />
               <input
                 type="text"
-                placeholder="Search movements..."
+                placeholder="Search by reference..."
                 value={searchTerm}
                 onChange={(e) => setSearchTerm(e.target.value)}
                 className="form-input pl-10"
@@ -617,7 +578,7 @@ const StockLedger: React.FC = () => {
           <h2 className="card-title">Stock Movements</h2>
         </div>
 
-        {filteredMovements.length === 0 ? (
+        {movements.length === 0 && !loadingMovements ? (
           <div className="text-center py-12">
             <Package className="mx-auto h-12 w-12 text-gray-400" />
             <h3 className="mt-2 text-sm font-medium text-gray-900">No movements found</h3>
@@ -643,7 +604,7 @@ const StockLedger: React.FC = () => {
                 </tr>
               </thead>
               <tbody className="table-body">
-                {filteredMovements.map((movement) => (
+                {movements.map((movement) => (
                   <tr key={movement.id} className="table-row">
                     <td className="table-cell">
                       <div className="font-medium">{formatDate(movement.created_at)}</div>
@@ -690,6 +651,17 @@ const StockLedger: React.FC = () => {
                 ))}
               </tbody>
             </table>
+            {nextCursor && (
+              <div className="flex justify-center p-4">
+                <button
+                  onClick={() => loadMovements(nextCursor)}
+                  disabled={loadingMovements}
+                  className="btn-secondary"
+                >
+                  {loadingMovements ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>
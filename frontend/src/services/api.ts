@@ -2,13 +2,26 @@ import axios from 'axios';
 import {
   User,
   Product,
+  LowStockProduct,
   WorkCenter,
   BOM,
   ManufacturingOrder,
   WorkOrder,
   StockMovement,
+  StockMovementFilters,
+  StockMovementPage,
+  StockSummary,
+  StockAsOf,
   DashboardStats,
+  ChangeEvent,
+  LowStockCrossing,
+  ExportFormat,
   ProductionReport,
+  ProductionAnalytics,
+  InventoryValuation,
+  BackgroundJob,
+  JobKind,
+  JobState,
   CreateProductData,
   CreateWorkCenterData,
   CreateBOMData,
@@ -18,6 +31,16 @@ import {
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5001/api';
 
+const buildExportUrl = (path: string, params: Record<string, string | number | undefined>): string => {
+  const query = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== undefined && value !== '') {
+      query.append(key, String(value));
+    }
+  });
+  return `${API_BASE_URL}${path}?${query.toString()}`;
+};
+
 const api = axios.create({
   baseURL: API_BASE_URL,
   withCredentials: true,
@@ -83,6 +106,11 @@ export const productsAPI = {
     return response.data;
   },
 
+  getLowStock: async (): Promise<LowStockProduct[]> => {
+    const response = await api.get('/products/low-stock');
+    return response.data;
+  },
+
   create: async (data: CreateProductData): Promise<{ message: string; id: number }> => {
     const response = await api.post('/products', data);
     return response.data;
@@ -164,6 +192,16 @@ export const manufacturingOrdersAPI = {
     return response.data;
   },
 
+  createBatch: async (orders: CreateManufacturingOrderData[], mode: 'all_or_nothing' | 'best_effort' = 'all_or_nothing') => {
+    const response = await api.post('/manufacturing-orders/batch', { orders, mode });
+    return response.data;
+  },
+
+  confirmBatch: async (orderIds: number[], mode: 'all_or_nothing' | 'best_effort' = 'all_or_nothing') => {
+    const response = await api.post('/manufacturing-orders/batch-confirm', { order_ids: orderIds, mode });
+    return response.data;
+  },
+
   complete: async (id: number, quantityProduced: number): Promise<{ message: string }> => {
     const response = await api.post(`/manufacturing-orders/${id}/complete`, {
       quantity_produced: quantityProduced,
@@ -209,10 +247,37 @@ export const stockMovementsAPI = {
     return response.data;
   },
 
+  getPage: async (filters: StockMovementFilters = {}, cursor?: string, limit: number = 50): Promise<StockMovementPage> => {
+    const response = await api.get('/stock-movements', {
+      params: {
+        ...filters,
+        limit,
+        ...(cursor && { cursor }),
+      },
+    });
+    return response.data;
+  },
+
+  getSummary: async (): Promise<StockSummary[]> => {
+    const response = await api.get('/stock-movements/summary');
+    return response.data;
+  },
+
+  getAsOf: async (at: string, productId?: number): Promise<StockAsOf> => {
+    const response = await api.get('/stock-movements/as-of', {
+      params: { at, ...(productId && { product_id: productId }) },
+    });
+    return response.data;
+  },
+
   create: async (data: CreateStockMovementData): Promise<{ message: string; id: number }> => {
     const response = await api.post('/stock-movements', data);
     return response.data;
   },
+
+  // Streamed server-side export; navigate to the URL to download it
+  getExportUrl: (filters: StockMovementFilters = {}, format: ExportFormat = 'csv'): string =>
+    buildExportUrl('/stock-movements/export', { ...filters, format }),
 };
 
 // Dashboard API
@@ -223,6 +288,29 @@ export const dashboardAPI = {
   },
 };
 
+// Change stream API (Server-Sent Events)
+export const changesAPI = {
+  // onChanges receives an empty list after a `reset`, meaning events were missed and
+  // callers should refetch. onLowStock receives products that crossed their minimum
+  // stock. Returns a function that closes the stream.
+  subscribe: (
+    onChanges: (changes: ChangeEvent[]) => void,
+    onLowStock?: (products: LowStockCrossing[]) => void
+  ): (() => void) => {
+    const source = new EventSource(`${API_BASE_URL}/events/stream`, { withCredentials: true });
+    source.addEventListener('change', (event) => {
+      onChanges(JSON.parse((event as MessageEvent).data).changes);
+    });
+    if (onLowStock) {
+      source.addEventListener('low_stock', (event) => {
+        onLowStock(JSON.parse((event as MessageEvent).data).products);
+      });
+    }
+    source.addEventListener('reset', () => onChanges([]));
+    return () => source.close();
+  },
+};
+
 // Reports API
 export const reportsAPI = {
   getProductionReport: async (startDate?: string, endDate?: string): Promise<ProductionReport[]> => {
@@ -234,6 +322,67 @@ export const reportsAPI = {
     });
     return response.data;
   },
+
+  getProductionExportUrl: (startDate?: string, endDate?: string, format: ExportFormat = 'csv'): string =>
+    buildExportUrl('/reports/production/export', { start_date: startDate, end_date: endDate, format }),
+};
+
+// Analytics API (aggregated server-side from the daily rollup)
+export const analyticsAPI = {
+  getProduction: async (startDate?: string, endDate?: string, top: number = 5): Promise<ProductionAnalytics> => {
+    const response = await api.get('/analytics/production', {
+      params: {
+        ...(startDate && { start_date: startDate }),
+        ...(endDate && { end_date: endDate }),
+        top,
+      },
+    });
+    return response.data;
+  },
+};
+
+// Inventory API
+export const inventoryAPI = {
+  getValuation: async (productId?: number): Promise<InventoryValuation> => {
+    const response = await api.get('/inventory/valuation', {
+      params: productId ? { product_id: productId } : {},
+    });
+    return response.data;
+  },
+};
+
+// Background Jobs API
+export const jobsAPI = {
+  // Returns the queued job; an identical job already queued is returned with deduplicated: true
+  submit: async (kind: JobKind, params: Record<string, unknown> = {}): Promise<BackgroundJob> => {
+    const response = await api.post('/jobs', { kind, params });
+    return response.data;
+  },
+
+  getAll: async (state?: JobState, kind?: JobKind): Promise<BackgroundJob[]> => {
+    const response = await api.get('/jobs', {
+      params: {
+        ...(state && { state }),
+        ...(kind && { kind }),
+      },
+    });
+    return response.data;
+  },
+
+  get: async (id: number): Promise<BackgroundJob> => {
+    const response = await api.get(`/jobs/${id}`);
+    return response.data;
+  },
+
+  getResult: async <T = unknown>(id: number): Promise<T> => {
+    const response = await api.get(`/jobs/${id}/result`);
+    return response.data.result;
+  },
+
+  cancel: async (id: number): Promise<BackgroundJob> => {
+    const response = await api.post(`/jobs/${id}/cancel`);
+    return response.data;
+  },
 };
 
 // Users API
@@ -14,9 +14,21 @@ export interface Product {
   min_stock: number;
   cost_price: number;
   is_raw_material: boolean;
+  inventory_value: number;
+  is_low_stock: boolean;
   created_at: string;
 }
 
+export interface LowStockProduct {
+  id: number;
+  name: string;
+  unit: string;
+  current_stock: number;
+  min_stock: number;
+  shortage: number;
+  is_raw_material: boolean;
+}
+
 export interface WorkCenter {
   id: number;
   name: string;
@@ -78,6 +90,8 @@ export interface WorkOrder {
   assignee_name?: string;
   started_at?: string;
   completed_at?: string;
+  planned_start?: string;
+  planned_end?: string;
   notes?: string;
 }
 
@@ -90,10 +104,39 @@ export interface StockMovement {
   quantity: number;
   unit_cost: number;
   manufacturing_order_id?: number;
+  balance_after?: number;
   created_at: string;
   created_by?: string;
 }
 
+export interface StockSummary {
+  id: number;
+  name: string;
+  unit: string;
+  is_raw_material: boolean;
+  current_stock: number;
+  min_stock: number;
+  total_in: number;
+  total_out: number;
+  movement_count: number;
+  closing_balance: number;
+}
+
+export interface StockMovementFilters {
+  product_id?: number;
+  movement_type?: string;
+  search?: string;
+  start_date?: string;
+  end_date?: string;
+}
+
+export type ExportFormat = 'csv' | 'ndjson';
+
+export interface StockMovementPage {
+  items: StockMovement[];
+  next_cursor: string | null;
+}
+
 export interface DashboardStats {
   orders: {
     total: number;
@@ -114,6 +157,17 @@ export interface DashboardStats {
   };
 }
 
+export interface ChangeEvent {
+  table: 'manufacturing_order' | 'work_order' | 'stock_movement' | 'product';
+  id: number | null;
+  op: 'created' | 'updated' | 'deleted' | 'bulk';
+}
+
+export interface LowStockCrossing {
+  id: number;
+  low_stock: boolean;
+}
+
 export interface ProductionReport {
   reference: string;
   product_name: string;
@@ -126,6 +180,59 @@ export interface ProductionReport {
   completed_at?: string;
 }
 
+export interface ProductionTotals {
+  orders: number;
+  completed_orders: number;
+  quantity_planned: number;
+  quantity_produced: number;
+  total_time: number;
+  average_efficiency: number;
+}
+
+export interface ProductionAnalytics {
+  totals: ProductionTotals & { completion_rate: number; production_rate: number };
+  by_state: (ProductionTotals & { state: string })[];
+  by_day: (ProductionTotals & { day: string })[];
+  top_products: (ProductionTotals & { product_id: number; product_name: string })[];
+}
+
+export interface StockAsOf {
+  as_of: string;
+  products: { id: number; name: string; unit: string; stock: number }[];
+}
+
+export interface InventoryValuation {
+  total_value: number;
+  products: {
+    id: number;
+    name: string;
+    unit: string;
+    current_stock: number;
+    average_cost: number;
+    inventory_value: number;
+  }[];
+}
+
+export type JobKind = 'work_order_sync' | 'production_report' | 'mrp' | 'scheduling' | 'production_rollup_rebuild';
+
+export type JobState = 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled';
+
+export interface BackgroundJob {
+  id: number;
+  kind: JobKind;
+  params: Record<string, unknown>;
+  state: JobState;
+  progress: number;
+  progress_message: string | null;
+  cancel_requested: boolean;
+  error: string | null;
+  created_by_id: number | null;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+  deduplicated?: boolean;
+}
+
 export interface ApiResponse<T> {
   data?: T;
   message?: string;